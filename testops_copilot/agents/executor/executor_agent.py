@@ -0,0 +1,165 @@
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+from shared.utils.test_suite import SUITE_PACKAGE, suite_module_name, write_suite, sandbox_preexec, sandbox_env
+EXECUTION_CONFTEST = '''import os
+import pytest
+@pytest.fixture(scope="session")
+def base_url():
+    return os.environ.get("TARGET_BASE_URL", "")
+try:
+    import pytest_playwright
+except ImportError:
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        sync_playwright = None
+    if sync_playwright is not None:
+        @pytest.fixture(scope="session")
+        def browser():
+            with sync_playwright() as p:
+                browser = p.chromium.launch(headless=True)
+                yield browser
+                browser.close()
+        @pytest.fixture
+        def context(browser, base_url):
+            context = browser.new_context(base_url=base_url or None, ignore_https_errors=True)
+            yield context
+            context.close()
+        @pytest.fixture
+        def page(context):
+            page = context.new_page()
+            yield page
+            page.close()
+'''
+STATUS_PRIORITY = {"passed": 0, "skipped": 1, "failed": 2, "broken": 3, "error": 4}
+class ExecutorAgent:
+    def execute(
+        self,
+        tests: List[Dict[str, str]],
+        base_url: str,
+        workers: Optional[int] = None,
+        rewrite_origins: Optional[List[str]] = None,
+        results_dir: Optional[str] = None,
+        timeout: Optional[int] = None
+    ) -> Dict[str, Any]:
+        timeout = timeout or settings.execution_timeout
+        if not tests:
+            return {"results": {}, "summary": self._summarize({}, 0.0)}
+        started = time.monotonic()
+        test_codes = [self._rewrite_origins(t["test_code"], rewrite_origins or [], base_url) for t in tests]
+        with tempfile.TemporaryDirectory(prefix="execute_") as root_dir:
+            modules = write_suite(root_dir, test_codes, conftest=EXECUTION_CONFTEST)
+            shards = self._shard(sorted(modules), workers or settings.execution_default_workers)
+            agent_logger.info(f"[EXECUTION] Running {len(tests)} tests in {len(shards)} shards against {base_url}")
+            shard_dirs = self._run_shards(root_dir, shards, base_url, timeout)
+            module_results = {}
+            for shard_dir in shard_dirs:
+                module_results.update(self._parse_allure_results(os.path.join(shard_dir, "allure-results")))
+                if results_dir:
+                    self._collect_allure_results(os.path.join(shard_dir, "allure-results"), results_dir)
+        results = {}
+        for idx, test in enumerate(tests):
+            results[test["test_id"]] = module_results.get(suite_module_name(idx)) or {
+                "status": "error",
+                "duration_ms": 0,
+                "message": "Test was not executed (collection error or shard timeout)"
+            }
+        summary = self._summarize(results, time.monotonic() - started)
+        agent_logger.info(f"[EXECUTION] Completed", extra=summary)
+        return {"results": results, "summary": summary}
+    def _rewrite_origins(self, test_code: str, origins: List[str], base_url: str) -> str:
+        target = base_url.rstrip("/")
+        for origin in origins:
+            parsed = urlparse(origin)
+            if parsed.scheme and parsed.netloc:
+                test_code = test_code.replace(f"{parsed.scheme}://{parsed.netloc}", target)
+        return test_code
+    def _shard(self, modules: List[str], workers: int) -> List[List[str]]:
+        shard_count = max(1, min(workers, len(modules)))
+        shards = [[] for _ in range(shard_count)]
+        for idx, module in enumerate(modules):
+            shards[idx % shard_count].append(module)
+        return shards
+    def _run_shards(self, root_dir: str, shards: List[List[str]], base_url: str, timeout: int) -> List[str]:
+        # Секреты воркера (БД, Redis, LLM) в процессы с тестами не передаются
+        env = sandbox_env(
+            {"PYTHONPATH": root_dir, "PYTHONDONTWRITEBYTECODE": "1", "TARGET_BASE_URL": base_url},
+            passthrough=("PLAYWRIGHT_BROWSERS_PATH",)
+        )
+        processes = []
+        shard_dirs = []
+        for shard_idx, shard in enumerate(shards):
+            shard_dir = os.path.join(root_dir, f"shard_{shard_idx}")
+            os.makedirs(shard_dir)
+            shard_dirs.append(shard_dir)
+            command = [
+                sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "--continue-on-collection-errors",
+                "--alluredir", os.path.join(shard_dir, "allure-results"),
+                "--rootdir", root_dir, "-c", os.devnull,
+                *[os.path.join(root_dir, SUITE_PACKAGE, f"{module}.py") for module in shard]
+            ]
+            log_file = open(os.path.join(shard_dir, "pytest.log"), "w")
+            processes.append((subprocess.Popen(
+                command,
+                cwd=root_dir,
+                env=env,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                preexec_fn=sandbox_preexec(settings.execution_max_memory_mb)
+            ), log_file))
+        deadline = time.monotonic() + timeout
+        for process, log_file in processes:
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                agent_logger.warning(f"[EXECUTION] Shard timed out after {timeout}s, killing pid {process.pid}")
+                process.kill()
+                process.wait()
+            finally:
+                log_file.close()
+        return shard_dirs
+    def _parse_allure_results(self, allure_dir: str) -> Dict[str, Dict[str, Any]]:
+        module_results = {}
+        for path in glob.glob(os.path.join(allure_dir, "*-result.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            full_name = data.get("fullName", "")
+            module = full_name.split("#", 1)[0].rsplit(".", 1)[-1]
+            status = data.get("status", "broken")
+            duration_ms = max(0, int(data.get("stop", 0)) - int(data.get("start", 0)))
+            message = (data.get("statusDetails") or {}).get("message")
+            current = module_results.get(module)
+            if current is None:
+                module_results[module] = {"status": status, "duration_ms": duration_ms, "message": message}
+                continue
+            current["duration_ms"] += duration_ms
+            if STATUS_PRIORITY.get(status, 3) > STATUS_PRIORITY.get(current["status"], 3):
+                current["status"] = status
+                current["message"] = message
+        return module_results
+    def _collect_allure_results(self, allure_dir: str, results_dir: str):
+        if not os.path.isdir(allure_dir):
+            return
+        os.makedirs(results_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(allure_dir, "*")):
+            shutil.copy2(path, results_dir)
+    def _summarize(self, results: Dict[str, Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        summary = {status: 0 for status in STATUS_PRIORITY}
+        for result in results.values():
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+        summary["total"] = len(results)
+        summary["duration_ms"] = int(elapsed * 1000)
+        return summary
@@ -1,9 +1,12 @@
 
 from typing import Dict, Any, List
 import re
+import hashlib
 from shared.utils.llm_client import llm_client
 import asyncio
 from .prompts import UI_SYSTEM_PROMPT, API_SYSTEM_PROMPT
+from .page_context import PageContextBuilder
+from shared.utils.ast_fingerprint import canonical_ast_hash
 class GeneratorAgent:
     def __init__(self):
         self.ui_system_prompt = UI_SYSTEM_PROMPT
@@ -20,7 +23,9 @@ class GeneratorAgent:
         # Увеличиваем минимальное количество тестов - КРИТИЧЕСКИ ВАЖНО: минимум 10 тестов!
         manual_count = options.get("manual_count", 15)
         automated_count = options.get("automated_count", 20)  # Увеличено до 20 для гарантии минимум 10
-        user_prompt = self._build_ui_prompt(url, page_structure, requirements, test_type, options)
+        # Вместо счётчиков элементов - ранжированная по требованиям таблица селекторов в рамках бюджета токенов
+        page_context = await PageContextBuilder().build(page_structure, requirements)
+        user_prompt = self._build_ui_prompt(url, page_structure, requirements, test_type, options, page_context)
         try:
             # Увеличиваем max_tokens для генерации большего количества тестов
             # Для 15+ тестов нужно больше токенов
@@ -253,13 +258,16 @@ class GeneratorAgent:
         page_structure: Dict,
         requirements: List[str],
         test_type: str,
-        options: Dict
+        options: Dict,
+        page_context: str = ""
     ) -> str:
-        buttons = page_structure.get("buttons", [])[:10]
-        inputs = page_structure.get("inputs", [])[:10]
-        links = page_structure.get("links", [])[:10]
         automated_count = options.get("automated_count", 10)
         manual_count = options.get("manual_count", 15)
+        pages_section = ""
+        if page_structure.get("pages"):
+            pages_section = "\nСтраницы сайта (обход краулером):\n" + "\n".join(
+                f"- {page['url']} — {page.get('title', '')}" for page in page_structure["pages"][:20]
+            ) + "\n"
         
         test_type_instruction = ""
         if test_type == "both":
@@ -354,66 +362,24 @@ def test_automated_1():
 Каждый тест должен иметь полный набор декораторов ПЕРЕД функцией.
 """
         
-        prompt = f"""🚫 ЗАПРЕЩЕНО ГЕНЕРИРОВАТЬ ТЕСТ-ПЛАНЫ! 🚫
-Сгенерируй UI ТЕСТЫ (НЕ тест-планы!) для веб-страницы: {url}
-
-🚫 КРИТИЧЕСКИ ВАЖНО: Генерируй ИМЕННО готовые тесты (функции def test_...), а НЕ тест-планы или описания!
-🚫 НЕ генерируй списки тестов, описания, структуры - только РАБОЧИЙ Python КОД!
-🚫 НЕ генерируй markdown, таблицы, списки - только функции def test_... с полным кодом!
-✅ Генерируй ТОЛЬКО готовые Python функции с декораторами @allure.* и полным кодом!
+        # Общие запреты (тест-планы, markdown) уже есть в системном промпте - здесь только специфика запроса
+        prompt = f"""Сгенерируй UI тесты для веб-страницы: {url}
 
 Требования:
 {chr(10).join(f"- {req}" for req in requirements)}
 
 Тип тестов: {test_type}
 {test_type_instruction}
+Количество: {manual_count} ручных и/или {automated_count} автоматизированных, каждый - отдельная функция def test_... с полным набором декораторов @allure.feature/story/title/tag перед ней.
 
-КРИТИЧЕСКИ ВАЖНО: 
-- Сгенерируй ТОЧНО указанное количество тестов ({manual_count} ручных и/или {automated_count} автоматизированных)
-- МИНИМУМ {automated_count} автоматизированных тестов ОБЯЗАТЕЛЬНО! НЕ МЕНЬШЕ!
-- Каждый тест должен быть отдельной функцией def test_...
-- Не объединяй тесты в одну функцию
-- Каждый тест должен иметь полный набор декораторов ПЕРЕД функцией
-- Если сгенерируешь меньше {automated_count} тестов - это КРИТИЧЕСКАЯ ОШИБКА!
-
-Структура страницы:
-- Кнопки: {len(buttons)} найдено
-- Поля ввода: {len(inputs)} найдено  
-- Ссылки: {len(links)} найдено
-
-Важно:
-1. Все тесты должны использовать паттерн AAA (Arrange-Act-Assert)
-2. Все тесты должны иметь полный набор Allure декораторов ПЕРЕД функцией:
-   - @allure.feature("...")
-   - @allure.story("...")
-   - @allure.title("...")
-   - @allure.tag("...")
-3. Код должен быть валидным Python кодом без синтаксических ошибок
-4. Автоматизированные тесты используют Playwright API и allure.step() для структурирования
-5. Ручные тесты используют @allure.manual и описание шагов в docstring
-6. КРИТИЧЕСКИ ВАЖНО: НЕ ПОВТОРЯЙ одинаковые действия много раз подряд
-7. Если нужно выполнить несколько действий, используй циклы или переменные
-8. Каждое действие должно быть осмысленным и проверять результат
-9. Избегай множественных одинаковых кликов без проверки состояния
-10. 🎯 КРИТИЧЕСКИ ВАЖНО: КАЖДЫЙ ТЕСТ ДОЛЖЕН БЫТЬ АБСОЛЮТНО УНИКАЛЬНЫМ!
-    - НЕ генерируй тесты с одинаковой логикой или одинаковыми проверками
-    - НЕ генерируй тесты, которые отличаются только названием функции
-    - Каждый тест должен проверять РАЗНЫЕ аспекты функциональности
-    - Используй РАЗНЫЕ селекторы, РАЗНЫЕ проверки, РАЗНЫЕ сценарии
-    - Если генерируешь несколько тестов для одного элемента, каждый должен проверять РАЗНОЕ поведение
-    - Каждый тест должен иметь УНИКАЛЬНУЮ логику, УНИКАЛЬНЫЕ проверки, УНИКАЛЬНЫЙ сценарий
-    - Избегай шаблонности - каждый тест должен быть индивидуальным и проверять что-то свое
-
-ЗАПРЕЩЕНО:
-- Генерировать код с повторяющимися одинаковыми действиями без логики
-- Множественные одинаковые клики подряд без проверки результата
-- Пустые циклы или бессмысленные повторения
-- Для ручных тестов использовать Playwright код
-- Объединять несколько тестов в одну функцию
-- Генерировать одинаковые тесты (с одинаковой логикой, селекторами, проверками)
-- Дублировать тесты с незначительными изменениями (например, только меняя название)
-- Генерировать тесты-шаблоны, которые отличаются только названием
-- Копировать логику из одного теста в другой
+Элементы страницы, релевантные требованиям (используй эти селекторы):
+{page_context or "- структура страницы недоступна, используй устойчивые селекторы по роли и тексту"}
+{pages_section}
+Правила:
+1. Паттерн AAA (Arrange-Act-Assert), Playwright API и allure.step() в автоматизированных тестах, @allure.manual и шаги в docstring - в ручных.
+2. Валидный Python без синтаксических ошибок.
+3. Каждый тест проверяет своё поведение: разные сценарии, селекторы и проверки; не дублируй логику с другим названием.
+4. Не повторяй одинаковые действия подряд без проверки результата; каждое действие осмысленно и проверяется.
 """
         return prompt
     def _build_api_prompt(
@@ -696,43 +662,12 @@ Endpoints для тестирования:
                         continue  # Пропускаем этот тест - это тест-план, а не тест
                 # Для manual тестов (@allure.manual) принимаем даже если нет Playwright кода
                 
-                # Строгая дедупликация: проверяем, не является ли тест дубликатом
-                # Создаем нормализованную версию кода для сравнения
-                # Убираем пробелы, комментарии, декораторы, названия переменных, строки
-                normalized_code = test_code
-                
-                # Убираем декораторы
-                normalized_code = re.sub(r'@\w+\.\w+\([^)]*\)', '', normalized_code)
-                normalized_code = re.sub(r'@\w+\s*', '', normalized_code)
-                
-                # Убираем комментарии
-                normalized_code = re.sub(r'#.*', '', normalized_code)
-                normalized_code = re.sub(r'""".*?"""', '', normalized_code, flags=re.DOTALL)
-                normalized_code = re.sub(r"'''.*?'''", '', normalized_code, flags=re.DOTALL)
-                
-                # Убираем строки (заменяем на placeholder)
-                normalized_code = re.sub(r'"[^"]*"', '"STRING"', normalized_code)
-                normalized_code = re.sub(r"'[^']*'", "'STRING'", normalized_code)
-                
-                # Убираем названия функций и переменных (оставляем только структуру)
-                normalized_code = re.sub(r'\bdef\s+\w+', 'def FUNC', normalized_code)
-                normalized_code = re.sub(r'\btest_\w+', 'test_FUNC', normalized_code)
-                
-                # Убираем пробелы и приводим к нижнему регистру
-                normalized_code = re.sub(r'\s+', ' ', normalized_code)
-                normalized_code = normalized_code.strip().lower()
-                
-                # Извлекаем ключевые элементы для дополнительной проверки
-                # (селекторы, методы, проверки)
-                selectors = set(re.findall(r'locator\([^)]+\)', normalized_code))
-                methods = set(re.findall(r'\.(goto|click|fill|expect|to_be_visible|to_have_text)', normalized_code))
-                
-                # Создаем составной ключ для более точного сравнения
-                import hashlib
-                structure_hash = hashlib.md5(normalized_code.encode()).hexdigest()
-                selectors_hash = hashlib.md5(str(sorted(selectors)).encode()).hexdigest()
-                methods_hash = hashlib.md5(str(sorted(methods)).encode()).hexdigest()
-                composite_key = f"{structure_hash}_{selectors_hash}_{methods_hash}"
+                # Строгая дедупликация по каноническому AST: имена, строки, аргументы декораторов,
+                # комментарии и форматирование на ключ не влияют
+                composite_key = canonical_ast_hash(test_code)
+                if composite_key is None:
+                    # Код не парсится - сравниваем текст без пробелов
+                    composite_key = hashlib.sha256(re.sub(r'\s+', ' ', test_code).strip().encode()).hexdigest()
                 
                 # Проверяем, не видели ли мы уже этот тест
                 if composite_key not in seen_tests:
@@ -744,9 +679,7 @@ Endpoints для тестирования:
                         f"[GENERATION] Skipping duplicate test: {func_name if 'func_name' in locals() else 'unknown'}",
                         extra={
                             "test_number": i+1,
-                            "structure_hash": structure_hash[:8],
-                            "selectors_count": len(selectors),
-                            "methods_count": len(methods)
+                            "ast_hash": composite_key[:8]
                         }
                     )
         else:
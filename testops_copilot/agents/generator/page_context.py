@@ -0,0 +1,108 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
+from shared.config.settings import settings
+from shared.utils.llm_client import llm_client
+from shared.utils.logger import agent_logger
+TOKEN_PATTERN = re.compile(r"[a-zа-яё0-9]+", re.IGNORECASE)
+# Усечение до префикса - грубая замена стемминга для русских словоформ ("тариф", "тарифы", "тарифов")
+STEM_LENGTH = 5
+def _tokens(text: str) -> List[str]:
+    return [token[:STEM_LENGTH] for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1]
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 3)
+class PageContextBuilder:
+    def __init__(self, token_budget: Optional[int] = None, use_embeddings: Optional[bool] = None):
+        self.token_budget = token_budget or settings.generator_context_token_budget
+        self.use_embeddings = settings.generator_context_embeddings if use_embeddings is None else use_embeddings
+    async def build(self, page_structure: Dict[str, Any], requirements: List[str]) -> str:
+        elements = self._elements(page_structure)
+        if not elements:
+            return ""
+        scores = self._lexical_scores(elements, requirements)
+        if self.use_embeddings:
+            semantic = await self._embedding_scores(elements, requirements)
+            if semantic is not None:
+                scores = [0.6 * lexical + 0.4 * max(0.0, cosine) for lexical, cosine in zip(scores, semantic)]
+        ranked = sorted(range(len(elements)), key=lambda idx: (-scores[idx], idx))
+        header = "| тип | селектор | подпись |\n|---|---|---|"
+        rows = []
+        used = estimate_tokens(header)
+        seen_selectors = set()
+        for idx in ranked:
+            element = elements[idx]
+            if element["selector"] in seen_selectors:
+                continue
+            row = f"| {element['kind']} | `{element['selector']}` | {element['label'][:60]} |"
+            cost = estimate_tokens(row)
+            if used + cost > self.token_budget:
+                break
+            rows.append(row)
+            seen_selectors.add(element["selector"])
+            used += cost
+        agent_logger.info(
+            f"[GENERATION] Page context: {len(rows)}/{len(elements)} elements, ~{used} tokens",
+            extra={"elements_total": len(elements), "elements_included": len(rows), "context_tokens": used}
+        )
+        return header + "\n" + "\n".join(rows)
+    def _elements(self, page_structure: Dict[str, Any]) -> List[Dict[str, str]]:
+        elements = []
+        for button in page_structure.get("buttons", []):
+            label = button.get("text", "")
+            selector = self._selector(button, fallback=f'button:has-text("{label[:40]}")' if label else "")
+            if selector:
+                elements.append({"kind": "button", "selector": selector, "label": label, "text": f"{label} {button.get('id', '')} {button.get('dataTestId', '')}"})
+        for field in page_structure.get("inputs", []):
+            label = field.get("placeholder") or field.get("name") or field.get("type", "")
+            selector = self._selector(field, fallback=f'[name="{field["name"]}"]' if field.get("name") else "")
+            if selector:
+                elements.append({
+                    "kind": f"input:{field.get('type', 'text')}",
+                    "selector": selector,
+                    "label": label,
+                    "text": f"{label} {field.get('name', '')} {field.get('id', '')} {field.get('dataTestId', '')}"
+                })
+        for link in page_structure.get("links", []):
+            label = link.get("text", "")
+            path = urlparse(link.get("href", "")).path
+            selector = self._selector(link, fallback=f'a[href="{path}"]' if path else "")
+            if selector:
+                elements.append({"kind": "link", "selector": selector, "label": label or path, "text": f"{label} {path.replace('/', ' ')}"})
+        listed = {element["selector"] for element in elements}
+        for test_id, selector in page_structure.get("selectors", {}).items():
+            if selector not in listed:
+                elements.append({"kind": "testid", "selector": selector, "label": test_id, "text": test_id.replace("-", " ").replace("_", " ")})
+        return elements
+    def _selector(self, element: Dict[str, str], fallback: str) -> str:
+        if element.get("dataTestId"):
+            return f'[data-testid="{element["dataTestId"]}"]'
+        if element.get("id"):
+            return f'#{element["id"]}'
+        return fallback
+    def _lexical_scores(self, elements: List[Dict[str, str]], requirements: List[str]) -> List[float]:
+        query = Counter(token for requirement in requirements for token in _tokens(requirement))
+        documents = [set(_tokens(element["text"])) for element in elements]
+        document_frequency = Counter(token for document in documents for token in document)
+        total = len(documents)
+        scores = []
+        for document in documents:
+            score = sum(
+                weight * math.log(1 + total / document_frequency[token])
+                for token, weight in query.items() if token in document
+            )
+            scores.append(score)
+        top = max(scores) if scores else 0.0
+        return [score / top if top > 0 else 0.0 for score in scores]
+    async def _embedding_scores(self, elements: List[Dict[str, str]], requirements: List[str]) -> Optional[List[float]]:
+        texts = [" ".join(requirements)] + [f"{element['kind']} {element['text']}" for element in elements]
+        try:
+            embeddings = await llm_client.generate_embeddings_batch(texts)
+        except Exception as e:
+            agent_logger.warning(f"[GENERATION] Embedding ranking unavailable: {e}")
+            return None
+        if not embeddings:
+            return None
+        query = embeddings[0]
+        return [sum(a * b for a, b in zip(query, embedding)) for embedding in embeddings[1:]]
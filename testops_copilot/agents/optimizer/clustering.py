@@ -0,0 +1,85 @@
+import ast
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+class UnionFind:
+    """
+    Система непересекающихся множеств: union по размеру и сжатие путей,
+    поэтому кластеризация рёбер-дубликатов почти линейна по их числу.
+    """
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+        for item in items:
+            self.add(item)
+    def add(self, item: Hashable):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+    def find(self, item: Hashable) -> Hashable:
+        self.add(item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+    def union(self, first: Hashable, second: Hashable) -> bool:
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        return True
+    def groups(self) -> Dict[Hashable, List[Hashable]]:
+        result: Dict[Hashable, List[Hashable]] = {}
+        for item in self.parent:
+            result.setdefault(self.find(item), []).append(item)
+        return result
+def assertion_count(code: str) -> int:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return code.count("assert ") + code.count("expect(")
+    return sum(
+        1 for node in ast.walk(tree)
+        if isinstance(node, ast.Assert)
+        or (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "expect")
+    )
+def quality_score(test: Dict[str, Any]) -> Tuple[float, int, int]:
+    # Больше score валидации, больше проверок, при равенстве - короче код
+    validation = test.get("validation") or {}
+    code = test.get("test_code", "")
+    return (float(validation.get("score", 0) or 0), assertion_count(code), -len(code))
+def cluster_duplicates(tests: List[Dict[str, Any]], duplicates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Объединяет пары-дубликаты в кластеры и выбирает в каждом представителя с лучшим quality_score.
+    Результат не зависит от порядка пар: при равном качестве побеждает тест, стоящий раньше в tests.
+    """
+    position = {test["test_id"]: idx for idx, test in enumerate(tests)}
+    sets = UnionFind()
+    edges = []
+    for dup in duplicates:
+        members = [test_id for test_id in dup["test_ids"] if test_id in position]
+        for test_id in members[1:]:
+            sets.union(members[0], test_id)
+        if len(members) > 1:
+            edges.append((members[0], float(dup.get("similarity_score", 0.0))))
+    similarity: Dict[Hashable, float] = {}
+    for test_id, score in edges:
+        root = sets.find(test_id)
+        similarity[root] = max(similarity.get(root, 0.0), score)
+    clusters = []
+    for root, members in sets.groups().items():
+        if len(members) < 2:
+            continue
+        members.sort(key=position.__getitem__)
+        representative = max(members, key=lambda test_id: (quality_score(tests[position[test_id]]), -position[test_id]))
+        clusters.append({
+            "representative": representative,
+            "test_ids": members,
+            "removed": [test_id for test_id in members if test_id != representative],
+            "max_similarity": similarity.get(root, 0.0)
+        })
+    clusters.sort(key=lambda cluster: position[cluster["test_ids"][0]])
+    return clusters
@@ -0,0 +1,87 @@
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+import numpy as np
+from shared.config.settings import settings
+from .similarity import normalize_embeddings
+WORD_PATTERN = re.compile(r"[^\W\d_]{3,}")
+CAMEL_CASE_PATTERN = re.compile(r"(?<=[a-zа-яё])(?=[A-ZА-ЯЁ])")
+STOP_WORDS = {
+    "the", "and", "for", "with", "that", "this", "def", "self", "test", "page", "assert", "expect",
+    "import", "from", "allure", "pytest", "await", "async", "return", "none", "true", "false",
+    "для", "что", "при", "это", "как", "или", "все", "его", "она", "они", "был", "должен", "должна", "должно"
+}
+STEM_LENGTH = 6
+def text_terms(text: str) -> Set[str]:
+    # Грубый стемминг префиксом: "калькулятор" и "калькулятора" дают один терм
+    words = WORD_PATTERN.findall(CAMEL_CASE_PATTERN.sub(" ", text))
+    return {word.lower()[:STEM_LENGTH] for word in words if word.lower() not in STOP_WORDS}
+def lexical_scores(requirements: List[str], codes: List[str]) -> np.ndarray:
+    """
+    Доля термов требования, встречающихся в тесте (матрица требований x тестов).
+    Обратный индекс терм -> тесты: обходятся только тесты с общими термами.
+    """
+    index: Dict[str, List[int]] = defaultdict(list)
+    for test_idx, code in enumerate(codes):
+        for term in text_terms(code):
+            index[term].append(test_idx)
+    scores = np.zeros((len(requirements), len(codes)), dtype=np.float32)
+    for req_idx, requirement in enumerate(requirements):
+        terms = text_terms(requirement)
+        for term in terms:
+            postings = index.get(term)
+            if postings:
+                scores[req_idx, postings] += 1.0
+        if terms:
+            scores[req_idx] /= len(terms)
+    return scores
+def semantic_scores(requirement_embeddings: List[list], test_embeddings: List[list]) -> Optional[np.ndarray]:
+    # Косинусы всех пар одним умножением матриц; None при несовпадении размерностей (хэш-fallback)
+    if not requirement_embeddings or not test_embeddings:
+        return None
+    requirements = normalize_embeddings(requirement_embeddings)
+    tests = normalize_embeddings(test_embeddings)
+    if requirements.shape[1] != tests.shape[1]:
+        return None
+    return requirements @ tests.T
+def analyze_coverage(
+    requirements: List[str],
+    tests: List[Dict[str, Any]],
+    semantic: Optional[np.ndarray] = None,
+    semantic_threshold: Optional[float] = None,
+    lexical_threshold: Optional[float] = None
+) -> Dict[str, Any]:
+    semantic_threshold = settings.optimizer_coverage_semantic_threshold if semantic_threshold is None else semantic_threshold
+    lexical_threshold = settings.optimizer_coverage_lexical_threshold if lexical_threshold is None else lexical_threshold
+    lexical = lexical_scores(requirements, [test["test_code"] for test in tests])
+    covered = lexical >= lexical_threshold
+    scores = lexical
+    if semantic is not None and semantic.shape == lexical.shape:
+        covered |= semantic >= semantic_threshold
+        scores = np.maximum(lexical, semantic)
+    scores = np.clip(scores, 0.0, 1.0)
+    coverage_details = {}
+    gaps = []
+    for idx, requirement in enumerate(requirements):
+        columns = np.flatnonzero(covered[idx])
+        columns = columns[np.argsort(-scores[idx, columns], kind="stable")]
+        coverage_details[f"requirement_{idx}"] = {
+            "text": requirement,
+            "covered": bool(len(columns)),
+            "tests": [tests[col]["test_id"] for col in columns],
+            "scores": [round(float(scores[idx, col]), 4) for col in columns],
+            "score": round(float(scores[idx].max()), 4) if len(tests) else 0.0,
+            "quality": "good" if len(columns) >= 2 else "insufficient"
+        }
+        if not len(columns):
+            gaps.append({
+                "requirement": f"requirement_{idx}",
+                "description": f"Отсутствуют тесты для: {requirement}"
+            })
+    covered_count = sum(1 for detail in coverage_details.values() if detail["covered"])
+    return {
+        "coverage_score": covered_count / len(requirements) if requirements else 0.0,
+        "details": coverage_details,
+        "gaps": gaps,
+        "method": "lexical+semantic" if semantic is not None and semantic.shape == lexical.shape else "lexical"
+    }
@@ -0,0 +1,40 @@
+import asyncio
+import hashlib
+from typing import List, Tuple
+from shared.config.settings import settings
+from shared.utils.llm_client import llm_client
+from shared.utils.logger import agent_logger
+def test_embedding_text(test_name: str, test_code: str) -> str:
+    return f"{test_name} {test_code}"
+async def embed_texts(texts: List[str]) -> List[list]:
+    embeddings, _ = await embed_texts_with_status(texts)
+    return embeddings
+async def embed_texts_with_status(texts: List[str]) -> Tuple[List[list], List[bool]]:
+    """
+    Эмбеддинги текстов и признак хэш-fallback для каждого: такой вектор годится для сравнения
+    внутри одного прогона, но не для сохранения в semantic_embedding.
+    """
+    batch_size = settings.optimizer_embedding_batch_size
+    embeddings = []
+    fallbacks = []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        batch = await llm_client.generate_embeddings_batch(chunk)
+        if batch is None:
+            # Пакетные эмбеддинги недоступны - по одному, с таймаутом и хэш-fallback
+            results = await asyncio.gather(*(_embed_text(text) for text in chunk))
+            embeddings.extend(embedding for embedding, _ in results)
+            fallbacks.extend(fallback for _, fallback in results)
+        else:
+            embeddings.extend(batch)
+            fallbacks.extend([False] * len(batch))
+        agent_logger.info(f"Generated embeddings for {len(embeddings)}/{len(texts)} tests")
+    return embeddings, fallbacks
+async def _embed_text(text: str) -> Tuple[list, bool]:
+    try:
+        # allow_fallback=False: хэш-заглушку клиента нельзя отличить от настоящего вектора
+        return await asyncio.wait_for(llm_client.generate_embeddings(text, allow_fallback=False), timeout=10.0), False
+    except Exception as e:
+        agent_logger.warning(f"Embedding generation failed ({e}), using hash-based fallback")
+        hash_val = int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+        return [float((hash_val >> (j % 32)) & 1) for j in range(settings.embedding_dimensions)], True
@@ -0,0 +1,103 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from shared.config.settings import settings
+# Строки, числа, идентификаторы и одиночные символы; комментарии и пробелы отбрасываются
+TOKEN_PATTERN = re.compile(r'#[^\n]*|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\d+(?:\.\d+)?|[A-Za-z_]\w*|\S')
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+def normalized_tokens(code: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(code):
+        if token.startswith("#"):
+            continue
+        if token[0] in "\"'":
+            tokens.append("STR")
+        elif token[0].isdigit():
+            tokens.append("NUM")
+        else:
+            tokens.append(token)
+    return tokens
+def code_shingles(code: str, size: int = 5) -> np.ndarray:
+    # crc32 вместо hash(): значения не зависят от PYTHONHASHSEED и совпадают между процессами
+    tokens = normalized_tokens(code)
+    if len(tokens) < size:
+        tokens = tokens + [""] * (size - len(tokens))
+    shingles = {" ".join(tokens[idx:idx + size]) for idx in range(len(tokens) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+class MinHashLSH:
+    """
+    MinHash-сигнатуры по шинглам нормализованных токенов и LSH-бандинг.
+    Пары, попавшие в общую корзину хотя бы одной полосы, - кандидаты в почти-дубликаты;
+    порог срабатывания примерно (1 / bands) ** (1 / rows).
+    """
+    def __init__(
+        self,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        shingle_size: Optional[int] = None,
+        seed: int = 1
+    ):
+        self.num_perm = num_perm or settings.optimizer_minhash_permutations
+        self.bands = bands or settings.optimizer_lsh_bands
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm ({self.num_perm}) must be divisible by bands ({self.bands})")
+        self.rows = self.num_perm // self.bands
+        self.shingle_size = shingle_size or settings.optimizer_shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2^31 и x < 2^32: a * x + b помещается в uint64 без переполнения
+        self._a = rng.integers(1, 1 << 31, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=self.num_perm, dtype=np.uint64)
+    def signature(self, code: str) -> np.ndarray:
+        shingles = code_shingles(code, self.shingle_size)
+        return ((np.outer(shingles, self._a) + self._b) % MERSENNE_PRIME).min(axis=0)
+    def signatures(self, codes: Iterable[str]) -> np.ndarray:
+        return np.vstack([self.signature(code) for code in codes]) if codes else np.empty((0, self.num_perm), dtype=np.uint64)
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, self.rows)]
+    def candidate_pairs(
+        self,
+        signatures: np.ndarray,
+        threshold: Optional[float] = None,
+        max_bucket: Optional[int] = None
+    ) -> Dict[Tuple[int, int], float]:
+        """
+        Пары (i < j) из общих корзин с оценкой Jaccard по доле совпавших минхэшей.
+        Пары с оценкой ниже threshold отбрасываются как ложные срабатывания LSH.
+        Одинаковые сигнатуры сворачиваются к первому тесту группы, а корзины больше max_bucket
+        дают рёбра "звездой" от первого члена: для кластеризации этого достаточно, и число пар
+        остаётся линейным даже на таблице с тысячами шаблонных тестов.
+        """
+        threshold = settings.optimizer_lsh_threshold if threshold is None else threshold
+        max_bucket = max_bucket or settings.optimizer_lsh_max_bucket
+        pairs: Dict[Tuple[int, int], float] = {}
+        representatives: Dict[bytes, int] = {}
+        for idx, signature in enumerate(signatures):
+            key = signature.tobytes()
+            if key in representatives:
+                pairs[(representatives[key], idx)] = 1.0
+            else:
+                representatives[key] = idx
+        buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        for idx in representatives.values():
+            for band, key in enumerate(self.band_keys(signatures[idx])):
+                buckets[(band, key)].append(idx)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > max_bucket:
+                candidates = [(members[0], other) for other in members[1:]]
+            else:
+                candidates = [
+                    (first, second)
+                    for position, first in enumerate(members)
+                    for second in members[position + 1:]
+                ]
+            for pair in candidates:
+                if pair in pairs:
+                    continue
+                jaccard = float(np.count_nonzero(signatures[pair[0]] == signatures[pair[1]])) / self.num_perm
+                if jaccard >= threshold:
+                    pairs[pair] = jaccard
+        return pairs
@@ -1,13 +1,32 @@
 
 import hashlib
 import asyncio
+import json
+import time
+import uuid
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from shared.utils.database import get_db
 from shared.models.database import TestCase
-from shared.utils.llm_client import llm_client
+from shared.utils.llm_client import llm_client, parse_json_response
 from shared.utils.redis_client import redis_client
 from shared.utils.logger import agent_logger
+from shared.utils.ast_fingerprint import canonical_ast_hash
+from shared.config.settings import settings
+from .similarity import normalize_embeddings, similar_pairs
+from .embeddings import embed_texts, embed_texts_with_status, test_embedding_text
+from .minhash import MinHashLSH
+from .clustering import cluster_duplicates
+from .coverage import analyze_coverage, semantic_scores
+LLM_DUPLICATE_SYSTEM_PROMPT = "Ты эксперт по автотестам. Отвечай только JSON."
+LLM_DUPLICATE_PROMPT = """Для каждой из {count} пар автотестов определи, проверяют ли тесты A и B одно и то же поведение
+(одинаковые шаги и проверки, отличаются только имена, данные или форматирование).
+
+Ответ - JSON массив без пояснений:
+[{{"id": 0, "duplicate": "YES"}}, {{"id": 1, "duplicate": "NO"}}, ...]
+
+{pairs}
+"""
 class OptimizerAgent:
     async def optimize(
         self,
@@ -15,135 +34,210 @@ class OptimizerAgent:
         requirements: List[str],
         options: Dict[str, Any] = None
     ) -> Dict[str, Any]:
+        """
+        Стадии идут по возрастанию стоимости: exact -> structural -> lsh -> vector -> llm -> coverage.
+        Когда бюджет времени (options["time_budget"], сек) исчерпан, оставшиеся стадии пропускаются
+        и возвращается результат по уже найденным дубликатам. Состояние между вызовами не хранится.
+        """
         options = options or {}
         similarity_threshold = options.get("similarity_threshold", 0.85)
-        include_existing = options.get("include_existing", False)
+        deadline = time.monotonic() + options.get("time_budget", settings.optimizer_time_budget)
+        stages = []
         exact_duplicates = self._find_exact_duplicates(tests)
-        semantic_duplicates = await self._find_semantic_duplicates(tests, similarity_threshold)
-        llm_duplicates = await self._llm_analysis_duplicates(semantic_duplicates, tests, similarity_threshold)
-        coverage_result = self._analyze_coverage(tests, requirements)
-        all_duplicates = exact_duplicates + semantic_duplicates + llm_duplicates
-        unique_tests = self._remove_duplicates(tests, all_duplicates)
+        stages.append("exact")
+        candidates = self._without_duplicates(tests, exact_duplicates)
+        structural_duplicates = self._find_structural_duplicates(candidates)
+        stages.append("structural")
+        # Структурные копии уже найдены по хэшу - эмбеддинги и LLM для них не нужны
+        candidates = self._without_duplicates(candidates, structural_duplicates)
+        all_duplicates = exact_duplicates + structural_duplicates
+        # Пары ниже порога, но выше нижней границы, уходят на LLM
+        lower_bound = min(similarity_threshold, settings.optimizer_llm_min_similarity)
+        scored = None
+        if options.get("lsh_prefilter", settings.optimizer_lsh_prefilter):
+            pairs = None
+            if time.monotonic() < deadline:
+                pairs = self._near_duplicate_candidates(candidates)
+                stages.append("lsh")
+            if pairs is not None:
+                # Эмбеддинги и косинус считаются только для пар из общих LSH-корзин
+                scored = await self._run_stage("vector", self._score_candidate_pairs(candidates, pairs, lower_bound), deadline)
+                if scored is None:
+                    # Векторная стадия не успела: берём пары с очень высокой оценкой Jaccard
+                    all_duplicates += self._lsh_duplicates(candidates, pairs)
+        else:
+            scored = await self._run_stage("vector", self._find_semantic_duplicates(candidates, lower_bound), deadline)
+        if scored is not None:
+            stages.append("vector")
+            all_duplicates += [dup for dup in scored if dup["similarity_score"] >= similarity_threshold]
+            llm_duplicates = await self._run_stage("llm", self._llm_analysis_duplicates(scored, candidates, similarity_threshold), deadline)
+            if llm_duplicates is not None:
+                stages.append("llm")
+                all_duplicates += llm_duplicates
+        clusters = cluster_duplicates(tests, all_duplicates)
+        unique_tests = self._remove_duplicates(tests, clusters)
+        # Покрытие считается по оставшимся тестам; без бюджета на эмбеддинги - только лексически
+        semantic = None
+        if requirements and unique_tests:
+            semantic = await self._run_stage("coverage", self._coverage_similarity(unique_tests, requirements), deadline)
+        if semantic is not None or not requirements or not unique_tests:
+            stages.append("coverage")
+        coverage_result = self._analyze_coverage(unique_tests, requirements, semantic)
+        budget_exhausted = "coverage" not in stages and time.monotonic() >= deadline
+        if budget_exhausted:
+            agent_logger.warning(f"Optimizer time budget exhausted after stages: {', '.join(stages)}")
         return {
             "optimized_tests": unique_tests,
             "duplicates_found": len(all_duplicates),
             "duplicates": all_duplicates,
-            "coverage_score": coverage_result["score"],
+            "clusters": clusters,
+            "coverage_score": coverage_result["coverage_score"],
             "coverage_details": coverage_result["details"],
             "gaps": coverage_result["gaps"],
-            "recommendations": self._generate_recommendations(all_duplicates, coverage_result)
+            "recommendations": self._generate_recommendations(clusters, coverage_result),
+            "stages_completed": stages,
+            "budget_exhausted": budget_exhausted
         }
+    async def _run_stage(self, name: str, coro, deadline: float):
+        # None - стадия не уложилась в бюджет или упала; найденное ранее остаётся в силе
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            coro.close()
+            agent_logger.info(f"Optimizer stage '{name}' skipped: no time budget left")
+            return None
+        try:
+            return await asyncio.wait_for(coro, remaining)
+        except asyncio.TimeoutError:
+            agent_logger.warning(f"Optimizer stage '{name}' cancelled after exceeding the time budget")
+        except Exception as e:
+            agent_logger.warning(f"Optimizer stage '{name}' failed: {e}")
+        return None
+    def _without_duplicates(self, tests: List[Dict], duplicates: List[Dict]) -> List[Dict]:
+        removed = {dup["test_ids"][1] for dup in duplicates}
+        return [test for test in tests if test["test_id"] not in removed]
     def _find_exact_duplicates(self, tests: List[Dict]) -> List[Dict]:
+        return self._hash_duplicates(tests, lambda code: hashlib.sha256(code.encode()).hexdigest(), "exact")
+    def _find_structural_duplicates(self, tests: List[Dict]) -> List[Dict]:
+        # Канонический AST: переименования, docstring и форматирование - тот же тест; другие URL и селекторы - нет
+        return self._hash_duplicates(tests, canonical_ast_hash, "structural")
+    def _hash_duplicates(self, tests: List[Dict], key, kind: str) -> List[Dict]:
         duplicates = []
         seen_hashes = {}
         for test in tests:
-            code_hash = hashlib.sha256(test["test_code"].encode()).hexdigest()
+            code_hash = key(test["test_code"])
+            if code_hash is None:
+                continue
             if code_hash in seen_hashes:
                 duplicates.append({
                     "test_ids": [seen_hashes[code_hash], test["test_id"]],
-                    "type": "exact",
+                    "type": kind,
                     "similarity_score": 1.0
                 })
             else:
                 seen_hashes[code_hash] = test["test_id"]
         return duplicates
+    def _lsh_duplicates(self, tests: List[Dict], pairs: Dict[Tuple[int, int], float]) -> List[Dict]:
+        return [
+            {
+                "test_ids": [tests[i]["test_id"], tests[j]["test_id"]],
+                "type": "lsh",
+                "similarity_score": jaccard,
+                "jaccard": jaccard,
+                "test_names": [tests[i].get("test_name", ""), tests[j].get("test_name", "")]
+            }
+            for (i, j), jaccard in pairs.items()
+            if jaccard >= settings.optimizer_lsh_duplicate_jaccard
+        ]
+    def _near_duplicate_candidates(self, tests: List[Dict]) -> Dict[Tuple[int, int], float]:
+        lsh = MinHashLSH()
+        pairs = lsh.candidate_pairs(lsh.signatures([test["test_code"] for test in tests]))
+        agent_logger.info(f"MinHash/LSH: {len(pairs)} candidate pairs among {len(tests)} tests")
+        return pairs
+    async def _score_candidate_pairs(self, tests: List[Dict], pairs: Dict[Tuple[int, int], float], threshold: float) -> List[Dict]:
+        if not pairs:
+            return []
+        involved = sorted({idx for pair in pairs for idx in pair})
+        position = {idx: pos for pos, idx in enumerate(involved)}
+        matrix = normalize_embeddings(await self._embed_tests([tests[idx] for idx in involved]))
+        first = matrix[[position[i] for i, _ in pairs]]
+        second = matrix[[position[j] for _, j in pairs]]
+        scores = np.einsum("ij,ij->i", first, second)
+        duplicates = []
+        for (i, j), similarity in zip(pairs, scores.tolist()):
+            if similarity >= threshold:
+                duplicates.append({
+                    "test_ids": [tests[i]["test_id"], tests[j]["test_id"]],
+                    "type": "semantic",
+                    "similarity_score": similarity,
+                    "jaccard": pairs[(i, j)],
+                    "test_names": [tests[i].get("test_name", ""), tests[j].get("test_name", "")]
+                })
+        agent_logger.info(f"Found {len(duplicates)} semantic duplicates among {len(pairs)} LSH candidates")
+        return duplicates
     async def _find_semantic_duplicates(self, tests: List[Dict], threshold: float) -> List[Dict]:
         if len(tests) < 2:
             return []
         try:
-            index_name = "idx:test_embeddings"
-            use_redisearch = redis_client.create_vector_index(index_name, vector_dim=768)
             agent_logger.info(f"Generating embeddings for {len(tests)} tests")
-            embeddings = []
-            test_texts = []
-            # Добавляем таймаут для каждого эмбеддинга (10 секунд)
-            import asyncio
-            for i, test in enumerate(tests):
-                test_text = f"{test.get('test_name', '')} {test.get('test_code', '')}"
-                test_texts.append(test_text)
-                try:
-                    # Генерируем эмбеддинг с таймаутом
-                    embedding = await asyncio.wait_for(
-                        llm_client.generate_embeddings(test_text),
-                        timeout=10.0
-                    )
-                    embeddings.append(embedding)
-                    if (i + 1) % 5 == 0:
-                        agent_logger.info(f"Generated embeddings for {i + 1}/{len(tests)} tests")
-                except asyncio.TimeoutError:
-                    agent_logger.warning(f"Embedding generation timeout for test {i + 1}, using hash-based fallback")
-                    # Используем хеш-основанный эмбеддинг как fallback
-                    import hashlib
-                    import numpy as np
-                    hash_val = int(hashlib.sha256(test_text.encode()).hexdigest()[:8], 16)
-                    # Создаем простой вектор на основе хеша
-                    embedding = [float((hash_val >> j) & 1) for j in range(768)]
-                    embeddings.append(embedding)
-                except Exception as e:
-                    agent_logger.error(f"Error generating embedding for test {i + 1}: {e}")
-                    # Используем хеш-основанный эмбеддинг как fallback
-                    import hashlib
-                    hash_val = int(hashlib.sha256(test_text.encode()).hexdigest()[:8], 16)
-                    embedding = [float((hash_val >> j) & 1) for j in range(768)]
-                embeddings.append(embedding)
-                if use_redisearch:
-                    redis_client.save_vector(
-                        index_name,
-                        test["test_id"],
-                        test.get("test_name", ""),
-                        embedding
-                    )
+            embeddings = await self._embed_tests(tests)
+            # Размерность в имени индекса: эмбеддинги другой модели не смешиваются в одном HNSW
+            index_name = f"{settings.redis_vector_index_name}:{len(embeddings[0])}"
+            use_redisearch = redis_client.create_vector_index(index_name, vector_dim=len(embeddings[0]), legacy_index="idx:test_embeddings")
             duplicates = []
+            if use_redisearch:
+                # Векторы прогона живут в своём namespace с TTL и удаляются сразу после поиска
+                namespace = uuid.uuid4().hex
+                use_redisearch = redis_client.save_vectors(
+                    index_name,
+                    namespace,
+                    [(test["test_id"], test.get("test_name", ""), embedding) for test, embedding in zip(tests, embeddings)]
+                )
             if use_redisearch:
                 agent_logger.info("Using RediSearch for vector search")
-                for i, test in enumerate(tests):
-                    similar = redis_client.search_similar_vectors(
-                        index_name,
-                        embeddings[i],
-                        top_k=10,
-                        threshold=threshold
-                    )
+                try:
+                    results = redis_client.search_similar_vectors_batch(index_name, namespace, embeddings, top_k=10, threshold=threshold)
+                finally:
+                    redis_client.delete_vectors(index_name, namespace, [test["test_id"] for test in tests])
+                by_id = {test["test_id"]: test for test in tests}
+                seen_pairs = set()
+                for test, similar in zip(tests, results):
                     for similar_test in similar:
-                        if similar_test["test_id"] != test["test_id"]:
-                            pair_exists = any(
-                                (dup["test_ids"][0] == test["test_id"] and dup["test_ids"][1] == similar_test["test_id"]) or
-                                (dup["test_ids"][1] == test["test_id"] and dup["test_ids"][0] == similar_test["test_id"])
-                                for dup in duplicates
-                            )
-                            if not pair_exists:
+                        if similar_test["test_id"] != test["test_id"] and similar_test["test_id"] in by_id:
+                            # Пара (a, b) и (b, a) - одно ребро; проверка по множеству вместо прохода по списку
+                            pair = frozenset((test["test_id"], similar_test["test_id"]))
+                            if pair not in seen_pairs:
+                                seen_pairs.add(pair)
                                 duplicates.append({
                                     "test_ids": [test["test_id"], similar_test["test_id"]],
                                     "type": "semantic_redisearch",
                                     "similarity_score": similar_test["similarity"],
                                     "test_names": [
                                         test.get("test_name", ""),
-                                        similar_test.get("test_name", "")
+                                        by_id[similar_test["test_id"]].get("test_name", "")
                                     ]
                                 })
             else:
                 agent_logger.info("Using numpy cosine similarity (RediSearch not available)")
-                embeddings_array = np.array(embeddings)
-                for i in range(len(tests)):
-                    for j in range(i + 1, len(tests)):
-                        similarity = self._cosine_similarity(
-                            embeddings_array[i],
-                            embeddings_array[j]
-                        )
-                        if similarity >= threshold:
-                            duplicates.append({
-                                "test_ids": [tests[i]["test_id"], tests[j]["test_id"]],
-                                "type": "semantic",
-                                "similarity_score": float(similarity),
-                                "test_names": [
-                                    tests[i].get("test_name", ""),
-                                    tests[j].get("test_name", "")
-                                ]
-                            })
+                # Нормализуем один раз и считаем E @ E.T плитками: без питоновского цикла по парам
+                matrix = normalize_embeddings(embeddings)
+                rows, cols, scores = similar_pairs(matrix, threshold, block_size=settings.optimizer_similarity_block_size)
+                for i, j, similarity in zip(rows.tolist(), cols.tolist(), scores.tolist()):
+                    duplicates.append({
+                        "test_ids": [tests[i]["test_id"], tests[j]["test_id"]],
+                        "type": "semantic",
+                        "similarity_score": similarity,
+                        "test_names": [
+                            tests[i].get("test_name", ""),
+                            tests[j].get("test_name", "")
+                        ]
+                    })
             agent_logger.info(f"Found {len(duplicates)} semantic duplicates")
             return duplicates
         except Exception as e:
             agent_logger.error(f"Error finding semantic duplicates: {e}", exc_info=True)
             return []
+    async def _embed_tests(self, tests: List[Dict]) -> List[list]:
+        return await embed_texts([test_embedding_text(test.get("test_name", ""), test.get("test_code", "")) for test in tests])
     def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         try:
             vec1 = np.array(vec1)
@@ -158,97 +252,137 @@ class OptimizerAgent:
         except Exception as e:
             agent_logger.warning(f"Error calculating cosine similarity: {e}")
             return 0.0
-    def _analyze_coverage(self, tests: List[Dict], requirements: List[str]) -> Dict:
-        coverage_details = {}
-        gaps = []
-        for idx, requirement in enumerate(requirements):
-            covering_tests = []
-            for test in tests:
-                if requirement.lower() in test["test_code"].lower():
-                    covering_tests.append(test["test_id"])
-            is_covered = len(covering_tests) > 0
-            coverage_details[f"requirement_{idx}"] = {
-                "text": requirement,
-                "covered": is_covered,
-                "tests": covering_tests,
-                "quality": "good" if len(covering_tests) >= 2 else "insufficient"
-            }
-            if not is_covered:
-                gaps.append({
-                    "requirement": f"requirement_{idx}",
-                    "description": f"Отсутствуют тесты для: {requirement}"
-                })
-        covered_count = sum(1 for detail in coverage_details.values() if detail["covered"])
-        coverage_score = covered_count / len(requirements) if requirements else 0.0
-        return {
-            "score": coverage_score,
-            "details": coverage_details,
-            "gaps": gaps
-        }
-    def _remove_duplicates(self, tests: List[Dict], duplicates: List[Dict]) -> List[Dict]:
-        duplicate_ids = set()
-        for dup in duplicates:
-            duplicate_ids.update(dup["test_ids"][1:])
-        return [test for test in tests if test["test_id"] not in duplicate_ids]
+    def _analyze_coverage(self, tests: List[Dict], requirements: List[str], semantic: np.ndarray = None) -> Dict:
+        return analyze_coverage(requirements, tests, semantic)
+    async def _coverage_similarity(self, tests: List[Dict], requirements: List[str]) -> Optional[np.ndarray]:
+        # Эмбеддинги тестов уже в кэше после векторной стадии; требований - несколько штук
+        (requirement_embeddings, requirement_fallbacks), (test_embeddings, test_fallbacks) = await asyncio.gather(
+            embed_texts_with_status(list(requirements)),
+            embed_texts_with_status([test_embedding_text(test.get("test_name", ""), test.get("test_code", "")) for test in tests])
+        )
+        if any(requirement_fallbacks) or any(test_fallbacks):
+            # Косинусы хэш-заглушек случайны (0.6-0.85) и дали бы ложное покрытие
+            agent_logger.warning("Embeddings unavailable, coverage is computed lexically")
+            return None
+        return semantic_scores(requirement_embeddings, test_embeddings)
+    def _remove_duplicates(self, tests: List[Dict], clusters: List[Dict]) -> List[Dict]:
+        # Из каждого кластера остаётся только представитель
+        removed_ids = {test_id for cluster in clusters for test_id in cluster["removed"]}
+        return [test for test in tests if test["test_id"] not in removed_ids]
     async def _llm_analysis_duplicates(self, semantic_duplicates: List[Dict], tests: List[Dict], threshold: float) -> List[Dict]:
-        llm_duplicates = []
-        ambiguous_cases = []
-        for dup in semantic_duplicates:
-            similarity = dup.get("similarity_score", 0.0)
-            if 0.75 < similarity < 0.85:
-                ambiguous_cases.append(dup)
+        ambiguous_cases = [
+            dup for dup in semantic_duplicates
+            if settings.optimizer_llm_min_similarity <= dup.get("similarity_score", 0.0) < threshold
+        ]
         if not ambiguous_cases:
             return []
-        agent_logger.info(f"Analyzing {len(ambiguous_cases)} ambiguous cases with LLM")
-        from shared.utils.redis_client import redis_client
-        import json
+        by_id = {test["test_id"]: test for test in tests}
+        # Ключ кэша - отсортированная пара хэшей кода: test_id случайны в каждом запуске, код - нет
+        verdicts: Dict[str, bool] = {}
+        pending: Dict[str, Tuple[str, str]] = {}
+        case_keys = []
         for case in ambiguous_cases:
-            test_id_1, test_id_2 = case["test_ids"]
-            cache_key = f"llm_analysis:{test_id_1}:{test_id_2}"
-            cached_result = redis_client.cache.get(cache_key)
-            if cached_result:
-                try:
-                    result = json.loads(cached_result)
-                    if result.get("is_duplicate", False):
-                        llm_duplicates.append({
-                            "test_ids": case["test_ids"],
-                            "type": "semantic_llm",
-                            "similarity_score": case["similarity_score"],
-                            "test_names": case.get("test_names", [])
-                        })
-                    continue
-                except:
-                    pass
-            test1 = next((t for t in tests if t["test_id"] == test_id_1), None)
-            test2 = next((t for t in tests if t["test_id"] == test_id_2), None)
+            test1, test2 = (by_id.get(test_id) for test_id in case["test_ids"][:2])
             if not test1 or not test2:
+                case_keys.append(None)
+                continue
+            key = self._pair_cache_key(test1["test_code"], test2["test_code"])
+            case_keys.append(key)
+            if key in verdicts or key in pending:
                 continue
             try:
-                prompt = f
-                response = await llm_client.generate(
-                    prompt=prompt,
-                    max_tokens=10,
-                    temperature=0.1
-                )
-                content = response.get("choices", [{}])[0].get("message", {}).get("content", "")
-                is_duplicate = "YES" in content.upper()
-                result = {"is_duplicate": is_duplicate, "similarity": case["similarity_score"]}
-                redis_client.cache.setex(cache_key, 86400, json.dumps(result))
-                if is_duplicate:
-                    llm_duplicates.append({
-                        "test_ids": case["test_ids"],
-                        "type": "semantic_llm",
-                        "similarity_score": case["similarity_score"],
-                        "test_names": case.get("test_names", [])
-                    })
-            except Exception as e:
-                agent_logger.warning(f"Error in LLM analysis: {e}")
+                cached = redis_client.cache.get(key)
+            except Exception:
+                cached = None
+            if cached:
+                try:
+                    verdicts[key] = bool(json.loads(cached).get("is_duplicate", False))
+                    continue
+                except (ValueError, AttributeError):
+                    pass
+            pending[key] = (test1["test_code"], test2["test_code"])
+        if pending:
+            chunks = self._pack_llm_batches(list(pending.items()))
+            agent_logger.info(f"Analyzing {len(pending)} ambiguous pairs with LLM in {len(chunks)} batched prompts")
+            semaphore = asyncio.Semaphore(settings.optimizer_llm_max_concurrency)
+            async def adjudicate(chunk):
+                async with semaphore:
+                    return await self._adjudicate_chunk(chunk)
+            results = await asyncio.gather(*(adjudicate(chunk) for chunk in chunks), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    agent_logger.warning(f"Error in LLM analysis: {result}")
+                    continue
+                for key, is_duplicate in result.items():
+                    verdicts[key] = is_duplicate
+                    try:
+                        redis_client.cache.setex(key, settings.optimizer_llm_cache_ttl, json.dumps({"is_duplicate": is_duplicate}))
+                    except Exception as cache_error:
+                        agent_logger.warning(f"Failed to cache LLM verdict: {cache_error}")
+        llm_duplicates = [
+            {
+                "test_ids": case["test_ids"],
+                "type": "semantic_llm",
+                "similarity_score": case["similarity_score"],
+                "test_names": case.get("test_names", [])
+            }
+            for case, key in zip(ambiguous_cases, case_keys)
+            if key and verdicts.get(key)
+        ]
         agent_logger.info(f"LLM analysis found {len(llm_duplicates)} additional duplicates")
         return llm_duplicates
-    def _generate_recommendations(self, duplicates: List[Dict], coverage: Dict) -> List[str]:
+    def _pair_cache_key(self, first_code: str, second_code: str) -> str:
+        hashes = sorted(hashlib.sha256(code.encode()).hexdigest() for code in (first_code, second_code))
+        return f"llm_duplicate:{hashes[0]}:{hashes[1]}"
+    def _pack_llm_batches(self, items: List[Tuple[str, Tuple[str, str]]]) -> List[List[Tuple[str, Tuple[str, str]]]]:
+        chunks = []
+        current = []
+        current_chars = 0
+        for key, pair in items:
+            pair_chars = len(pair[0]) + len(pair[1])
+            if current and (
+                len(current) >= settings.optimizer_llm_batch_size
+                or current_chars + pair_chars > settings.optimizer_llm_batch_chars
+            ):
+                chunks.append(current)
+                current = []
+                current_chars = 0
+            current.append((key, pair))
+            current_chars += pair_chars
+        if current:
+            chunks.append(current)
+        return chunks
+    async def _adjudicate_chunk(self, chunk: List[Tuple[str, Tuple[str, str]]]) -> Dict[str, bool]:
+        pairs_block = "\n\n".join(
+            f"### PAIR {idx}\nTEST A:\n```python\n{first}\n```\nTEST B:\n```python\n{second}\n```"
+            for idx, (_, (first, second)) in enumerate(chunk)
+        )
+        response = await llm_client.generate(
+            prompt=LLM_DUPLICATE_PROMPT.format(count=len(chunk), pairs=pairs_block),
+            system_prompt=LLM_DUPLICATE_SYSTEM_PROMPT,
+            temperature=0.0,
+            max_tokens=min(2048, 64 + 24 * len(chunk))
+        )
+        content = response.get("choices", [{}])[0].get("message", {}).get("content", "")
+        parsed = parse_json_response(content)
+        if isinstance(parsed, dict):
+            parsed = parsed.get("verdicts", [])
+        verdicts = {}
+        for item in parsed or []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                idx = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if 0 <= idx < len(chunk):
+                verdicts[chunk[idx][0]] = str(item.get("duplicate", "NO")).upper() in ("YES", "TRUE")
+        return verdicts
+    def _generate_recommendations(self, clusters: List[Dict], coverage: Dict) -> List[str]:
         recommendations = []
-        if duplicates:
-            recommendations.append(f"Удалить {len(duplicates)} дубликатов")
+        removed = sum(len(cluster["removed"]) for cluster in clusters)
+        if removed:
+            recommendations.append(f"Удалить {removed} дубликатов ({len(clusters)} групп)")
         if coverage["gaps"]:
             recommendations.append(f"Добавить тесты для {len(coverage['gaps'])} непокрытых требований")
         return recommendations
\ No newline at end of file
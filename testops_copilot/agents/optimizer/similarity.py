@@ -0,0 +1,38 @@
+from typing import Sequence, Tuple
+import numpy as np
+def normalize_embeddings(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    # Один раз приводим к float32 и единичной норме: косинус становится скалярным произведением
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+def similar_pairs(
+    matrix: np.ndarray,
+    threshold: float,
+    block_size: int = 2048
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Все пары (i < j) с косинусной близостью >= threshold для нормализованной матрицы.
+    Считается плитками block_size x block_size только над диагональю, поэтому память
+    ограничена одной плиткой, а не n x n.
+    """
+    n = len(matrix)
+    rows, cols, scores = [], [], []
+    for row_start in range(0, n, block_size):
+        row_block = matrix[row_start:row_start + block_size]
+        for col_start in range(row_start, n, block_size):
+            tile = row_block @ matrix[col_start:col_start + block_size].T
+            mask = tile >= threshold
+            if col_start == row_start:
+                # Диагональная плитка: берём только верхний треугольник без самих себя
+                mask = np.triu(mask, k=1)
+            local_rows, local_cols = np.nonzero(mask)
+            if len(local_rows):
+                rows.append(local_rows + row_start)
+                cols.append(local_cols + col_start)
+                scores.append(tile[local_rows, local_cols])
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
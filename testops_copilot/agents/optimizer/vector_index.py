@@ -0,0 +1,179 @@
+import fcntl
+import glob
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+# Имя файла -> байт на строку (без учёта размерности для векторов); файл списков IVF берётся из meta.json
+ROW_FILES = {"vectors.f32": 4, "ids.bin": 16}
+class VectorIndex:
+    """
+    Персистентный IVF-индекс эмбеддингов тестов на memory-mapped файлах.
+    Векторы, id и номера списков дописываются в конец файлов под flock, meta.json заменяется атомарно
+    последним, поэтому читатели видят только целиком записанные строки. Обучение пишет центроиды и списки
+    в новые файлы с версией (centroids.<trained_count>.f32), на которые ссылается meta.json: замена meta -
+    единственная точка публикации. Чтение идёт через np.memmap: страницы файла общие для всех воркеров.
+    Пока векторов меньше train_min, поиск полный; дальше - по nprobe ближайшим центроидам.
+    """
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        train_min: Optional[int] = None
+    ):
+        self.path = path or settings.optimizer_index_path
+        self.nprobe = nprobe or settings.optimizer_index_nprobe
+        self.train_min = train_min or settings.optimizer_index_train_min
+        self._view = None
+        self._view_key = None
+        self._view_lock = threading.Lock()
+    def count(self) -> int:
+        return self._read_meta().get("count", 0)
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        os.makedirs(self.path, exist_ok=True)
+        with self._write_lock():
+            meta = self._read_meta()
+            dim = meta.get("dim") or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {dim}")
+            count = meta.get("count", 0)
+            # Хвост от прерванной записи (строки после count) отрезаем, чтобы файлы оставались выровнены
+            for name, row_bytes in ROW_FILES.items():
+                self._truncate(name, count * row_bytes * (dim if name == "vectors.f32" else 1))
+            self._truncate(self._lists_file(meta), count * 4)
+            lists = self._assign(vectors, self._load_centroids(meta))
+            id_bytes = b"".join(uuid.UUID(str(test_id)).bytes for test_id in ids)
+            self._append("vectors.f32", vectors.tobytes())
+            self._append("ids.bin", id_bytes)
+            self._append(self._lists_file(meta), lists.tobytes())
+            meta.update({"dim": dim, "count": count + len(ids)})
+            trained = meta.get("trained_count", 0)
+            previous = {self._lists_file(meta), self._centroids_file(meta)}
+            if meta["count"] >= self.train_min and (not trained or meta["count"] >= 4 * trained):
+                self._train(meta)
+            self._write_atomic("meta.json", json.dumps(meta).encode())
+            self._remove_stale_versions(meta, previous)
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[str, float]]]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        view = self._load_view()
+        if view is None or view["dim"] != queries.shape[1]:
+            return [[] for _ in range(len(queries))]
+        results = []
+        for query in queries:
+            if view["centroids"] is None:
+                rows = np.arange(len(view["vectors"]))
+                scores = view["vectors"] @ query
+            else:
+                probes = np.argsort(view["centroids"] @ query)[-self.nprobe:]
+                rows = np.sort(np.concatenate([view["order"][view["offsets"][c]:view["offsets"][c + 1]] for c in probes]))
+                scores = view["vectors"][rows] @ query
+            top = np.argsort(scores)[::-1][:k]
+            results.append([
+                (str(uuid.UUID(bytes=view["ids"][rows[idx]].tobytes())), float(scores[idx]))
+                for idx in top
+            ])
+        return results
+    def _load_view(self):
+        meta = self._read_meta()
+        count = meta.get("count", 0)
+        if not count:
+            return None
+        key = (count, meta.get("trained_count", 0))
+        with self._view_lock:
+            if self._view_key == key:
+                return self._view
+            dim = meta["dim"]
+            view = {
+                "dim": dim,
+                "vectors": np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim)),
+                "ids": np.memmap(self._file("ids.bin"), dtype=np.uint8, mode="r", shape=(count, 16)),
+                "centroids": self._load_centroids(meta)
+            }
+            if view["centroids"] is not None:
+                # Строки каждого списка IVF подряд: order[offsets[c]:offsets[c + 1]]
+                lists = np.fromfile(self._file(self._lists_file(meta)), dtype=np.int32, count=count)
+                view["order"] = np.argsort(lists, kind="stable")
+                view["offsets"] = np.searchsorted(lists[view["order"]], np.arange(len(view["centroids"]) + 1))
+            self._view, self._view_key = view, key
+            return view
+    def _train(self, meta: dict):
+        count, dim = meta["count"], meta["dim"]
+        vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+        nlist = int(min(4096, max(1, 4 * np.sqrt(count))))
+        rng = np.random.default_rng(0)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, size=min(count, nlist * 64), replace=False))])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        # Сферический k-means: векторы нормализованы, близость - скалярное произведение
+        for _ in range(10):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[c] = centroid / norm if norm > 0 else centroid
+        lists = np.concatenate([
+            self._assign(np.asarray(vectors[start:start + 65536]), centroids)
+            for start in range(0, count, 65536)
+        ])
+        # Новые файлы не видны читателям, пока meta.json ссылается на прежнюю версию
+        lists_file, centroids_file = f"lists.{count}.i32", f"centroids.{count}.f32"
+        self._write_atomic(lists_file, lists.tobytes())
+        self._write_atomic(centroids_file, centroids.astype(np.float32).tobytes())
+        meta.update({"trained_count": count, "nlist": nlist, "lists_file": lists_file, "centroids_file": centroids_file})
+        agent_logger.info(f"[VECTOR_INDEX] Trained IVF index: {count} vectors, {nlist} lists")
+    def _assign(self, vectors: np.ndarray, centroids: Optional[np.ndarray]) -> np.ndarray:
+        if centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+    def _load_centroids(self, meta: dict) -> Optional[np.ndarray]:
+        if not meta.get("nlist"):
+            return None
+        return np.fromfile(self._file(self._centroids_file(meta)), dtype=np.float32).reshape(meta["nlist"], meta["dim"])
+    def _lists_file(self, meta: dict) -> str:
+        return meta.get("lists_file", "lists.i32")
+    def _centroids_file(self, meta: dict) -> str:
+        return meta.get("centroids_file", "centroids.f32")
+    def _remove_stale_versions(self, meta: dict, previous: set):
+        # Предыдущая версия остаётся для читателей, успевших прочитать старый meta.json; более старые удаляются
+        keep = previous | {self._lists_file(meta), self._centroids_file(meta)}
+        for path in glob.glob(self._file("lists.*i32")) + glob.glob(self._file("centroids.*f32")):
+            if os.path.basename(path) not in keep:
+                os.remove(path)
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    def _truncate(self, name: str, size: int):
+        path = self._file(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+    def _append(self, name: str, data: bytes):
+        with open(self._file(name), "ab") as f:
+            f.write(data)
+    def _write_atomic(self, name: str, data: bytes):
+        tmp = self._file(f"{name}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._file(name))
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    @contextmanager
+    def _write_lock(self):
+        with open(self._file(".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+test_vector_index = VectorIndex()
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from playwright.async_api import async_playwright, Browser
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+from shared.utils.async_runtime import async_runtime
+class BrowserPool:
+    """
+    Один Chromium на процесс воркера.
+    Playwright работает в общем event loop процесса (async_runtime), поэтому пулом можно
+    пользоваться из любых потоков (узлы LangGraph выполняются в ThreadPoolExecutor).
+    """
+    def __init__(
+        self,
+        max_contexts: Optional[int] = None,
+        recycle_after: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        # Без пула Chromium запускается на каждый вызов context() и закрывается после него
+        self.enabled = settings.recon_browser_pool_enabled if enabled is None else enabled
+        self.max_contexts = max_contexts or settings.recon_browser_max_contexts
+        self.recycle_after = recycle_after or settings.recon_browser_recycle_after
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._context_slots = None
+        self._active = {}
+        self._pages_served = 0
+        self.launches = 0
+    def start(self):
+        with self._start_lock:
+            if self._pid == os.getpid() and self._context_slots is not None:
+                return
+            # После fork браузер родителя недоступен - поднимаем заново в процессе воркера
+            self._pid = os.getpid()
+            self._playwright = None
+            self._browser = None
+            self._active = {}
+            async_runtime.run_coro(self._init(), timeout=settings.recon_browser_launch_timeout)
+    def run(self, coro, timeout: Optional[float] = None) -> Any:
+        self.start()
+        return async_runtime.run_coro(coro, timeout)
+    def shutdown(self):
+        if self._pid != os.getpid() or self._context_slots is None:
+            return
+        try:
+            async_runtime.run_coro(self._close(), timeout=30)
+        except Exception as e:
+            agent_logger.warning(f"[BROWSER_POOL] Shutdown error: {e}")
+        self._context_slots = None
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "launches": self.launches,
+            "pages_served": self._pages_served,
+            "active_contexts": sum(self._active.values()),
+            "connected": bool(self._browser and self._browser.is_connected())
+        }
+    @asynccontextmanager
+    async def context(self, **context_kwargs):
+        async with self._context_slots:
+            if not self.enabled:
+                # Пул выключен: отдельный Chromium на каждый вызов
+                browser = await self._start_browser()
+                try:
+                    async with self._new_context(browser, context_kwargs) as context:
+                        yield context
+                finally:
+                    try:
+                        await browser.close()
+                    except Exception:
+                        pass
+                return
+            browser = await self._acquire_browser()
+            self._active[id(browser)] = self._active.get(id(browser), 0) + 1
+            self._pages_served += 1
+            try:
+                async with self._new_context(browser, context_kwargs) as context:
+                    yield context
+            finally:
+                self._active[id(browser)] = self._active.get(id(browser), 1) - 1
+                await self._close_if_retired(browser)
+    @asynccontextmanager
+    async def _new_context(self, browser: Browser, context_kwargs: Dict[str, Any]):
+        context = None
+        try:
+            context = await browser.new_context(**context_kwargs)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+    async def _init(self):
+        self._browser_lock = asyncio.Lock()
+        self._context_slots = asyncio.Semaphore(self.max_contexts)
+        if not self.enabled:
+            return
+        async with self._browser_lock:
+            await self._launch()
+    async def _start_browser(self) -> Browser:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(
+            headless=True,
+            args=["--disable-dev-shm-usage", "--disable-gpu"]
+        )
+    async def _launch(self):
+        self._browser = await self._start_browser()
+        self._pages_served = 0
+        self.launches += 1
+        agent_logger.info(f"[BROWSER_POOL] Chromium launched (pid={os.getpid()}, launch #{self.launches})")
+    async def _acquire_browser(self) -> Browser:
+        async with self._browser_lock:
+            if self._browser is None or not self._browser.is_connected():
+                # Упавший браузер убирается из _active, когда закроются открытые на нём контексты
+                crashed = self._browser
+                if crashed is not None:
+                    agent_logger.warning("[BROWSER_POOL] Chromium disconnected, relaunching")
+                await self._launch()
+                if crashed is not None:
+                    await self._close_if_retired(crashed)
+            elif self._pages_served >= self.recycle_after:
+                # Старый браузер закрывается, когда на нём завершится последний контекст
+                retired = self._browser
+                agent_logger.info(f"[BROWSER_POOL] Recycling Chromium after {self._pages_served} pages")
+                await self._launch()
+                await self._close_if_retired(retired)
+            return self._browser
+    async def _close_if_retired(self, browser: Browser):
+        if browser is self._browser or self._active.get(id(browser), 0) > 0:
+            return
+        self._active.pop(id(browser), None)
+        try:
+            await browser.close()
+        except Exception:
+            pass
+    async def _close(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+browser_pool = BrowserPool()
@@ -0,0 +1,192 @@
+import re
+import time
+from html.parser import HTMLParser as StdlibHTMLParser
+from typing import Dict, Any, List, Optional
+from urllib.parse import urljoin
+import httpx
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+    SelectolaxParser = None
+BUTTON_SELECTOR = 'button, [role="button"], input[type="button"], input[type="submit"]'
+INPUT_SELECTOR = "input, textarea, select"
+LINK_SELECTOR = "a[href]"
+# Пустой контейнер SPA или просьба включить JS - значит, структура появится только после рендеринга
+SPA_MOUNT_PATTERN = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__nuxt|__next)["\'][^>]*>\s*</div>',
+    re.IGNORECASE
+)
+NOSCRIPT_JS_PATTERN = re.compile(r"<noscript[^>]*>[^<]*(?:enable|включите)[^<]*javascript", re.IGNORECASE)
+def _input_type(tag: str, type_attr: str, multiple: bool) -> str:
+    # Значение DOM-свойства element.type, как его отдаёт JS-экстрактор браузерного бэкенда
+    if tag == "select":
+        return "select-multiple" if multiple else "select-one"
+    if tag == "textarea":
+        return "textarea"
+    return type_attr.lower() or "text"
+class HtmlSnapshotParser:
+    def parse(self, html: str, url: str) -> Dict[str, Any]:
+        started = time.monotonic()
+        limit = settings.recon_max_elements
+        if SELECTOLAX_AVAILABLE:
+            structure = self._parse_selectolax(html, url, limit)
+        else:
+            structure = self._parse_stdlib(html, url, limit)
+        structure.update({
+            "url": url,
+            "timestamp": time.time(),
+            "backend": "html",
+            "timings": {"extraction_ms": int((time.monotonic() - started) * 1000)}
+        })
+        return structure
+    def needs_javascript(self, html: str, structure: Dict[str, Any]) -> bool:
+        if SPA_MOUNT_PATTERN.search(html) or NOSCRIPT_JS_PATTERN.search(html):
+            return True
+        interactive = len(structure["buttons"]) + len(structure["inputs"]) + len(structure["links"])
+        return interactive == 0
+    def fetch(self, url: str, timeout: int) -> Optional[str]:
+        try:
+            with httpx.Client(timeout=timeout, follow_redirects=True, verify=False) as client:
+                response = client.get(url, headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"})
+            if response.status_code >= 400 or "html" not in response.headers.get("content-type", "html"):
+                return None
+            return response.text
+        except httpx.HTTPError as e:
+            agent_logger.warning(f"[RECON] HTML fetch failed for {url}: {e}")
+            return None
+    def _parse_selectolax(self, html: str, url: str, limit: int) -> Dict[str, Any]:
+        tree = SelectolaxParser(html)
+        title_node = tree.css_first("title")
+        def attr(node, name):
+            return node.attributes.get(name) or ""
+        def select(selector):
+            # css() со списком селекторов группирует узлы по селектору; querySelectorAll - в порядке документа
+            matched = {node.mem_id for node in tree.css(selector)}
+            return [node for node in tree.root.traverse() if node.mem_id in matched][:limit]
+        buttons = [
+            {
+                "text": ((node.text(strip=True) or attr(node, "value")))[:200],
+                "id": attr(node, "id"),
+                "type": attr(node, "type").lower() or ("submit" if node.tag == "button" else "button"),
+                "dataTestId": attr(node, "data-testid")
+            }
+            for node in select(BUTTON_SELECTOR)
+        ]
+        inputs = [
+            {
+                "type": _input_type(node.tag, attr(node, "type"), "multiple" in node.attributes),
+                "id": attr(node, "id"),
+                "name": attr(node, "name"),
+                "placeholder": attr(node, "placeholder"),
+                "dataTestId": attr(node, "data-testid")
+            }
+            for node in select(INPUT_SELECTOR)
+        ]
+        links = [
+            {
+                "text": node.text(strip=True)[:200],
+                "href": urljoin(url, attr(node, "href")),
+                "id": attr(node, "id"),
+                "dataTestId": attr(node, "data-testid")
+            }
+            for node in select(LINK_SELECTOR)
+        ]
+        selectors = {}
+        for node in tree.css("[data-testid]"):
+            test_id = attr(node, "data-testid")
+            if test_id and test_id not in selectors:
+                selectors[test_id] = f'[data-testid="{test_id}"]'
+                if len(selectors) >= limit * 4:
+                    break
+        return {
+            "title": title_node.text(strip=True) if title_node else "",
+            "buttons": buttons,
+            "inputs": inputs,
+            "links": links,
+            "selectors": selectors
+        }
+    def _parse_stdlib(self, html: str, url: str, limit: int) -> Dict[str, Any]:
+        collector = _StructureCollector(url, limit)
+        collector.feed(html)
+        collector.close()
+        return collector.result()
+class _StructureCollector(StdlibHTMLParser):
+    VOID_TAGS = {"input", "img", "br", "hr", "meta", "link", "area", "base", "col", "embed", "source", "track", "wbr"}
+    def __init__(self, url: str, limit: int):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.limit = limit
+        self.title = ""
+        self.buttons: List[Dict[str, str]] = []
+        self.inputs: List[Dict[str, str]] = []
+        self.links: List[Dict[str, str]] = []
+        self.selectors: Dict[str, str] = {}
+        # Открытые элементы, в которые собирается текст: (тег, словарь элемента или None для title)
+        self._capturing: List[tuple] = []
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        test_id = attrs.get("data-testid", "")
+        if test_id and test_id not in self.selectors and len(self.selectors) < self.limit * 4:
+            self.selectors[test_id] = f'[data-testid="{test_id}"]'
+        input_type = attrs.get("type", "").lower()
+        element = None
+        if tag == "title":
+            self._capturing.append((tag, None))
+            return
+        if tag == "button" or attrs.get("role") == "button" or (tag == "input" and input_type in ("button", "submit")):
+            element = {
+                "text": attrs.get("value", ""),
+                "id": attrs.get("id", ""),
+                "type": input_type or ("submit" if tag == "button" else "button"),
+                "dataTestId": test_id
+            }
+            if len(self.buttons) < self.limit:
+                self.buttons.append(element)
+        if tag in ("input", "textarea", "select") and len(self.inputs) < self.limit:
+            self.inputs.append({
+                "type": _input_type(tag, input_type, "multiple" in attrs),
+                "id": attrs.get("id", ""),
+                "name": attrs.get("name", ""),
+                "placeholder": attrs.get("placeholder", ""),
+                "dataTestId": test_id
+            })
+        if tag == "a" and "href" in attrs:
+            element = {
+                "text": "",
+                "href": urljoin(self.url, attrs["href"]),
+                "id": attrs.get("id", ""),
+                "dataTestId": test_id
+            }
+            if len(self.links) < self.limit:
+                self.links.append(element)
+        if element is not None and tag not in self.VOID_TAGS:
+            if element["text"]:
+                element["text"] = ""
+            self._capturing.append((tag, element))
+    def handle_endtag(self, tag):
+        for idx in range(len(self._capturing) - 1, -1, -1):
+            if self._capturing[idx][0] == tag:
+                del self._capturing[idx:]
+                break
+    def handle_data(self, data):
+        text = data.strip()
+        if not text:
+            return
+        for tag, element in self._capturing:
+            if element is None:
+                self.title = (self.title + " " + text).strip()
+            elif len(element["text"]) < 200:
+                element["text"] = (element["text"] + " " + text).strip()[:200]
+    def result(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "buttons": self.buttons,
+            "inputs": self.inputs,
+            "links": self.links,
+            "selectors": self.selectors
+        }
+html_snapshot_parser = HtmlSnapshotParser()
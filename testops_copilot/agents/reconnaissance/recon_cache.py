@@ -0,0 +1,140 @@
+import hashlib
+import json
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+import httpx
+from agents.reconnaissance.site_crawler import normalize_url
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+from shared.utils.redis_client import redis_client
+STATS_KEY = "recon_cache:stats"
+# Атрибуты, которые меняются при каждой отдаче страницы и не влияют на структуру
+VOLATILE_PATTERNS = [
+    re.compile(rb'\snonce="[^"]*"'),
+    re.compile(rb'name="csrf[^"]*"\s+content="[^"]*"'),
+    re.compile(rb'\s+'),
+]
+def html_fingerprint(body: bytes) -> str:
+    for pattern in VOLATILE_PATTERNS:
+        body = pattern.sub(b" ", body)
+    return hashlib.sha256(body).hexdigest()
+class ReconCache:
+    def key(self, url: str, variant: str = "page") -> str:
+        digest = hashlib.sha256(f"{variant}|{normalize_url(url)}".encode()).hexdigest()
+        return f"recon_cache:{digest}"
+    def get_or_analyze(
+        self,
+        url: str,
+        analyze: Callable[[], Dict[str, Any]],
+        variant: str = "page",
+        ttl: Optional[int] = None,
+        bypass: bool = False
+    ) -> Dict[str, Any]:
+        if not settings.recon_cache_enabled:
+            return analyze()
+        key = self.key(url, variant)
+        entry = None if bypass else self._load(key)
+        if bypass:
+            self._incr("bypass")
+        validators = None
+        if entry is not None:
+            validators = self._revalidate(url, entry)
+            if validators is not None and validators.get("unchanged"):
+                self._incr("hits")
+                self._incr("browser_seconds_saved", entry.get("recon_seconds", 0.0))
+                agent_logger.info(f"[RECON_CACHE] Hit for {url}, browser recon skipped")
+                page_structure = entry["page_structure"]
+                page_structure["cache"] = {"hit": True, "cached_at": entry.get("cached_at")}
+                return page_structure
+            self._incr("stale")
+        self._incr("misses")
+        started = time.monotonic()
+        page_structure = analyze()
+        recon_seconds = time.monotonic() - started
+        if not page_structure.get("error"):
+            if not validators or "html_hash" not in validators:
+                validators = self._fetch_validators(url)
+            self._store(key, {
+                "page_structure": page_structure,
+                "recon_seconds": recon_seconds,
+                "cached_at": time.time(),
+                **{k: v for k, v in (validators or {}).items() if k != "unchanged"}
+            }, ttl or settings.recon_cache_ttl)
+        page_structure["cache"] = {"hit": False}
+        return page_structure
+    def stats(self) -> Dict[str, Any]:
+        try:
+            raw = redis_client.cache.hgetall(STATS_KEY)
+        except Exception as e:
+            agent_logger.warning(f"[RECON_CACHE] Stats unavailable: {e}")
+            raw = {}
+        hits = int(raw.get("hits", 0))
+        misses = int(raw.get("misses", 0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "stale": int(raw.get("stale", 0)),
+            "bypass": int(raw.get("bypass", 0)),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "browser_seconds_saved": round(float(raw.get("browser_seconds_saved", 0.0)), 2)
+        }
+    def _revalidate(self, url: str, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Сначала условный HEAD по ETag/Last-Modified, иначе - хэш HTML без рендеринга
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with httpx.Client(timeout=settings.recon_cache_revalidate_timeout, follow_redirects=True, verify=False) as client:
+                if headers:
+                    response = client.head(url, headers=headers)
+                    if response.status_code == 304:
+                        return {"unchanged": True}
+                    etag = response.headers.get("etag")
+                    if etag and entry.get("etag") == etag:
+                        return {"unchanged": True}
+                if entry.get("html_hash"):
+                    validators = self._validators_from_response(client.get(url))
+                    validators["unchanged"] = validators.get("html_hash") == entry["html_hash"]
+                    return validators
+        except httpx.HTTPError as e:
+            agent_logger.warning(f"[RECON_CACHE] Revalidation failed for {url}: {e}")
+        return None
+    def _fetch_validators(self, url: str) -> Dict[str, Any]:
+        try:
+            with httpx.Client(timeout=settings.recon_cache_revalidate_timeout, follow_redirects=True, verify=False) as client:
+                return self._validators_from_response(client.get(url))
+        except httpx.HTTPError as e:
+            agent_logger.warning(f"[RECON_CACHE] Failed to fetch validators for {url}: {e}")
+            return {}
+    def _validators_from_response(self, response: httpx.Response) -> Dict[str, Any]:
+        if response.status_code >= 400:
+            return {}
+        return {
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "html_hash": html_fingerprint(response.content)
+        }
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = redis_client.cache.get(key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            agent_logger.warning(f"[RECON_CACHE] Failed to read cache: {e}")
+            return None
+    def _store(self, key: str, entry: Dict[str, Any], ttl: int):
+        try:
+            redis_client.cache.setex(key, ttl, json.dumps(entry, default=str))
+        except Exception as e:
+            agent_logger.warning(f"[RECON_CACHE] Failed to store cache entry: {e}")
+    def _incr(self, field: str, amount: float = 1):
+        try:
+            if isinstance(amount, float):
+                redis_client.cache.hincrbyfloat(STATS_KEY, field, amount)
+            else:
+                redis_client.cache.hincrby(STATS_KEY, field, amount)
+        except Exception:
+            pass
+recon_cache = ReconCache()
@@ -1,32 +1,103 @@
-
-from playwright.sync_api import sync_playwright, Page, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Page, Route, TimeoutError as PlaywrightTimeoutError
 from typing import Dict, Any, List
+from urllib.parse import urlparse
 import json
 import time
+from agents.reconnaissance.browser_pool import browser_pool
+from agents.reconnaissance.html_snapshot import html_snapshot_parser
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+from shared.utils.async_runtime import DeadlineExceeded
+EXTRACTION_SCRIPT = """
+(limit) => {
+    const take = (selector, map) => {
+        const result = [];
+        for (const el of document.querySelectorAll(selector)) {
+            if (result.length >= limit) break;
+            result.push(map(el));
+        }
+        return result;
+    };
+    const selectors = {};
+    let selectorCount = 0;
+    for (const el of document.querySelectorAll('[data-testid]')) {
+        const testId = el.getAttribute('data-testid');
+        if (testId && !(testId in selectors)) {
+            selectors[testId] = `[data-testid="${testId}"]`;
+            if (++selectorCount >= limit * 4) break;
+        }
+    }
+    return {
+        title: document.title,
+        buttons: take('button, [role="button"], input[type="button"], input[type="submit"]', btn => ({
+            text: (btn.textContent?.trim() || btn.value || '').slice(0, 200),
+            id: btn.id || '',
+            type: btn.type || 'button',
+            dataTestId: btn.getAttribute('data-testid') || ''
+        })),
+        inputs: take('input, textarea, select', input => ({
+            type: input.type || 'text',
+            id: input.id || '',
+            name: input.name || '',
+            placeholder: input.placeholder || '',
+            dataTestId: input.getAttribute('data-testid') || ''
+        })),
+        links: take('a[href]', link => ({
+            text: (link.textContent?.trim() || '').slice(0, 200),
+            href: link.href || '',
+            id: link.id || '',
+            dataTestId: link.getAttribute('data-testid') || ''
+        })),
+        selectors
+    };
+}
+"""
 class ReconnaissanceAgent:
+    def analyze(
+        self,
+        url: str,
+        timeout: int = 90,
+        backend: str = None,
+        html_content: str = None
+    ) -> Dict[str, Any]:
+        backend = backend or settings.recon_backend
+        if html_content is not None:
+            return html_snapshot_parser.parse(html_content, url)
+        if backend == "browser":
+            return self.analyze_page(url, timeout)
+        html = html_snapshot_parser.fetch(url, timeout=min(timeout, 30))
+        if html is not None:
+            page_structure = html_snapshot_parser.parse(html, url)
+            # auto: HTML-снимок достаточен для серверного рендеринга, Chromium нужен только для SPA
+            if backend == "html" or not html_snapshot_parser.needs_javascript(html, page_structure):
+                agent_logger.info(f"[RECON] {url} analyzed from HTML snapshot in {page_structure['timings']['extraction_ms']}ms")
+                return page_structure
+        elif backend == "html":
+            return {
+                "title": "Unknown",
+                "url": url,
+                "buttons": [],
+                "inputs": [],
+                "links": [],
+                "selectors": {},
+                "timestamp": time.time(),
+                "error": f"Failed to fetch HTML for {url}"
+            }
+        return self.analyze_page(url, timeout)
     def analyze_page(self, url: str, timeout: int = 90) -> Dict[str, Any]:
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                with sync_playwright() as p:
-                    browser = p.chromium.launch(headless=True)
-                    context = browser.new_context(
-                        viewport={"width": 1920, "height": 1080},
-                        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                        ignore_https_errors=True
-                    )
-                    page = context.new_page()
-                    # Используем load вместо networkidle для более быстрой загрузки
-                    page.goto(url, wait_until="load", timeout=timeout * 1000)
-                    page_structure = self._extract_page_structure(page, url)
-                    browser.close()
-                    return page_structure
+                # Браузер переиспользуется из пула воркера, на запрос создаётся только новый контекст
+                return browser_pool.run(self._analyze_page(url, timeout), timeout=timeout + 30)
+            except DeadlineExceeded:
+                # Дедлайн узла исчерпан: повтор не поможет, корутина уже отменена
+                raise
             except PlaywrightTimeoutError:
                 if attempt < max_retries - 1:
                     time.sleep(2)
                     continue
                 error_msg = f"Page load timeout after {max_retries} attempts for {url}"
-                from shared.utils.logger import agent_logger
                 agent_logger.error(f"Reconnaissance error: {error_msg}")
                 # Возвращаем минимальную структуру вместо исключения, чтобы workflow мог продолжиться
                 return {
@@ -44,7 +115,6 @@ class ReconnaissanceAgent:
                     time.sleep(2)
                     continue
                 error_msg = f"Error analyzing page {url}: {str(e)}"
-                from shared.utils.logger import agent_logger
                 agent_logger.error(f"Reconnaissance error: {error_msg}", exc_info=True)
                 # Возвращаем минимальную структуру вместо исключения
                 return {
@@ -57,66 +127,54 @@ class ReconnaissanceAgent:
                     "timestamp": time.time(),
                     "error": error_msg
                 }
-    def _extract_page_structure(self, page: Page, url: str) -> Dict[str, Any]:
-        title = page.title()
-        buttons = page.evaluate("""
-            () => {
-                const buttons = Array.from(document.querySelectorAll('button, [role="button"], input[type="button"], input[type="submit"]'));
-                return buttons.map(btn => ({
-                    text: btn.textContent?.trim() || btn.value || '',
-                    id: btn.id || '',
-                    type: btn.type || 'button',
-                    dataTestId: btn.getAttribute('data-testid') || ''
-                }));
-            }
-        """)
-        inputs = page.evaluate("""
-            () => {
-                const inputs = Array.from(document.querySelectorAll('input, textarea, select'));
-                return inputs.map(input => ({
-                    type: input.type || 'text',
-                    id: input.id || '',
-                    name: input.name || '',
-                    placeholder: input.placeholder || '',
-                    dataTestId: input.getAttribute('data-testid') || ''
-                }));
-            }
-        """)
-        links = page.evaluate("""
-            () => {
-                const links = Array.from(document.querySelectorAll('a[href]'));
-                return links.map(link => ({
-                    text: link.textContent?.trim() || '',
-                    href: link.href || '',
-                    id: link.id || '',
-                    dataTestId: link.getAttribute('data-testid') || ''
-                }));
-            }
-        """)
-        selectors = self._generate_selectors(page)
+    async def _analyze_page(self, url: str, timeout: int) -> Dict[str, Any]:
+        started = time.monotonic()
+        async with browser_pool.context(
+            viewport={"width": 1920, "height": 1080},
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            ignore_https_errors=True
+        ) as context:
+            blocked = {"count": 0}
+            if settings.recon_block_resources:
+                await context.route("**/*", lambda route: self._route_request(route, blocked))
+            page = await context.new_page()
+            context_ready = time.monotonic()
+            await page.goto(url, wait_until="load", timeout=timeout * 1000)
+            loaded = time.monotonic()
+            page_structure = await self._extract_page_structure(page, url)
+            extracted = time.monotonic()
+        page_structure["timings"] = {
+            "context_ms": int((context_ready - started) * 1000),
+            "navigation_ms": int((loaded - context_ready) * 1000),
+            "extraction_ms": int((extracted - loaded) * 1000),
+            "total_ms": int((time.monotonic() - started) * 1000)
+        }
+        page_structure["blocked_requests"] = blocked["count"]
+        agent_logger.info(
+            f"[RECON] {url} analyzed in {page_structure['timings']['total_ms']}ms",
+            extra={**page_structure["timings"], "blocked_requests": blocked["count"]}
+        )
+        return page_structure
+    async def _route_request(self, route: Route, blocked: Dict[str, int]):
+        request = route.request
+        host = urlparse(request.url).hostname or ""
+        # Картинки, шрифты, медиа и трекеры не нужны для анализа DOM, но задерживают событие load
+        if request.resource_type in settings.recon_blocked_resource_types or any(
+            host == domain or host.endswith("." + domain) for domain in settings.recon_blocked_domains
+        ):
+            blocked["count"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+    async def _extract_page_structure(self, page: Page, url: str) -> Dict[str, Any]:
+        # Один evaluate вместо пяти: ограничение по количеству применяется в браузере
+        data = await page.evaluate(EXTRACTION_SCRIPT, settings.recon_max_elements)
         return {
-            "title": title,
+            "title": data["title"],
             "url": url,
-            "buttons": buttons[:50],
-            "inputs": inputs[:50],
-            "links": links[:50],
-            "selectors": selectors,
+            "buttons": data["buttons"],
+            "inputs": data["inputs"],
+            "links": data["links"],
+            "selectors": data["selectors"],
             "timestamp": time.time()
         }
-    def _generate_selectors(self, page: Page) -> Dict[str, str]:
-        selectors = {}
-        testid_elements = page.evaluate("""
-            () => {
-                const elements = Array.from(document.querySelectorAll('[data-testid]'));
-                const result = {};
-                elements.forEach(el => {
-                    const testId = el.getAttribute('data-testid');
-                    if (testId) {
-                        result[testId] = `[data-testid="${testId}"]`;
-                    }
-                });
-                return result;
-            }
-        """)
-        selectors.update(testid_elements)
-        return selectors
\ No newline at end of file
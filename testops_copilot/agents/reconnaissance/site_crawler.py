@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, urlunparse
+from agents.reconnaissance.browser_pool import browser_pool
+from agents.reconnaissance.reconnaissance_agent import ReconnaissanceAgent
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".zip", ".gz", ".rar", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp",
+    ".ico", ".mp4", ".mp3", ".avi", ".doc", ".docx", ".xls", ".xlsx", ".exe", ".dmg"
+)
+def normalize_url(url: str) -> str:
+    parsed = urlparse(url.strip())
+    path = parsed.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), path, "", parsed.query, ""))
+def dom_fingerprint(page_structure: Dict[str, Any]) -> str:
+    # Отпечаток по интерактивной структуре страницы: шаблонные страницы
+    # (карточки товаров, статьи) с разным текстом дают одинаковый отпечаток
+    signature = {
+        "buttons": sorted((b.get("id", ""), b.get("type", ""), b.get("dataTestId", "")) for b in page_structure.get("buttons", [])),
+        "inputs": sorted((i.get("type", ""), i.get("name", ""), i.get("id", ""), i.get("dataTestId", "")) for i in page_structure.get("inputs", [])),
+        "selectors": sorted(page_structure.get("selectors", {}))
+    }
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()
+class SiteCrawler:
+    def __init__(
+        self,
+        max_depth: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.max_depth = settings.recon_crawl_max_depth if max_depth is None else max_depth
+        self.max_pages = max_pages or settings.recon_crawl_max_pages
+        self.concurrency = concurrency or settings.recon_crawl_concurrency
+        self.recon_agent = ReconnaissanceAgent()
+    def crawl(self, url: str, timeout: int = 90) -> Dict[str, Any]:
+        return browser_pool.run(self._crawl(url, timeout), timeout=settings.recon_crawl_timeout)
+    async def _crawl(self, start_url: str, timeout: int) -> Dict[str, Any]:
+        started = time.monotonic()
+        origin = urlparse(start_url).netloc.lower()
+        slots = asyncio.Semaphore(self.concurrency)
+        seen = {normalize_url(start_url)}
+        fingerprints = set()
+        pages = []
+        duplicates = 0
+        failed = 0
+        frontier = [(start_url, None)]
+        site_map = {}
+        for depth in range(self.max_depth + 1):
+            if not frontier:
+                break
+            results = await asyncio.gather(*(self._visit(url, timeout, slots) for url, _ in frontier))
+            next_frontier = []
+            for (url, parent), page_structure in zip(frontier, results):
+                if page_structure is None:
+                    failed += 1
+                    continue
+                fingerprint = dom_fingerprint(page_structure)
+                if fingerprint in fingerprints and depth > 0:
+                    duplicates += 1
+                    continue
+                fingerprints.add(fingerprint)
+                page_url = normalize_url(url)
+                pages.append({**page_structure, "url": page_url, "depth": depth, "fingerprint": fingerprint})
+                site_map[page_url] = []
+                if parent is not None:
+                    site_map.setdefault(parent, []).append(page_url)
+                for link in page_structure.get("links", []):
+                    candidate = self._crawlable(link.get("href", ""), origin)
+                    if candidate is None or candidate in seen:
+                        continue
+                    if len(seen) >= self.max_pages:
+                        break
+                    seen.add(candidate)
+                    next_frontier.append((candidate, page_url))
+            frontier = next_frontier if depth < self.max_depth else []
+        summary = {
+            "pages_visited": len(pages) + duplicates + failed,
+            "unique_pages": len(pages),
+            "duplicates": duplicates,
+            "failed": failed,
+            "max_depth": self.max_depth,
+            "duration_ms": int((time.monotonic() - started) * 1000)
+        }
+        agent_logger.info(f"[CRAWLER] Crawled {start_url}: {len(pages)} unique pages", extra=summary)
+        return self._merge(start_url, pages, site_map, summary)
+    async def _visit(self, url: str, timeout: int, slots: asyncio.Semaphore) -> Optional[Dict[str, Any]]:
+        async with slots:
+            try:
+                return await self.recon_agent._analyze_page(url, timeout)
+            except Exception as e:
+                agent_logger.warning(f"[CRAWLER] Failed to analyze {url}: {e}")
+                return None
+    def _crawlable(self, href: str, origin: str) -> Optional[str]:
+        parsed = urlparse(href)
+        if parsed.scheme not in ("http", "https") or parsed.netloc.lower() != origin:
+            return None
+        if parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+            return None
+        return normalize_url(href)
+    def _merge(
+        self,
+        start_url: str,
+        pages: List[Dict[str, Any]],
+        site_map: Dict[str, List[str]],
+        summary: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        if not pages:
+            return {
+                "title": "Unknown",
+                "url": start_url,
+                "buttons": [],
+                "inputs": [],
+                "links": [],
+                "selectors": {},
+                "pages": [],
+                "site_map": {},
+                "crawl": summary,
+                "timestamp": time.time(),
+                "error": f"No pages could be analyzed for {start_url}"
+            }
+        merged = {"buttons": [], "inputs": [], "links": []}
+        seen_keys: Dict[str, set] = {key: set() for key in merged}
+        selectors = {}
+        for page in pages:
+            for key in merged:
+                for element in page.get(key, []):
+                    element_key = self._element_key(key, element)
+                    if element_key in seen_keys[key]:
+                        continue
+                    seen_keys[key].add(element_key)
+                    merged[key].append({**element, "page": page["url"]})
+            for name, selector in page.get("selectors", {}).items():
+                selectors.setdefault(name, selector)
+        root = pages[0]
+        return {
+            "title": root.get("title", "Unknown"),
+            "url": start_url,
+            **merged,
+            "selectors": selectors,
+            "pages": [
+                {
+                    "url": page["url"],
+                    "title": page.get("title", ""),
+                    "depth": page["depth"],
+                    "fingerprint": page["fingerprint"],
+                    "buttons": len(page.get("buttons", [])),
+                    "inputs": len(page.get("inputs", [])),
+                    "links": len(page.get("links", []))
+                }
+                for page in pages
+            ],
+            "site_map": site_map,
+            "crawl": summary,
+            "timestamp": time.time()
+        }
+    def _element_key(self, kind: str, element: Dict[str, Any]) -> Tuple:
+        if kind == "links":
+            return (element.get("href", ""),)
+        return (element.get("dataTestId", ""), element.get("id", ""), element.get("name", ""), element.get("text", ""))
@@ -0,0 +1,116 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Dict, List, Any
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+from shared.utils.async_runtime import remaining_time
+from shared.utils.test_suite import SUITE_PACKAGE, write_suite, sandbox_env, sandbox_preexec
+REPORT_PLUGIN = '''import json
+import os
+_ALLOWED = set(filter(None, os.environ.get("COLLECTION_ALLOWED_FIXTURES", "").split(",")))
+_REPORT = {"collected": {}, "errors": {}, "missing_fixtures": {}}
+def _module(nodeid):
+    path = nodeid.split("::", 1)[0].replace("\\\\", "/").rsplit("/", 1)[-1]
+    return path[:-3] if path.endswith(".py") else path
+def pytest_collectreport(report):
+    if report.failed:
+        _REPORT["errors"].setdefault(_module(report.nodeid), []).append(report.longreprtext[-2000:])
+def pytest_collection_modifyitems(session, config, items):
+    for item in items:
+        module = _module(item.nodeid)
+        _REPORT["collected"][module] = _REPORT["collected"].get(module, 0) + 1
+        info = getattr(item, "_fixtureinfo", None)
+        if info is None:
+            continue
+        params = set(getattr(getattr(item, "callspec", None), "params", {}) or {})
+        for name in info.names_closure:
+            if name in _ALLOWED or name in params or name == "request":
+                continue
+            if not info.name2fixturedefs.get(name):
+                _REPORT["missing_fixtures"].setdefault(module, []).append(
+                    {"test": item.name, "fixture": name}
+                )
+def pytest_sessionfinish(session, exitstatus):
+    with open(os.environ["COLLECTION_REPORT_PATH"], "w", encoding="utf-8") as f:
+        json.dump(_REPORT, f)
+'''
+class CollectionValidator:
+    # Пул песочниц: ограничивает число одновременных pytest-интерпретаторов на воркер
+    _sandbox_slots = threading.BoundedSemaphore(max(1, settings.collection_check_max_parallel))
+    def check(self, test_codes: List[str]) -> List[Dict[str, Any]]:
+        results = [{"collected": 0, "errors": []} for _ in test_codes]
+        if not test_codes:
+            return results
+        with tempfile.TemporaryDirectory(prefix="collect_") as root_dir:
+            modules = write_suite(root_dir, test_codes)
+            plugin_path = os.path.join(root_dir, "_collection_report.py")
+            with open(plugin_path, "w", encoding="utf-8") as f:
+                f.write(REPORT_PLUGIN)
+            report_path = os.path.join(root_dir, "report.json")
+            report = self._run_collection(root_dir, report_path)
+        if report is None:
+            return results
+        for module, idx in modules.items():
+            results[idx]["collected"] = report["collected"].get(module, 0)
+            for message in report["errors"].get(module, []):
+                results[idx]["errors"].append({
+                    "type": "collection_error",
+                    "line": None,
+                    "message": message.strip().splitlines()[-1] if message.strip() else "Collection failed",
+                    "details": message
+                })
+            for missing in report["missing_fixtures"].get(module, []):
+                results[idx]["errors"].append({
+                    "type": "missing_fixture",
+                    "line": None,
+                    "message": f"fixture '{missing['fixture']}' not found for {missing['test']}"
+                })
+            if not results[idx]["errors"] and results[idx]["collected"] == 0:
+                results[idx]["errors"].append({
+                    "type": "collection_error",
+                    "line": None,
+                    "message": "No tests collected from module"
+                })
+        failed = sum(1 for result in results if result["errors"])
+        agent_logger.info(f"[COLLECTION] Collected {len(test_codes)} tests in one pytest run, {failed} with errors")
+        return results
+    def _run_collection(self, root_dir: str, report_path: str):
+        # --collect-only импортирует модули тестов, т.е. исполняет их верхний уровень: окружение без секретов воркера
+        env = sandbox_env({
+            "PYTHONPATH": root_dir,
+            "COLLECTION_REPORT_PATH": report_path,
+            "COLLECTION_ALLOWED_FIXTURES": ",".join(settings.collection_check_external_fixtures),
+        })
+        command = [
+            sys.executable, "-m", "pytest", "--collect-only", "-q",
+            "-p", "_collection_report", "-p", "no:cacheprovider",
+            "--rootdir", root_dir, "-c", os.devnull,
+            os.path.join(root_dir, SUITE_PACKAGE)
+        ]
+        with self._sandbox_slots:
+            try:
+                subprocess.run(
+                    command,
+                    cwd=root_dir,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    timeout=remaining_time(settings.collection_check_timeout),
+                    preexec_fn=sandbox_preexec(settings.collection_check_max_memory_mb)
+                )
+            except subprocess.TimeoutExpired:
+                agent_logger.warning(f"[COLLECTION] pytest --collect-only timed out after {settings.collection_check_timeout}s")
+                return None
+            except Exception as e:
+                agent_logger.warning(f"[COLLECTION] pytest --collect-only failed to start: {e}")
+                return None
+        try:
+            with open(report_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            agent_logger.warning(f"[COLLECTION] Collection report unavailable: {e}")
+            return None
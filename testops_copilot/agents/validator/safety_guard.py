@@ -4,11 +4,29 @@ import re
 import subprocess
 import tempfile
 import os
-import resource
 import sys
-from typing import Dict, List, Any
+import asyncio
+import hashlib
+import json
+from typing import Dict, List, Any, Tuple
 from shared.utils.logger import agent_logger
+from shared.utils.llm_client import llm_client, parse_json_response
+from shared.utils.redis_client import redis_client
+from shared.utils.async_runtime import run_coro
+from shared.utils.test_suite import sandbox_preexec
 from shared.config.settings import settings
+LLM_SYSTEM_PROMPT = "Ты эксперт по безопасности Python кода. Отвечай только JSON."
+LLM_UNAVAILABLE_WARNING = "LLM review unavailable"
+VERDICT_OBJECT_PATTERN = re.compile(r"\{[^{}]*\}")
+LLM_BATCH_PROMPT = """Проанализируй {count} автотестов на опасное поведение: доступ к файловой системе вне тестовых данных,
+запуск процессов, сетевые обращения не к тестируемому приложению, утечку секретов, обход песочницы.
+
+Для КАЖДОГО теста верни вердикт: SAFE, WARNING или BLOCK.
+Ответ - JSON массив без пояснений:
+[{{"id": 0, "verdict": "SAFE", "reason": ""}}, ...]
+
+{tests}
+"""
 class SafetyGuard:
     CRITICAL_BLACKLIST = [
         r'\beval\s\(',
@@ -36,11 +54,30 @@ class SafetyGuard:
         'asyncio', 'logging'
     }
     def validate(self, test_code: str) -> Dict[str, Any]:
+        return self.validate_batch([test_code])[0]
+    def validate_batch(self, test_codes: List[str]) -> List[Dict[str, Any]]:
+        results = [self._static_layers(test_code) for test_code in test_codes]
+        if settings.safety_guard_llm_analysis_enabled:
+            pending = [
+                idx for idx, result in enumerate(results)
+                if result["action_taken"] != "blocked" and result["risk_level"] in ["MEDIUM", "LOW"]
+            ]
+            if pending:
+                level3_results = self._llm_analysis_batch([test_codes[idx] for idx in pending])
+                for idx, level3_result in zip(pending, level3_results):
+                    self._apply_llm_result(results[idx], level3_result)
+        if settings.safety_guard_sandbox_enabled:
+            for test_code, result in zip(test_codes, results):
+                if result["action_taken"] != "blocked" and result["risk_level"] in ["SAFE", "LOW", "MEDIUM"]:
+                    self._apply_sandbox_result(result, self._sandbox_execution(test_code))
+        return results
+    def _static_layers(self, test_code: str) -> Dict[str, Any]:
         result = {
             "risk_level": "SAFE",
             "issues": [],
             "blocked_patterns": [],
-            "action_taken": "allowed"
+            "action_taken": "allowed",
+            "security_layer": "static"
         }
         level1_result = self._static_analysis(test_code)
         if level1_result["blocked"]:
@@ -49,6 +86,7 @@ class SafetyGuard:
             result["action_taken"] = "blocked"
             return result
         level2_result = self._ast_analysis(test_code)
+        result["security_layer"] = "ast"
         if level2_result["blocked"]:
             result["risk_level"] = "HIGH"
             result["blocked_patterns"] = level2_result["blocked"]
@@ -58,29 +96,150 @@ class SafetyGuard:
             result["risk_level"] = "MEDIUM"
             result["issues"] = level2_result["warnings"]
             result["action_taken"] = "warning"
-        if settings.safety_guard_llm_analysis_enabled and result["risk_level"] in ["MEDIUM", "LOW"]:
-            level3_result = self._llm_analysis(test_code)
-            if level3_result.get("blocked"):
-                result["risk_level"] = "HIGH"
-                result["blocked_patterns"].extend(level3_result["blocked"])
-                result["action_taken"] = "blocked"
-                return result
-            elif level3_result.get("warnings"):
-                if result["risk_level"] == "SAFE":
-                    result["risk_level"] = "LOW"
-                result["issues"].extend(level3_result["warnings"])
-        if settings.safety_guard_sandbox_enabled and result["risk_level"] in ["SAFE", "LOW", "MEDIUM"]:
-            level4_result = self._sandbox_execution(test_code)
-            if level4_result.get("blocked"):
-                result["risk_level"] = "CRITICAL"
-                result["action_taken"] = "blocked"
-                result["blocked_patterns"].extend(level4_result["blocked"])
-                return result
-            elif level4_result.get("warnings"):
-                if result["risk_level"] == "SAFE":
-                    result["risk_level"] = "MEDIUM"
-                result["issues"].extend(level4_result["warnings"])
         return result
+    def _apply_llm_result(self, result: Dict[str, Any], level3_result: Dict[str, List]):
+        if level3_result.get("unavailable"):
+            # Вердикта нет (сбой пачки, обрезанный JSON, пропущенный id) - тест не считается проверенным LLM
+            result["issues"].append(LLM_UNAVAILABLE_WARNING)
+            if result["risk_level"] == "SAFE":
+                result["risk_level"] = "LOW"
+            return
+        result["security_layer"] = "llm"
+        if level3_result.get("blocked"):
+            result["risk_level"] = "HIGH"
+            result["blocked_patterns"].extend(level3_result["blocked"])
+            result["action_taken"] = "blocked"
+        elif level3_result.get("warnings"):
+            if result["risk_level"] == "SAFE":
+                result["risk_level"] = "LOW"
+            result["issues"].extend(level3_result["warnings"])
+    def _apply_sandbox_result(self, result: Dict[str, Any], level4_result: Dict[str, List]):
+        result["security_layer"] = "sandbox"
+        if level4_result.get("blocked"):
+            result["risk_level"] = "CRITICAL"
+            result["action_taken"] = "blocked"
+            result["blocked_patterns"].extend(level4_result["blocked"])
+        elif level4_result.get("warnings"):
+            if result["risk_level"] == "SAFE":
+                result["risk_level"] = "MEDIUM"
+            result["issues"].extend(level4_result["warnings"])
+    def _llm_analysis(self, test_code: str) -> Dict[str, List]:
+        return self._llm_analysis_batch([test_code])[0]
+    def _llm_analysis_batch(self, test_codes: List[str]) -> List[Dict[str, List]]:
+        code_hashes = [hashlib.sha256(code.encode()).hexdigest() for code in test_codes]
+        verdicts = {}
+        pending = {}
+        for code_hash, test_code in zip(code_hashes, test_codes):
+            if code_hash in verdicts or code_hash in pending:
+                continue
+            try:
+                cached = redis_client.cache.get(f"safety_llm:{code_hash}")
+            except Exception:
+                cached = None
+            if cached:
+                try:
+                    verdicts[code_hash] = json.loads(cached)
+                    continue
+                except ValueError:
+                    pass
+            pending[code_hash] = test_code
+        if pending:
+            chunks = self._pack_llm_batches(list(pending.items()))
+            agent_logger.info(f"[SAFETY] LLM analysis of {len(pending)} tests in {len(chunks)} batched prompts")
+            try:
+                chunk_results = run_coro(self._analyze_chunks(chunks))
+            except Exception as e:
+                agent_logger.warning(f"[SAFETY] Batched LLM analysis failed: {e}")
+                chunk_results = []
+            for chunk_verdicts in chunk_results:
+                for code_hash, verdict in chunk_verdicts.items():
+                    verdicts[code_hash] = verdict
+                    try:
+                        redis_client.cache.setex(
+                            f"safety_llm:{code_hash}",
+                            settings.safety_guard_llm_cache_ttl,
+                            json.dumps(verdict)
+                        )
+                    except Exception as cache_error:
+                        agent_logger.warning(f"[SAFETY] Failed to cache LLM verdict: {cache_error}")
+        missing = sum(1 for code_hash in set(code_hashes) if code_hash not in verdicts)
+        if missing:
+            agent_logger.warning(f"[SAFETY] No LLM verdict for {missing} tests")
+        return [
+            verdicts.get(code_hash, {"blocked": [], "warnings": [LLM_UNAVAILABLE_WARNING], "unavailable": True})
+            for code_hash in code_hashes
+        ]
+    def _pack_llm_batches(self, items: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        chunks = []
+        current = []
+        current_chars = 0
+        for code_hash, test_code in items:
+            if current and (
+                len(current) >= settings.safety_guard_llm_batch_size
+                or current_chars + len(test_code) > settings.safety_guard_llm_batch_chars
+            ):
+                chunks.append(current)
+                current = []
+                current_chars = 0
+            current.append((code_hash, test_code))
+            current_chars += len(test_code)
+        if current:
+            chunks.append(current)
+        return chunks
+    async def _analyze_chunks(self, chunks: List[List[Tuple[str, str]]]) -> List[Dict[str, Dict]]:
+        results = await asyncio.gather(
+            *(self._analyze_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+        chunk_results = []
+        for result in results:
+            if isinstance(result, Exception):
+                agent_logger.warning(f"[SAFETY] LLM batch failed: {result}")
+                continue
+            chunk_results.append(result)
+        return chunk_results
+    async def _analyze_chunk(self, chunk: List[Tuple[str, str]]) -> Dict[str, Dict]:
+        tests_block = "\n\n".join(
+            f"### TEST {idx}\n```python\n{test_code}\n```"
+            for idx, (_, test_code) in enumerate(chunk)
+        )
+        response = await llm_client.generate(
+            prompt=LLM_BATCH_PROMPT.format(count=len(chunk), tests=tests_block),
+            system_prompt=LLM_SYSTEM_PROMPT,
+            temperature=0.0,
+            max_tokens=min(4096, 256 + 96 * len(chunk))
+        )
+        content = response.get("choices", [{}])[0].get("message", {}).get("content", "")
+        parsed = parse_json_response(content)
+        if isinstance(parsed, dict) and "verdicts" in parsed:
+            parsed = parsed["verdicts"]
+        if not isinstance(parsed, list):
+            # Массив обрезан по max_tokens - берём целиком записанные вердикты, остальные останутся без проверки
+            parsed = []
+            for match in VERDICT_OBJECT_PATTERN.finditer(content):
+                try:
+                    parsed.append(json.loads(match.group(0)))
+                except ValueError:
+                    continue
+        verdicts = {}
+        for item in parsed or []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                idx = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= idx < len(chunk):
+                continue
+            verdict = str(item.get("verdict", "SAFE")).upper()
+            reason = str(item.get("reason") or "").strip()
+            if verdict == "BLOCK":
+                verdicts[chunk[idx][0]] = {"blocked": [f"LLM: {reason or 'dangerous behaviour'}"], "warnings": []}
+            elif verdict == "WARNING":
+                verdicts[chunk[idx][0]] = {"blocked": [], "warnings": [f"LLM: {reason or 'suspicious behaviour'}"]}
+            else:
+                verdicts[chunk[idx][0]] = {"blocked": [], "warnings": []}
+        return verdicts
     def _static_analysis(self, test_code: str) -> Dict[str, List]:
         blocked = []
         for pattern in self.CRITICAL_BLACKLIST:
@@ -126,14 +285,15 @@ class SafetyGuard:
                 f.write(safe_code)
                 temp_file = f.name
             try:
-                max_memory = 100 * 1024 * 1024
-                resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+                # Лимит памяти ставится только дочернему процессу: setrlimit в самом воркере
+                # навсегда ограничивал его адресное пространство
                 result = subprocess.run(
                     [sys.executable, temp_file],
                     capture_output=True,
                     text=True,
                     timeout=5,
-                    env={**os.environ, 'PYTHONPATH': ''}
+                    env={**os.environ, 'PYTHONPATH': ''},
+                    preexec_fn=sandbox_preexec(100)
                 )
                 if result.returncode != 0:
                     if any(danger in result.stderr.lower() for danger in ['permission denied', 'access denied', 'forbidden']):
@@ -1,7 +1,8 @@
 
 import ast
+import hashlib
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from agents.validator.safety_guard import SafetyGuard
 class ValidatorAgent:
     def __init__(self):
@@ -11,6 +12,43 @@ class ValidatorAgent:
         test_code: str,
         validation_level: str = "full"
     ) -> Dict[str, Any]:
+        result, needs_safety = self._run_checks(test_code, validation_level)
+        if not needs_safety:
+            return result
+        return self._finalize(result, self.safety_guard.validate(test_code))
+    def validate_batch(
+        self,
+        test_codes: List[str],
+        validation_level: str = "full",
+        request_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        from shared.utils.logger import agent_logger
+        from shared.utils.security_audit import security_audit_sink
+        checked = [self._run_checks(test_code, validation_level) for test_code in test_codes]
+        pending = [idx for idx, (_, needs_safety) in enumerate(checked) if needs_safety]
+        safety_results = self.safety_guard.validate_batch([test_codes[idx] for idx in pending])
+        results = [result for result, _ in checked]
+        for idx, safety_result in zip(pending, safety_results):
+            results[idx] = self._finalize(results[idx], safety_result)
+            if request_id:
+                security_audit_sink.record(
+                    request_id,
+                    safety_result,
+                    details={
+                        "test_index": idx,
+                        "code_hash": hashlib.sha256(test_codes[idx].encode()).hexdigest()
+                    }
+                )
+        agent_logger.info(
+            f"[VALIDATOR] Batch validation completed",
+            extra={
+                "tests": len(test_codes),
+                "safety_checked": len(pending),
+                "passed": sum(1 for result in results if result["passed"])
+            }
+        )
+        return results
+    def _run_checks(self, test_code: str, validation_level: str) -> Tuple[Dict[str, Any], bool]:
         from shared.utils.logger import agent_logger
         agent_logger.debug(f"[VALIDATOR] Starting validation (level={validation_level})")
         
@@ -33,10 +71,10 @@ class ValidatorAgent:
                 f"[VALIDATOR] Syntax errors found",
                 extra={"syntax_errors": syntax_result["errors"]}
             )
-            return result
+            return result, False
         agent_logger.debug(f"[VALIDATOR] Syntax validation passed")
         if validation_level == "syntax":
-            return result
+            return result, False
         semantic_result = self._validate_semantic(test_code)
         result["semantic_errors"] = semantic_result["errors"]
         result["warnings"].extend(semantic_result["warnings"])
@@ -50,7 +88,7 @@ class ValidatorAgent:
         else:
             agent_logger.debug(f"[VALIDATOR] Semantic validation passed (warnings: {len(semantic_result['warnings'])})")
         if validation_level == "semantic":
-            return result
+            return result, False
         logic_result = self._validate_logic(test_code)
         result["logic_errors"] = logic_result["errors"]
         result["warnings"].extend(logic_result["warnings"])
@@ -63,12 +101,19 @@ class ValidatorAgent:
             )
         else:
             agent_logger.debug(f"[VALIDATOR] Logic validation passed (warnings: {len(logic_result['warnings'])})")
-        safety_result = self.safety_guard.validate(test_code)
+        return result, True
+    def _finalize(self, result: Dict[str, Any], safety_result: Dict[str, Any]) -> Dict[str, Any]:
+        from shared.utils.logger import agent_logger
         issues = safety_result.get("issues", [])
         result["safety_issues"] = [
             {"type": "warning", "message": issue} if isinstance(issue, str) else issue
             for issue in issues
         ]
+        result["safety_risk_level"] = safety_result.get("risk_level", "SAFE")
+        result["safety_blocked"] = (
+            safety_result.get("action_taken") == "blocked"
+            or safety_result.get("risk_level") in ["HIGH", "CRITICAL"]
+        )
         if safety_result.get("risk_level") in ["HIGH", "CRITICAL"]:
             result["passed"] = False
             result["score"] = 0
@@ -6,6 +6,7 @@ from uuid import UUID
 from datetime import datetime
 from shared.utils.database import get_db_dependency, Session
 from shared.utils.redis_client import redis_client
+from shared.config.settings import settings
 from workers.celery_app import generate_test_cases_task, generate_api_tests_task
 router = APIRouter(prefix="/generate", tags=["Generation"])
 class GenerateTestCasesRequest(BaseModel):
@@ -14,6 +15,11 @@ class GenerateTestCasesRequest(BaseModel):
     test_type: Literal["manual", "automated", "both"] = Field(..., description="Тип тестов")
     options: Optional[dict] = Field(default=None, description="Дополнительные параметры")
     use_langgraph: bool = Field(default=True, description="Использовать LangGraph workflow с checkpointing")
+    html_content: Optional[str] = Field(
+        None,
+        max_length=settings.recon_html_max_length,
+        description="HTML страницы (если файл загружен) - анализ без браузера"
+    )
 class GenerateAPITestsRequest(BaseModel):
     openapi_url: Optional[HttpUrl] = Field(None, description="URL к OpenAPI спецификации")
     openapi_spec: Optional[str] = Field(None, description="YAML содержимое OpenAPI (если файл загружен)")
@@ -37,6 +43,20 @@ async def generate_test_cases(
     from shared.models.database import Request
     import uuid
     request_id = uuid.uuid4()
+    options = dict(request.options or {})
+    if request.html_content:
+        # HTML хранится в Redis, в задачу и состояние workflow передаётся только ключ.
+        # Снимок пишется до создания Request: при сбое Redis не остаётся заявки в статусе pending
+        html_snapshot_key = f"recon_html:{request_id}"
+        try:
+            redis_client.cache.setex(html_snapshot_key, settings.recon_html_snapshot_ttl, request.html_content)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Failed to store HTML snapshot: {str(e)}"
+            )
+        options["html_snapshot_key"] = html_snapshot_key
+        options["recon_backend"] = "html"
     try:
         db_request = Request(
             request_id=request_id,
@@ -62,7 +82,7 @@ async def generate_test_cases(
                 url=str(request.url),
                 requirements=request.requirements,
                 test_type=request.test_type,
-                options=request.options or {},
+                options=options,
                 use_langgraph=True
             )
         except ImportError:
@@ -71,7 +91,7 @@ async def generate_test_cases(
                 url=str(request.url),
                 requirements=request.requirements,
                 test_type=request.test_type,
-                options=request.options or {}
+                options=options
             )
     else:
         task = generate_test_cases_task.delay(
@@ -79,7 +99,7 @@ async def generate_test_cases(
             url=str(request.url),
             requirements=request.requirements,
             test_type=request.test_type,
-            options=request.options or {}
+            options=options
         )
     try:
         db_request.celery_task_id = task.id
@@ -35,4 +35,8 @@ active_tasks = Gauge(
 )
 @router.get("")
 async def get_metrics():
-    return generate_latest(), {"Content-Type": CONTENT_TYPE_LATEST}
\ No newline at end of file
+    return generate_latest(), {"Content-Type": CONTENT_TYPE_LATEST}
+@router.get("/recon-cache")
+async def get_recon_cache_metrics():
+    from agents.reconnaissance.recon_cache import recon_cache
+    return recon_cache.stats()
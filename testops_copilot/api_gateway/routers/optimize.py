@@ -3,10 +3,12 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from agents.optimizer.optimizer_agent import OptimizerAgent
+from shared.utils.async_runtime import run_on_runtime
 router = APIRouter(prefix="/optimize", tags=["Optimization"])
 class TestInput(BaseModel):
     test_id: str
     test_code: str
+    validation: Optional[dict] = None
 class OptimizeRequest(BaseModel):
     tests: List[TestInput] = Field(..., min_items=1)
     requirements: List[str] = Field(..., min_items=1)
@@ -17,6 +19,7 @@ class OptimizeResponse(BaseModel):
     optimized_tests: List[dict]
     duplicates_found: int
     duplicates: List[dict]
+    clusters: List[dict] = []
     coverage_score: float
     coverage_details: dict
     gaps: List[dict]
@@ -27,15 +30,17 @@ async def optimize_tests(
 ):
     optimizer = OptimizerAgent()
     try:
-        result = await optimizer.optimize(
-            tests=[{"test_id": t.test_id, "test_code": t.test_code} for t in request.tests],
+        # llm_client привязан к циклу async_runtime - оптимизация выполняется там же
+        result = await run_on_runtime(optimizer.optimize(
+            tests=[{"test_id": t.test_id, "test_code": t.test_code, "validation": t.validation or {}} for t in request.tests],
             requirements=request.requirements,
             options=request.options or {}
-        )
+        ))
         return OptimizeResponse(
             optimized_tests=result.get("optimized_tests", []),
             duplicates_found=result.get("duplicates_found", 0),
             duplicates=result.get("duplicates", []),
+            clusters=result.get("clusters", []),
             coverage_score=result.get("coverage_score", 0.0),
             coverage_details=result.get("coverage_details", {}),
             gaps=result.get("gaps", []),
@@ -5,7 +5,7 @@ from uuid import UUID
 from typing import Optional, List
 from datetime import datetime
 from shared.utils.database import get_db_dependency, Session
-from shared.models.database import Request, TestCase, GenerationMetric
+from shared.models.database import Request, TestCase, GenerationMetric, CoverageAnalysis
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 class TaskStatusResponse(BaseModel):
     request_id: UUID
@@ -20,6 +20,12 @@ class TaskStatusResponse(BaseModel):
     retry_count: Optional[int] = None
     tests: Optional[List[dict]] = None
     metrics: Optional[List[dict]] = None
+    coverage: Optional[List[dict]] = None
+class ExecuteTestsRequest(BaseModel):
+    base_url: str
+    workers: Optional[int] = None
+    rewrite_origins: Optional[List[str]] = None
+    timeout: Optional[int] = None
 @router.get("", response_model=List[TaskStatusResponse])
 async def list_tasks(
     limit: int = Query(20, ge=1, le=100, description="Количество задач"),
@@ -79,6 +85,7 @@ async def get_task_status(
     task_id: UUID,
     include_tests: bool = Query(False, description="Включить сгенерированные тесты"),
     include_metrics: bool = Query(False, description="Включить метрики выполнения"),
+    include_coverage: bool = Query(False, description="Включить покрытие требований"),
     db: Session = Depends(get_db_dependency)
 ):
     request = db.query(Request).filter(Request.request_id == task_id).first()
@@ -97,34 +104,11 @@ async def get_task_status(
     if request.status in ["processing", "started", "reconnaissance", "generation", "validation", "optimization"]:
         if request.langgraph_thread_id:
             try:
-                from workers.tasks.langgraph_workflow import LangGraphWorkflow
-                workflow = LangGraphWorkflow()
-                config = {"configurable": {"thread_id": request.langgraph_thread_id}}
-                # Используем checkpointer напрямую для получения состояния
-                if hasattr(workflow, 'checkpointer') and workflow.checkpointer:
-                    try:
-                        # Пытаемся получить состояние через checkpointer
-                        if hasattr(workflow.checkpointer, 'get'):
-                            state = workflow.checkpointer.get(config)
-                            if state and hasattr(state, 'values') and state.values:
-                                response_data["current_step"] = state.values.get("current_step", request.status)
-                            elif state and isinstance(state, dict):
-                                response_data["current_step"] = state.get("current_step", request.status)
-                        elif hasattr(workflow.app, 'get_state'):
-                            # Fallback на старый API, если доступен
-                            state = workflow.app.get_state(config)
-                            if state and state.values:
-                                response_data["current_step"] = state.values.get("current_step", request.status)
-                            else:
-                                response_data["current_step"] = request.status
-                        else:
-                            response_data["current_step"] = request.status
-                    except Exception as e:
-                        from shared.utils.logger import api_logger
-                        api_logger.warning(f"Could not get workflow state: {e}")
-                        response_data["current_step"] = request.status
-                else:
-                    response_data["current_step"] = request.status
+                # Общий checkpointer процесса: опрос статуса не собирает граф и не открывает соединения
+                from workers.tasks.langgraph.checkpoint import get_checkpointer
+                checkpoint = get_checkpointer().get({"configurable": {"thread_id": request.langgraph_thread_id}})
+                channel_values = checkpoint.get("channel_values", {}) if checkpoint else {}
+                response_data["current_step"] = channel_values.get("current_step") or request.status
             except Exception as e:
                 from shared.utils.logger import api_logger
                 api_logger.warning(f"Error getting workflow state: {e}")
@@ -181,6 +165,26 @@ async def get_task_status(
             for metric in metrics
         ]
     
+    if include_coverage:
+        coverage = (
+            db.query(CoverageAnalysis)
+            .filter(CoverageAnalysis.request_id == task_id)
+            .order_by(CoverageAnalysis.requirement_index)
+            .all()
+        )
+        response_data["coverage"] = [
+            {
+                "requirement_index": item.requirement_index,
+                "requirement_text": item.requirement_text,
+                "is_covered": item.is_covered,
+                "covering_tests": item.covering_tests,
+                "coverage_count": item.coverage_count,
+                "coverage_score": float(item.coverage_score) if item.coverage_score is not None else None,
+                "gap_description": item.gap_description
+            }
+            for item in coverage
+        ]
+    
     if request.status == "failed":
         response_data["error_message"] = request.error_message
     return TaskStatusResponse(**response_data)
@@ -226,4 +230,33 @@ async def resume_task(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error resuming task: {str(e)}"
-        )
\ No newline at end of file
+        )
+@router.post("/{task_id}/execute", status_code=status.HTTP_202_ACCEPTED)
+async def execute_task_tests(
+    task_id: UUID,
+    body: ExecuteTestsRequest,
+    db: Session = Depends(get_db_dependency)
+):
+    request = db.query(Request).filter(Request.request_id == task_id).first()
+    if not request:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with ID {task_id} not found"
+        )
+    if request.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Task is not completed yet. Cannot execute tests."
+        )
+    from workers.tasks.execute_workflow import execute_tests_task
+    task = execute_tests_task.delay(
+        request_id=str(task_id),
+        base_url=body.base_url,
+        options=body.dict(exclude={"base_url"}, exclude_none=True)
+    )
+    return {
+        "request_id": task_id,
+        "task_id": task.id,
+        "status": "executing",
+        "message": "Test execution started"
+    }
@@ -10,6 +10,7 @@ import json
 from shared.utils.database import get_db_dependency, Session
 from shared.models.database import TestCase, Request
 from shared.utils.logger import api_logger
+from shared.utils.test_case_repository import test_case_repository
 router = APIRouter(prefix="/tests", tags=["Tests"])
 class TestCaseResponse(BaseModel):
     test_id: UUID
@@ -20,6 +21,13 @@ class TestCaseResponse(BaseModel):
     allure_tags: Optional[List[str]] = None
     validation_status: Optional[str] = None
     created_at: datetime
+class SimilarTestResponse(BaseModel):
+    test_id: UUID
+    request_id: UUID
+    test_name: str
+    test_type: str
+    validation_status: Optional[str] = None
+    similarity: float
 class TestSearchResponse(BaseModel):
     tests: List[TestCaseResponse]
     total: int
@@ -184,4 +192,24 @@ async def export_tests(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error exporting tests: {str(e)}"
-        )
\ No newline at end of file
+        )
+@router.get("/{test_id}/similar", response_model=List[SimilarTestResponse])
+async def similar_tests(
+    test_id: UUID,
+    limit: int = Query(10, ge=1, le=100, description="Количество похожих тестов"),
+    db: Session = Depends(get_db_dependency)
+):
+    try:
+        similar = test_case_repository.similar_to(db, test_id, limit=limit)
+    except Exception as e:
+        api_logger.error(f"Error searching similar tests: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching similar tests: {str(e)}"
+        )
+    if similar is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Test with ID {test_id} not found"
+        )
+    return [SimilarTestResponse(**{**item, "similarity": float(item["similarity"])}) for item in similar]
@@ -1,5 +1,6 @@
 
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
 from agents.validator.validator_agent import ValidatorAgent
@@ -31,7 +32,9 @@ async def validate_tests(
 ):
     validator = ValidatorAgent()
     try:
-        result = validator.validate(
+        # Валидатор синхронный (subprocess, run_coro для LLM) - в пуле потоков, не в цикле uvicorn
+        result = await run_in_threadpool(
+            validator.validate,
             test_code=request.test_code,
             validation_level=request.validation_level
         )
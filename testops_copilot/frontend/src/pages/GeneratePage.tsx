@@ -143,6 +143,22 @@ export default function GeneratePage() {
             />
           </div>
 
+          <div className="form-group">
+            <label htmlFor="html_file">HTML страницы (опционально)</label>
+            <input
+              id="html_file"
+              type="file"
+              accept=".html,.htm,text/html"
+              onChange={async (e) => {
+                const file = e.target.files?.[0];
+                setUiForm({ ...uiForm, html_content: file ? await file.text() : undefined });
+              }}
+            />
+            <small style={{ display: 'block', marginTop: '0.5rem', color: '#666' }}>
+              Если файл загружен, страница анализируется по HTML без запуска браузера
+            </small>
+          </div>
+
           <div className="form-group">
             <label>Требования</label>
             {uiForm.requirements.map((req, index) => (
@@ -4,6 +4,7 @@ export interface GenerateTestCasesRequest {
   test_type: 'manual' | 'automated' | 'both';
   options?: Record<string, any>;
   use_langgraph?: boolean;
+  html_content?: string;
 }
 
 export interface GenerateAPITestsRequest {
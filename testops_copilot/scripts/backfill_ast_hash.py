@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Пересчёт test_cases.ast_hash (канонический AST) для уже сохранённых тестов.
+Запускается после изменения канонизации (ast_fingerprint): новые тесты получают хэш при сохранении в save_results_node.
+"""
+
+import argparse
+import sys
+import os
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, update
+from shared.utils.database import get_db
+from shared.models.database import TestCase
+from shared.utils.ast_fingerprint import canonical_ast_hash
+
+
+def backfill(batch_size):
+    statement = (
+        update(TestCase.__table__)
+        .where(TestCase.__table__.c.test_id == bindparam("b_test_id"))
+        .values(ast_hash=bindparam("b_ast_hash"))
+    )
+    updated = 0
+    with get_db() as db:
+        connection = db.connection()
+        # Пачки обновляются по мере чтения потока: в памяти не больше batch_size строк
+        batch = []
+        for row in db.query(TestCase.test_id, TestCase.test_code).yield_per(batch_size):
+            batch.append({"b_test_id": row.test_id, "b_ast_hash": canonical_ast_hash(row.test_code)})
+            if len(batch) == batch_size:
+                connection.execute(statement, batch)
+                updated += len(batch)
+                batch = []
+        if batch:
+            connection.execute(statement, batch)
+            updated += len(batch)
+    print(f"✅ Пересчитан ast_hash для {updated} тестов")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    backfill(parser.parse_args().batch_size)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сохранения результатов: построчный db.add() против многострочного INSERT.
+Сохраняет N тестов (по умолчанию 1000) в одной транзакции, которая затем откатывается.
+Без доступной БД измеряется только подготовка строк.
+"""
+
+import argparse
+import sys
+import os
+import time
+import uuid
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.models.database import Request, TestCase
+from workers.tasks.langgraph.persistence import build_test_case_rows, bulk_insert_test_cases
+
+TEST_TEMPLATE = '''import allure
+from playwright.sync_api import Page, expect
+
+@allure.feature("Калькулятор")
+@allure.story("Сценарий {idx}")
+@allure.title("Проверка сценария {idx}")
+def test_scenario_{idx}(page: Page):
+    with allure.step("Открыть страницу"):
+        page.goto("https://cloud.ru/calculator")
+    with allure.step("Заполнить форму"):
+        page.locator("[data-testid='field-{idx}']").fill("{idx}")
+    with allure.step("Проверить результат"):
+        expect(page.locator("[data-testid='total']")).to_be_visible()
+'''
+
+
+def make_tests(count):
+    return [
+        {"code": TEST_TEMPLATE.format(idx=idx), "validation": {"passed": True, "score": 80, "errors": []}}
+        for idx in range(count)
+    ]
+
+
+def save_row_by_row(db, request_id, tests):
+    # Прежняя схема: объект ORM и db.add() на каждый тест
+    for row in build_test_case_rows(request_id, tests):
+        db.add(TestCase(**row))
+    db.flush()
+
+
+def save_bulk(db, request_id, tests):
+    bulk_insert_test_cases(db, build_test_case_rows(request_id, tests))
+    db.flush()
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000)
+    args = parser.parse_args()
+    tests = make_tests(args.count)
+    print(f"Тестов: {args.count}")
+    timed("build rows (hash + ast)", build_test_case_rows, uuid.uuid4(), tests)
+    try:
+        from shared.utils.database import SessionLocal
+        db = SessionLocal()
+        request = Request(url="https://benchmark.local", requirements=[], test_type="automated", status="completed")
+        db.add(request)
+        db.flush()
+    except Exception as e:
+        print(f"БД недоступна, INSERT не измеряется: {e}")
+        return
+    try:
+        row_by_row = timed("ORM db.add() per test", save_row_by_row, db, request.request_id, tests)
+        bulk = timed("multi-row INSERT", save_bulk, db, request.request_id, tests)
+        print(f"Ускорение: x{row_by_row / bulk:.1f}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
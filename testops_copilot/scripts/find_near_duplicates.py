@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Поиск почти-дубликатов по всей таблице test_cases через MinHash/LSH (без эмбеддингов и LLM).
+Печатает число кандидатных пар и самые похожие из них.
+"""
+
+import argparse
+import sys
+import os
+import time
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from shared.utils.database import get_db
+from shared.models.database import TestCase
+from agents.optimizer.minhash import MinHashLSH
+
+
+def find_near_duplicates(threshold, top, batch_size):
+    lsh = MinHashLSH()
+    ids, names, signatures = [], [], []
+    started = time.perf_counter()
+    with get_db() as db:
+        query = db.query(TestCase.test_id, TestCase.test_name, TestCase.test_code).yield_per(batch_size)
+        for row in query:
+            ids.append(row.test_id)
+            names.append(row.test_name)
+            signatures.append(lsh.signature(row.test_code))
+    if not signatures:
+        print("Таблица test_cases пуста")
+        return
+    signed = time.perf_counter()
+    pairs = lsh.candidate_pairs(np.vstack(signatures), threshold=threshold)
+    finished = time.perf_counter()
+    print(f"Тестов: {len(ids)}, сигнатуры: {signed - started:.1f} с, LSH: {finished - signed:.1f} с")
+    print(f"Кандидатных пар (Jaccard >= {threshold}): {len(pairs)}")
+    for (first, second), jaccard in sorted(pairs.items(), key=lambda item: -item[1])[:top]:
+        print(f"{jaccard:.2f}  {names[first]} ({ids[first]})  ~  {names[second]} ({ids[second]})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    find_near_duplicates(args.threshold, args.top, args.batch_size)
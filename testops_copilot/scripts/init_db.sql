@@ -142,7 +142,7 @@ CREATE TABLE IF NOT EXISTS test_cases (
     allure_tags JSONB DEFAULT '[]',
     code_hash VARCHAR(64) NOT NULL,
     ast_hash VARCHAR(64),
-    semantic_embedding VECTOR(768),
+    semantic_embedding VECTOR(1536),
     covered_requirements JSONB DEFAULT '[]',
     priority INTEGER DEFAULT 5,
     validation_status VARCHAR(20) DEFAULT 'passed',
@@ -151,25 +151,46 @@ CREATE TABLE IF NOT EXISTS test_cases (
     is_duplicate BOOLEAN DEFAULT FALSE,
     duplicate_of UUID REFERENCES test_cases(test_id) ON DELETE SET NULL,
     similarity_score DECIMAL(5,4),
+    execution_status VARCHAR(20),
+    execution_duration_ms INTEGER,
+    execution_message TEXT,
+    last_executed_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Колонки результатов прогона для баз, созданных до появления execution engine
+ALTER TABLE test_cases ADD COLUMN IF NOT EXISTS execution_status VARCHAR(20);
+ALTER TABLE test_cases ADD COLUMN IF NOT EXISTS execution_duration_ms INTEGER;
+ALTER TABLE test_cases ADD COLUMN IF NOT EXISTS execution_message TEXT;
+ALTER TABLE test_cases ADD COLUMN IF NOT EXISTS last_executed_at TIMESTAMP;
+
 CREATE INDEX IF NOT EXISTS idx_test_cases_request_id ON test_cases(request_id);
 CREATE INDEX IF NOT EXISTS idx_test_cases_test_type ON test_cases(test_type);
 CREATE INDEX IF NOT EXISTS idx_test_cases_code_hash ON test_cases(code_hash);
 CREATE INDEX IF NOT EXISTS idx_test_cases_ast_hash ON test_cases(ast_hash);
 CREATE INDEX IF NOT EXISTS idx_test_cases_is_duplicate ON test_cases(is_duplicate);
+CREATE INDEX IF NOT EXISTS idx_test_cases_execution_status ON test_cases(execution_status);
 CREATE INDEX IF NOT EXISTS idx_test_cases_allure_feature ON test_cases(allure_feature);
 CREATE INDEX IF NOT EXISTS idx_test_cases_allure_severity ON test_cases(allure_severity);
 CREATE INDEX IF NOT EXISTS idx_test_cases_created_at ON test_cases(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_test_cases_allure_tags ON test_cases USING GIN(allure_tags);
 CREATE INDEX IF NOT EXISTS idx_test_cases_covered_requirements ON test_cases USING GIN(covered_requirements);
 
--- Индекс для pgvector semantic similarity search
-CREATE INDEX IF NOT EXISTS idx_test_cases_semantic_embedding ON test_cases 
-USING ivfflat (semantic_embedding vector_cosine_ops)
-WITH (lists = 100);
+-- Колонка под размерность text-embedding-ada-002: прежние 768-мерные значения были хэш-заглушками и сбрасываются
+DO $$
+BEGIN
+    IF (SELECT atttypmod FROM pg_attribute WHERE attrelid = 'test_cases'::regclass AND attname = 'semantic_embedding') <> 1536 THEN
+        DROP INDEX IF EXISTS idx_test_cases_semantic_embedding_hnsw;
+        ALTER TABLE test_cases ALTER COLUMN semantic_embedding TYPE VECTOR(1536) USING NULL;
+    END IF;
+END $$;
+
+-- Индекс для pgvector semantic similarity search (HNSW: не требует обучения на пустой таблице, как ivfflat)
+DROP INDEX IF EXISTS idx_test_cases_semantic_embedding;
+CREATE INDEX IF NOT EXISTS idx_test_cases_semantic_embedding_hnsw ON test_cases
+USING hnsw (semantic_embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
 
 -- ============================================
 -- Table: generation_metrics
@@ -240,6 +261,20 @@ CREATE INDEX IF NOT EXISTS idx_security_audit_risk_level ON security_audit_log(r
 CREATE INDEX IF NOT EXISTS idx_security_audit_action_taken ON security_audit_log(action_taken);
 CREATE INDEX IF NOT EXISTS idx_security_audit_created_at ON security_audit_log(created_at DESC);
 
+-- ============================================
+-- Table: langgraph_checkpoints
+-- ============================================
+CREATE TABLE IF NOT EXISTS langgraph_checkpoints (
+    checkpoint_id BIGSERIAL PRIMARY KEY,
+    thread_id VARCHAR(255) NOT NULL,
+    checkpoint_ts VARCHAR(64) NOT NULL,
+    payload BYTEA NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_langgraph_checkpoints_thread ON langgraph_checkpoints(thread_id, checkpoint_id DESC);
+
 -- ============================================
 -- Triggers for updated_at
 -- ============================================
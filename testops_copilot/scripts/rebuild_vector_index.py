@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Первичное наполнение эмбеддингов уже сохранённых тестов: колонка semantic_embedding (pgvector)
+и, при optimizer_duplicate_backend=index, локальный mmap-индекс.
+Дальше оба пополняются инкрементально в save_results_node.
+"""
+
+import argparse
+import sys
+import os
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config.settings import settings
+from shared.utils.database import get_db
+from shared.utils.test_case_repository import test_case_repository
+from shared.models.database import TestCase
+from shared.utils.async_runtime import run_coro
+from agents.optimizer.embeddings import embed_texts_with_status, test_embedding_text
+from agents.optimizer.similarity import normalize_embeddings
+from agents.optimizer.vector_index import test_vector_index
+
+
+def rebuild(batch_size):
+    use_index = settings.optimizer_duplicate_backend == "index"
+    if use_index and test_vector_index.count():
+        print(f"❌ Индекс {test_vector_index.path} уже содержит {test_vector_index.count()} векторов, удалите каталог для пересборки")
+        return
+    indexed = 0
+    with get_db() as db:
+        query = (
+            db.query(TestCase.test_id, TestCase.test_name, TestCase.test_code)
+            .filter(TestCase.is_duplicate.isnot(True), TestCase.semantic_embedding.is_(None))
+            .order_by(TestCase.created_at)
+            .yield_per(batch_size)
+        )
+        batch = []
+        for row in query:
+            batch.append(row)
+            if len(batch) == batch_size:
+                indexed += index_batch(db, batch, use_index)
+                batch = []
+        if batch:
+            indexed += index_batch(db, batch, use_index)
+    print(f"✅ Проиндексировано {indexed} тестов")
+
+
+def index_batch(db, batch, use_index):
+    embeddings, fallbacks = run_coro(embed_texts_with_status([test_embedding_text(row.test_name, row.test_code) for row in batch]))
+    # Хэш-fallback не сохраняется: строка остаётся NULL и попадёт в следующий прогон
+    embedded = [(row, embedding) for row, embedding, fallback in zip(batch, embeddings, fallbacks) if not fallback]
+    if not embedded:
+        return 0
+    batch = [row for row, _ in embedded]
+    matrix = normalize_embeddings([embedding for _, embedding in embedded])
+    test_case_repository.set_embeddings(db, [(row.test_id, embedding) for row, embedding in zip(batch, matrix)])
+    if use_index:
+        test_vector_index.add([str(row.test_id) for row in batch], matrix)
+    return len(batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=512)
+    rebuild(parser.parse_args().batch_size)
@@ -79,9 +79,100 @@ class Settings(BaseSettings):
     @property
     def langgraph_checkpoint(self) -> str:
         return self.langgraph_checkpoint_db or self.database_url
+    langgraph_checkpoint_backend: str = "postgres"
+    langgraph_checkpoint_pool_size: int = 5
+    langgraph_checkpoint_history: int = 3
+    langgraph_checkpoint_compression_level: int = 3
+    langgraph_checkpoint_retry_interval: int = 30
+    test_blob_ttl: int = 604800
+    test_blob_local_cache_size: int = 512
+    langgraph_node_timeouts: dict = {
+        "reconnaissance": 420,
+        "generation": 600,
+        "validation": 600,
+        "optimization": 600,
+        "save_results": 180
+    }
+    langgraph_default_node_timeout: int = 600
+    langgraph_lock_ttl: int = 300
     safety_guard_enabled: bool = True
     safety_guard_sandbox_enabled: bool = True
     safety_guard_llm_analysis_enabled: bool = True
+    safety_guard_llm_batch_size: int = 20
+    safety_guard_llm_batch_chars: int = 24000
+    safety_guard_llm_cache_ttl: int = 86400
+    recon_browser_pool_enabled: bool = True
+    recon_browser_max_contexts: int = 4
+    recon_browser_recycle_after: int = 200
+    recon_browser_launch_timeout: int = 60
+    recon_max_elements: int = 50
+    recon_block_resources: bool = True
+    recon_blocked_resource_types: list = ["image", "media", "font"]
+    recon_blocked_domains: list = [
+        "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+        "facebook.net", "mc.yandex.ru", "hotjar.com", "segment.io", "top-fwz1.mail.ru"
+    ]
+    recon_crawl_max_depth: int = 2
+    recon_crawl_max_pages: int = 20
+    recon_crawl_concurrency: int = 4
+    recon_crawl_timeout: int = 300
+    recon_backend: str = "browser"
+    recon_html_snapshot_ttl: int = 86400
+    recon_html_max_length: int = 5000000
+    recon_cache_enabled: bool = True
+    recon_cache_ttl: int = 3600
+    recon_cache_revalidate_timeout: int = 5
+    generator_context_token_budget: int = 1500
+    generator_context_embeddings: bool = True
+    embedding_model: str = "text-embedding-ada-002"
+    embedding_dimensions: int = 1536
+    optimizer_embedding_batch_size: int = 128
+    optimizer_similarity_block_size: int = 2048
+    optimizer_lsh_prefilter: bool = True
+    optimizer_minhash_permutations: int = 128
+    optimizer_lsh_bands: int = 16
+    optimizer_shingle_size: int = 5
+    optimizer_lsh_threshold: float = 0.5
+    optimizer_lsh_max_bucket: int = 50
+    optimizer_time_budget: float = 120.0
+    optimizer_lsh_duplicate_jaccard: float = 0.9
+    optimizer_llm_min_similarity: float = 0.75
+    optimizer_llm_batch_size: int = 10
+    optimizer_llm_batch_chars: int = 24000
+    optimizer_llm_max_concurrency: int = 4
+    optimizer_llm_cache_ttl: int = 86400
+    optimizer_coverage_semantic_threshold: float = 0.86
+    optimizer_coverage_lexical_threshold: float = 0.5
+    optimizer_index_enabled: bool = True
+    optimizer_index_path: str = "/tmp/testops_vector_index"
+    optimizer_index_nprobe: int = 8
+    optimizer_index_train_min: int = 1024
+    optimizer_duplicate_threshold: float = 0.95
+    optimizer_duplicate_backend: str = "pgvector"
+    pgvector_ef_search: int = 40
+    redis_vector_index_name: str = "idx:test_vectors"
+    redis_vector_ttl: int = 3600
+    redis_vector_hnsw_m: int = 16
+    redis_vector_hnsw_ef_construction: int = 200
+    redis_vector_ef_runtime: int = 50
+    security_audit_enabled: bool = True
+    security_audit_batch_size: int = 200
+    security_audit_flush_interval: float = 5.0
+    security_audit_max_buffer: int = 10000
+    security_audit_max_attempts: int = 3
+    collection_check_enabled: bool = True
+    collection_check_timeout: int = 60
+    collection_check_max_parallel: int = 2
+    collection_check_max_memory_mb: int = 1024
+    collection_check_external_fixtures: list = [
+        "page", "context", "browser", "browser_name", "browser_type", "browser_channel",
+        "browser_context_args", "browser_type_launch_args", "launch_browser",
+        "is_chromium", "is_firefox", "is_webkit", "base_url", "api_request_context"
+    ]
+    execution_default_workers: int = 4
+    execution_timeout: int = 900
+    execution_max_memory_mb: int = 2048
+    execution_results_dir: str = "/tmp/testops_execution"
     log_level: str = "INFO"
     log_format: str = "json"
     email_notifications_enabled: bool = True
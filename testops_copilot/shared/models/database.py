@@ -1,7 +1,7 @@
 
 from sqlalchemy import (
     Column, String, Integer, Boolean, Text,
-    DateTime, ForeignKey, DECIMAL, JSON, LargeBinary
+    DateTime, ForeignKey, DECIMAL, JSON, LargeBinary, BigInteger
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
@@ -70,7 +70,8 @@ class TestCase(Base):
     code_hash = Column(String(64), nullable=False)
     ast_hash = Column(String(64), nullable=True)
     if VECTOR_AVAILABLE:
-        semantic_embedding = Column(Vector(768), nullable=True)
+        # Размерность settings.embedding_model (text-embedding-ada-002); меняется вместе с init_db.sql
+        semantic_embedding = Column(Vector(1536), nullable=True)
     else:
         semantic_embedding = Column(Text, nullable=True)
     covered_requirements = Column(JSONB, default=[])
@@ -81,6 +82,10 @@ class TestCase(Base):
     is_duplicate = Column(Boolean, default=False)
     duplicate_of = Column(UUID(as_uuid=True), ForeignKey("test_cases.test_id", ondelete="SET NULL"), nullable=True)
     similarity_score = Column(DECIMAL(5, 4), nullable=True)
+    execution_status = Column(String(20), nullable=True)
+    execution_duration_ms = Column(Integer, nullable=True)
+    execution_message = Column(Text, nullable=True)
+    last_executed_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     request = relationship("Request", back_populates="test_cases")
@@ -132,4 +137,12 @@ class SecurityAuditLog(Base):
     details = Column(JSONB, default={})
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     request = relationship("Request", back_populates="security_audit_logs")
-    test_case = relationship("TestCase", back_populates="security_audit_logs")
\ No newline at end of file
+    test_case = relationship("TestCase", back_populates="security_audit_logs")
+class WorkflowCheckpoint(Base):
+    __tablename__ = "langgraph_checkpoints"
+    checkpoint_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    thread_id = Column(String(255), nullable=False)
+    checkpoint_ts = Column(String(64), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
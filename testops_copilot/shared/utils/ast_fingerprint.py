@@ -0,0 +1,68 @@
+import ast
+import hashlib
+from typing import Dict, Optional, Union
+class _Canonicalizer(ast.NodeTransformer):
+    """
+    Приводит AST теста к канонической форме: имена функций, аргументов и переменных
+    заменяются порядковыми (v0, v1, ...), docstring отбрасываются, у декораторов остаётся
+    только вызываемый объект. Атрибуты (page.click, expect(...).to_be_visible), имена keyword-аргументов
+    и литералы (URL в goto, селекторы locator/get_by_*, значения fill) сохраняются - это и есть тест.
+    """
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+    def _alias(self, name: str) -> str:
+        if name not in self.names:
+            self.names[name] = f"v{len(self.names)}"
+        return self.names[name]
+    def _strip_docstring(self, node):
+        body = getattr(node, "body", None)
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+    def _function(self, node):
+        node.name = self._alias(node.name)
+        node.decorator_list = [
+            decorator.func if isinstance(decorator, ast.Call) else decorator
+            for decorator in node.decorator_list
+        ]
+        node.returns = None
+        self._strip_docstring(node)
+        return self.generic_visit(node)
+    visit_FunctionDef = _function
+    visit_AsyncFunctionDef = _function
+    def visit_ClassDef(self, node):
+        node.name = self._alias(node.name)
+        node.decorator_list = [
+            decorator.func if isinstance(decorator, ast.Call) else decorator
+            for decorator in node.decorator_list
+        ]
+        self._strip_docstring(node)
+        return self.generic_visit(node)
+    def visit_Module(self, node):
+        self._strip_docstring(node)
+        return self.generic_visit(node)
+    def visit_arg(self, node):
+        node.arg = self._alias(node.arg)
+        node.annotation = None
+        return node
+    def visit_Name(self, node):
+        node.id = self._alias(node.id)
+        return node
+def canonical_tree(source: Union[str, ast.AST]) -> Optional[ast.AST]:
+    # Переданное дерево изменяется на месте
+    if isinstance(source, str):
+        try:
+            source = ast.parse(source)
+        except (SyntaxError, ValueError):
+            return None
+    return _Canonicalizer().visit(source)
+def canonical_ast_hash(source: Union[str, ast.AST, None]) -> Optional[str]:
+    """
+    sha256 канонического AST: тесты, отличающиеся только именами, docstring, аргументами декораторов,
+    комментариями и форматированием, получают одинаковый хэш. Для кода с синтаксическими ошибками - None.
+    """
+    if source is None:
+        return None
+    tree = canonical_tree(source)
+    if tree is None:
+        return None
+    return hashlib.sha256(ast.dump(tree, annotate_fields=False).encode()).hexdigest()
@@ -0,0 +1,105 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Optional
+class DeadlineExceeded(TimeoutError):
+    pass
+_deadlines = threading.local()
+@contextmanager
+def deadline(seconds: float):
+    """
+    Дедлайн текущего потока: run_coro внутри блока ждёт не дольше оставшегося времени
+    и отменяет корутину по его истечении. Вложенные дедлайны не продлевают внешний.
+    """
+    previous = getattr(_deadlines, "at", None)
+    at = time.monotonic() + seconds
+    _deadlines.at = at if previous is None else min(previous, at)
+    try:
+        yield
+    finally:
+        _deadlines.at = previous
+def deadline_exceeded() -> bool:
+    at = getattr(_deadlines, "at", None)
+    return at is not None and time.monotonic() >= at
+def remaining_time(timeout: Optional[float] = None) -> Optional[float]:
+    # Таймаут операции, урезанный до остатка дедлайна потока
+    at = getattr(_deadlines, "at", None)
+    if at is None:
+        return timeout
+    left = max(0.0, at - time.monotonic())
+    return left if timeout is None else min(timeout, left)
+class AsyncRuntime:
+    """
+    Долгоживущий event loop процесса в отдельном потоке.
+    Синхронный код (узлы LangGraph, задачи Celery) исполняет корутины через run_coro,
+    поэтому пулы соединений httpx/AsyncOpenAI переживают отдельные задачи.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+    def start(self):
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            # После fork поток цикла не наследуется - создаём новый в дочернем процессе
+            self._pid = os.getpid()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, name="async-runtime", daemon=True)
+            self._thread.start()
+    def run_coro(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run_coro() called from the runtime loop thread; await the coroutine instead")
+        if deadline_exceeded():
+            coro.close()
+            raise DeadlineExceeded("Deadline exceeded before the coroutine was started")
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(remaining_time(timeout))
+        except BaseException as e:
+            future.cancel()
+            if isinstance(e, concurrent.futures.TimeoutError) and deadline_exceeded():
+                raise DeadlineExceeded("Deadline exceeded, coroutine cancelled") from e
+            raise
+    def submit(self, coro: Awaitable):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    async def run(self, coro: Awaitable) -> Any:
+        # Из чужого event loop (uvicorn): корутина исполняется на цикле runtime, вызывающий цикл не блокируется.
+        # Так llm_client и его пулы соединений используются только на одном цикле
+        if threading.current_thread() is self._thread:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+    def shutdown(self, timeout: float = 10):
+        if self._loop is None or self._pid != os.getpid():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=timeout)
+        self._loop = None
+        self._thread = None
+    def _running(self) -> bool:
+        return (
+            self._loop is not None
+            and self._pid == os.getpid()
+            and self._thread is not None
+            and self._thread.is_alive()
+        )
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+async_runtime = AsyncRuntime()
+def run_coro(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    return async_runtime.run_coro(coro, timeout)
+async def run_on_runtime(coro: Awaitable) -> Any:
+    return await async_runtime.run(coro)
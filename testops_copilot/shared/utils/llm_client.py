@@ -1,17 +1,23 @@
 
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from shared.config.settings import settings
 from shared.utils.redis_client import redis_client
 from shared.utils.logger import llm_logger
 import hashlib
 import json
+import re
 try:
     from openai import OpenAI, AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
     import httpx
+class EmbeddingsUnavailable(RuntimeError):
+    pass
+def embedding_cache_key(text: str) -> str:
+    # Модель входит в ключ: после смены embedding_model старые векторы не подмешиваются
+    return f"embedding:{settings.embedding_model}:{hashlib.sha256(text.encode()).hexdigest()}"
 class LLMClient:
     def __init__(self):
         self.base_url = settings.cloud_ru_foundation_models_url
@@ -179,9 +185,11 @@ class LLMClient:
                     raise
                 await asyncio.sleep(base_delay * (2 ** attempt))
         raise Exception("Failed to generate after retries")
-    async def generate_embeddings(self, text: str) -> list:
+    async def generate_embeddings(self, text: str, allow_fallback: bool = True) -> list:
+        # allow_fallback=False: вместо хэш-псевдовектора поднимается EmbeddingsUnavailable,
+        # чтобы вызывающий не принял заглушку за настоящий эмбеддинг
         try:
-            cache_key = f"embedding:{hashlib.sha256(text.encode()).hexdigest()}"
+            cache_key = embedding_cache_key(text)
             try:
                 cached = redis_client.cache.get(cache_key)
                 if cached:
@@ -192,7 +200,7 @@ class LLMClient:
             if self._openai_client:
                 try:
                     response = await self._openai_client.embeddings.create(
-                        model="text-embedding-ada-002",
+                        model=settings.embedding_model,
                         input=text
                     )
                     embedding = response.data[0].embedding
@@ -207,12 +215,16 @@ class LLMClient:
                         pass
                     return embedding
                 except Exception as e:
+                    if not allow_fallback:
+                        raise EmbeddingsUnavailable(f"Embeddings request failed: {e}") from e
                     llm_logger.warning(f"Failed to generate embeddings via OpenAI SDK: {e}, falling back to hash-based")
+            if not allow_fallback:
+                raise EmbeddingsUnavailable("Embeddings client is not configured")
             llm_logger.warning("Using hash-based embeddings fallback")
             hash_obj = hashlib.sha256(text.encode('utf-8'))
             hash_bytes = hash_obj.digest()
             embedding = []
-            for i in range(768):
+            for i in range(settings.embedding_dimensions):
                 byte_idx = i % len(hash_bytes)
                 next_byte_idx = (i + 1) % len(hash_bytes)
                 value = (hash_bytes[byte_idx] + hash_bytes[next_byte_idx] * 256) / 65535.0
@@ -222,8 +234,68 @@ class LLMClient:
             if norm > 0:
                 embedding = [x / norm for x in embedding]
             return embedding
+        except EmbeddingsUnavailable:
+            raise
         except Exception as e:
+            if not allow_fallback:
+                raise EmbeddingsUnavailable(f"Embeddings generation failed: {e}") from e
             llm_logger.error(f"Error generating embeddings: {e}", exc_info=True)
             hash_obj = hashlib.sha256(text.encode('utf-8'))
             return [float(b) / 255.0 for b in hash_obj.digest()[:384]]
+    async def generate_embeddings_batch(self, texts: List[str]) -> Optional[List[list]]:
+        # Кэш Redis (mget), недостающие тексты - одним запросом с записью в кэш; None - если настоящие эмбеддинги недоступны
+        if not texts:
+            return []
+        keys = [embedding_cache_key(text) for text in texts]
+        embeddings: List[Optional[list]] = [None] * len(texts)
+        try:
+            cached = redis_client.cache.mget(keys)
+            for idx, value in enumerate(cached):
+                if value:
+                    embeddings[idx] = json.loads(value)
+        except Exception:
+            pass
+        missing = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            if not self._openai_client:
+                return None
+            try:
+                response = await self._openai_client.embeddings.create(
+                    model=settings.embedding_model,
+                    input=[texts[idx] for idx in missing]
+                )
+            except Exception as e:
+                llm_logger.warning(f"Batch embeddings request failed: {e}")
+                return None
+            import math
+            for idx, item in zip(missing, response.data):
+                embedding = item.embedding
+                norm = math.sqrt(sum(x*x for x in embedding))
+                embeddings[idx] = [x / norm for x in embedding] if norm > 0 else embedding
+            try:
+                pipe = redis_client.cache.pipeline()
+                for idx in missing:
+                    pipe.setex(keys[idx], 86400, json.dumps(embeddings[idx]))
+                pipe.execute()
+            except Exception:
+                pass
+        return embeddings
+def parse_json_response(content: str) -> Any:
+    if not content:
+        return None
+    text = content.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    match = re.search(r"(\[.*\]|\{.*\})", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except ValueError:
+            return None
+    return None
 llm_client = LLMClient()
\ No newline at end of file
@@ -1,6 +1,8 @@
 
+import re
+import numpy as np
 import redis
-from typing import Optional
+from typing import List, Optional, Tuple
 from shared.config.settings import settings
 class RedisClient:
     def __init__(self):
@@ -73,7 +75,11 @@ class RedisClient:
         pubsub_obj = redis_async.pubsub()
         await pubsub_obj.subscribe(channel)
         return pubsub_obj, redis_async
-    def create_vector_index(self, index_name: str, vector_dim: int = 768):
+    def create_vector_index(self, index_name: str, vector_dim: int = 1536, legacy_index: Optional[str] = None):
+        """
+        HNSW-индекс RediSearch по хэшам test:{index_name}:{namespace}:{test_id}.
+        Поле namespace (TAG) изолирует запросы разных прогонов внутри одного индекса.
+        """
         try:
             # Redis Search может создавать индексы только на базе данных 0
             # Используем базу 0 для индексов, но с префиксом для изоляции
@@ -88,79 +94,121 @@ class RedisClient:
                 "ON", "HASH",
                 "PREFIX", "1", f"test:{index_name}:",
                 "SCHEMA",
-                "test_id", "TEXT",
-                "test_name", "TEXT",
-                "embedding", "VECTOR", "FLAT", "6", "DIM", str(vector_dim), "DISTANCE_METRIC", "COSINE"
+                "namespace", "TAG",
+                "test_id", "TAG",
+                "test_name", "TEXT", "NOINDEX",
+                "embedding", "VECTOR", "HNSW", "10",
+                "TYPE", "FLOAT32",
+                "DIM", str(vector_dim),
+                "DISTANCE_METRIC", "COSINE",
+                "M", str(settings.redis_vector_hnsw_m),
+                "EF_CONSTRUCTION", str(settings.redis_vector_hnsw_ef_construction)
             )
+            if legacy_index:
+                # Старый FLAT-индекс без TTL разрастался бесконечно - удаляем вместе с документами
+                try:
+                    client.execute_command("FT.DROPINDEX", legacy_index, "DD")
+                except (redis.ResponseError, redis.exceptions.ResponseError):
+                    pass
             return True
         except Exception as e:
             from shared.utils.logger import api_logger
             api_logger.warning(f"Error creating vector index (will continue without vector search): {e}")
             # Не критично - продолжаем без векторного поиска
             return False
-    def save_vector(self, index_name: str, test_id: str, test_name: str, embedding: list):
+    def vector_key(self, index_name: str, namespace: str, test_id: str) -> str:
+        return f"test:{index_name}:{namespace}:{test_id}"
+    def save_vectors(self, index_name: str, namespace: str, items: List[Tuple[str, str, list]], ttl: Optional[int] = None) -> bool:
+        # Все HSET и EXPIRE одним pipeline; по истечении TTL документы уходят и из индекса
+        ttl = ttl or settings.redis_vector_ttl
         try:
-            # Используем базу 0 для совместимости с Redis Search индексами
             client = self.get_client(0, decode_responses=False)
-            key = f"test:{index_name}:{test_id}"
-            import struct
-            embedding_bytes = struct.pack(f"{len(embedding)}f", *embedding)
-            client.hset(
-                key,
-                mapping={
-                    "test_id": test_id.encode() if isinstance(test_id, str) else test_id,
-                    "test_name": test_name.encode() if isinstance(test_name, str) else test_name,
-                    "embedding": embedding_bytes
-                }
-            )
+            pipe = client.pipeline(transaction=False)
+            for test_id, test_name, embedding in items:
+                key = self.vector_key(index_name, namespace, test_id)
+                pipe.hset(key, mapping={
+                    "namespace": namespace,
+                    "test_id": test_id,
+                    "test_name": test_name or "",
+                    "embedding": np.asarray(embedding, dtype=np.float32).tobytes()
+                })
+                pipe.expire(key, ttl)
+            pipe.execute()
             return True
         except Exception as e:
             from shared.utils.logger import api_logger
-            api_logger.warning(f"Error saving vector (will continue without vector search): {e}")
+            api_logger.warning(f"Error saving vectors (will continue without vector search): {e}")
             # Не критично - продолжаем без векторного поиска
             return False
-    def search_similar_vectors(self, index_name: str, query_vector: list, top_k: int = 10, threshold: float = 0.85):
+    def save_vector(self, index_name: str, namespace: str, test_id: str, test_name: str, embedding: list) -> bool:
+        return self.save_vectors(index_name, namespace, [(test_id, test_name, embedding)])
+    def delete_vectors(self, index_name: str, namespace: str, test_ids: List[str], chunk_size: int = 1000):
         try:
-            # Используем базу 0 для совместимости с Redis Search индексами
             client = self.get_client(0, decode_responses=False)
-            import struct
-            query_bytes = struct.pack(f"{len(query_vector)}f", *query_vector)
-            results = client.execute_command(
-                "FT.SEARCH", index_name,
-                f"*=>[KNN $top_k @embedding $query_vector AS distance]",
-                "PARAMS", "2", "query_vector", query_bytes, "top_k", str(top_k),
-                "SORTBY", "distance", "ASC",
-                "RETURN", "2", "test_id", "distance",
-                "LIMIT", "0", str(top_k)
-            )
-            similar_tests = []
-            if results and len(results) > 1:
-                count = results[0]
-                i = 1
-                while i < len(results):
-                    if i + 1 < len(results):
-                        key = results[i]
-                        fields = results[i + 1]
-                        test_id_bytes = fields.get(b"test_id", b"")
-                        test_id = test_id_bytes.decode() if isinstance(test_id_bytes, bytes) else str(test_id_bytes)
-                        distance_bytes = fields.get(b"distance", b"0")
-                        if isinstance(distance_bytes, bytes):
-                            try:
-                                distance = float(distance_bytes.decode())
-                            except:
-                                distance = 1.0
-                        else:
-                            distance = float(distance_bytes)
-                        similarity = max(0.0, 1.0 - distance)
-                        if similarity >= threshold:
-                            similar_tests.append({
-                                "test_id": test_id,
-                                "similarity": similarity
-                            })
-                    i += 2
-            return similar_tests
+            keys = [self.vector_key(index_name, namespace, test_id) for test_id in test_ids]
+            for start in range(0, len(keys), chunk_size):
+                client.unlink(*keys[start:start + chunk_size])
+        except Exception as e:
+            from shared.utils.logger import api_logger
+            api_logger.warning(f"Error deleting vectors (they will expire by TTL): {e}")
+    def search_similar_vectors_batch(
+        self,
+        index_name: str,
+        namespace: str,
+        query_vectors: List[list],
+        top_k: int = 10,
+        threshold: float = 0.85,
+        chunk_size: int = 256
+    ) -> List[List[dict]]:
+        """
+        KNN-запросы по многим векторам: FT.SEARCH отправляются пачками через pipeline,
+        один сетевой round-trip на chunk_size запросов.
+        """
+        query = f"@namespace:{{{escape_tag(namespace)}}}=>[KNN $top_k @embedding $query_vector EF_RUNTIME $ef AS distance]"
+        try:
+            client = self.get_client(0, decode_responses=False)
+            results = []
+            for start in range(0, len(query_vectors), chunk_size):
+                pipe = client.pipeline(transaction=False)
+                for vector in query_vectors[start:start + chunk_size]:
+                    pipe.execute_command(
+                        "FT.SEARCH", index_name, query,
+                        "PARAMS", "6",
+                        "query_vector", np.asarray(vector, dtype=np.float32).tobytes(),
+                        "top_k", str(top_k),
+                        "ef", str(max(settings.redis_vector_ef_runtime, top_k)),
+                        "SORTBY", "distance", "ASC",
+                        "RETURN", "2", "test_id", "distance",
+                        "LIMIT", "0", str(top_k),
+                        "DIALECT", "2"
+                    )
+                results.extend(parse_vector_search(reply, threshold) for reply in pipe.execute())
+            return results
         except Exception as e:
             from shared.utils.logger import api_logger
             api_logger.error(f"Error searching similar vectors: {e}", exc_info=True)
-            return []
+            return [[] for _ in query_vectors]
+    def search_similar_vectors(self, index_name: str, namespace: str, query_vector: list, top_k: int = 10, threshold: float = 0.85) -> List[dict]:
+        return self.search_similar_vectors_batch(index_name, namespace, [query_vector], top_k, threshold)[0]
+def escape_tag(value: str) -> str:
+    return re.sub(r"([^A-Za-z0-9_])", r"\\\1", value)
+def parse_vector_search(reply, threshold: float) -> List[dict]:
+    # Ответ RESP2: [count, key1, [field, value, ...], key2, [...], ...]
+    similar_tests = []
+    if not reply or len(reply) < 2:
+        return similar_tests
+    for fields in reply[2::2]:
+        values = dict(zip(fields[::2], fields[1::2]))
+        test_id = values.get(b"test_id", b"")
+        try:
+            distance = float(values.get(b"distance", b"1"))
+        except (TypeError, ValueError):
+            distance = 1.0
+        similarity = max(0.0, 1.0 - distance)
+        if similarity >= threshold:
+            similar_tests.append({
+                "test_id": test_id.decode() if isinstance(test_id, bytes) else str(test_id),
+                "similarity": similarity
+            })
+    return similar_tests
 redis_client = RedisClient()
\ No newline at end of file
@@ -0,0 +1,148 @@
+import atexit
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Dict, List, Any, Optional
+from shared.config.settings import settings
+from shared.utils.logger import agent_logger
+class SecurityAuditSink:
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_buffer: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self.batch_size = batch_size or settings.security_audit_batch_size
+        self.max_attempts = max_attempts or settings.security_audit_max_attempts
+        self.flush_interval = flush_interval or settings.security_audit_flush_interval
+        # Ограниченный буфер: при недоступной БД старые записи вытесняются, валидация не ждёт
+        self._buffer = deque(maxlen=max_buffer or settings.security_audit_max_buffer)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        # Неудачные попытки записи по audit_id: пачка, которая падает снова и снова, делится пополам
+        self._attempts: Dict[uuid.UUID, int] = {}
+        self.dropped = 0
+        self.written = 0
+    def record(
+        self,
+        request_id: str,
+        safety_result: Dict[str, Any],
+        test_id: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None
+    ):
+        if not settings.security_audit_enabled or not request_id:
+            return
+        try:
+            row = {
+                "audit_id": uuid.uuid4(),
+                "request_id": uuid.UUID(str(request_id)),
+                "test_id": uuid.UUID(str(test_id)) if test_id else None,
+                "security_layer": safety_result.get("security_layer", "static"),
+                "risk_level": safety_result.get("risk_level", "SAFE"),
+                "issues": safety_result.get("issues", []),
+                "blocked_patterns": safety_result.get("blocked_patterns", []),
+                "action_taken": safety_result.get("action_taken", "allowed"),
+                "details": details or {}
+            }
+        except (ValueError, AttributeError) as e:
+            agent_logger.warning(f"[SECURITY_AUDIT] Skipping malformed audit record: {e}")
+            return
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._attempts.pop(self._buffer[0]["audit_id"], None)
+                self.dropped += 1
+            self._buffer.append(row)
+            size = len(self._buffer)
+        self._ensure_flusher()
+        if size >= self.batch_size:
+            self._wakeup.set()
+    def request_flush(self):
+        # Неблокирующий сброс: запись выполняет фоновый поток
+        self._ensure_flusher()
+        self._wakeup.set()
+    def flush(self) -> int:
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    break
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    agent_logger.warning(f"[SECURITY_AUDIT] Bulk insert of {len(batch)} records failed: {e}")
+                    attempts = max(self._attempts.get(row["audit_id"], 0) for row in batch) + 1
+                    if attempts >= self.max_attempts:
+                        # Ошибка, вероятно, в отдельной записи (FK, данные) - изолируем её, остальные пишем
+                        written += self._write_isolated(batch)
+                        continue
+                    for row in batch:
+                        self._attempts[row["audit_id"]] = attempts
+                    with self._lock:
+                        # Возвращаем записи в начало буфера для следующей попытки
+                        retained = batch[:self._buffer.maxlen - len(self._buffer)]
+                        self._buffer.extendleft(reversed(retained))
+                        self._forget(batch[len(retained):])
+                        self.dropped += len(batch) - len(retained)
+                    break
+                self._forget(batch)
+                written += len(batch)
+        self.written += written
+        return written
+    def _write_isolated(self, rows: List[Dict[str, Any]]) -> int:
+        # Делением пополам находим записи, которые не вставляются даже поодиночке, и отбрасываем их
+        if len(rows) == 1:
+            self._forget(rows)
+            agent_logger.error(
+                f"[SECURITY_AUDIT] Dropping audit record {rows[0]['audit_id']} "
+                f"(request {rows[0]['request_id']}) after {self.max_attempts} failed attempts"
+            )
+            self.dropped += 1
+            return 0
+        written = 0
+        middle = len(rows) // 2
+        for part in (rows[:middle], rows[middle:]):
+            try:
+                self._write(part)
+            except Exception:
+                written += self._write_isolated(part)
+                continue
+            self._forget(part)
+            written += len(part)
+        return written
+    def _forget(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            self._attempts.pop(row["audit_id"], None)
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+    def _write(self, rows: List[Dict[str, Any]]):
+        from sqlalchemy import insert
+        from shared.utils.database import get_db
+        from shared.models.database import SecurityAuditLog
+        with get_db() as db:
+            db.execute(insert(SecurityAuditLog), rows)
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="security-audit-flusher", daemon=True)
+            self._thread.start()
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self.pending():
+                self.flush()
+security_audit_sink = SecurityAuditSink()
+atexit.register(security_audit_sink.flush)
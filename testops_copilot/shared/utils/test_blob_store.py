@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from shared.config.settings import settings
+from shared.utils.redis_client import redis_client
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+class TestBlobStore:
+    """
+    Контентно-адресуемое хранилище кода тестов в Redis (ключ - sha256).
+    WorkflowState и checkpoint несут только хэши, тела подтягиваются узлами по необходимости.
+    """
+    __test__ = False
+    def __init__(self, ttl: Optional[int] = None, local_cache_size: Optional[int] = None):
+        self.ttl = ttl or settings.test_blob_ttl
+        self.local_cache_size = local_cache_size or settings.test_blob_local_cache_size
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+    def put_many(self, codes: List[str]) -> List[str]:
+        hashes = [code_hash(code) for code in codes]
+        unique = dict(zip(hashes, codes))
+        if unique:
+            pipe = redis_client.cache.pipeline(transaction=False)
+            for digest, code in unique.items():
+                # Повторная запись того же содержимого только продлевает TTL
+                pipe.set(f"test_blob:{digest}", code, ex=self.ttl)
+            pipe.execute()
+            for digest, code in unique.items():
+                self._remember(digest, code)
+        return hashes
+    def put(self, code: str) -> str:
+        return self.put_many([code])[0]
+    def get_many(self, hashes: List[str]) -> List[str]:
+        found: Dict[str, str] = {}
+        with self._lock:
+            for digest in hashes:
+                if digest in self._local:
+                    self._local.move_to_end(digest)
+                    found[digest] = self._local[digest]
+        missing = [digest for digest in dict.fromkeys(hashes) if digest not in found]
+        if missing:
+            values = redis_client.cache.mget([f"test_blob:{digest}" for digest in missing])
+            for digest, code in zip(missing, values):
+                if code is None:
+                    raise KeyError(f"Test blob {digest} not found (expired or never stored)")
+                found[digest] = code
+                self._remember(digest, code)
+        return [found[digest] for digest in hashes]
+    def get(self, digest: str) -> str:
+        return self.get_many([digest])[0]
+    def _remember(self, digest: str, code: str):
+        with self._lock:
+            self._local[digest] = code
+            self._local.move_to_end(digest)
+            while len(self._local) > self.local_cache_size:
+                self._local.popitem(last=False)
+test_blob_store = TestBlobStore()
+def store_tests(tests: List[Any]) -> List[Dict[str, Any]]:
+    # Заменяет код тестов ссылками {"code_ref": sha256, ...}, остальные поля сохраняются
+    entries = [test if isinstance(test, dict) else {"code": test} for test in tests]
+    with_code = [idx for idx, entry in enumerate(entries) if isinstance(entry.get("code"), str)]
+    hashes = test_blob_store.put_many([entries[idx]["code"] for idx in with_code])
+    refs = [dict(entry) for entry in entries]
+    for idx, digest in zip(with_code, hashes):
+        refs[idx].pop("code")
+        refs[idx]["code_ref"] = digest
+    return refs
+def load_tests(tests: List[Any]) -> List[Dict[str, Any]]:
+    # Обратная операция: подставляет "code" по ссылкам; записи старого формата (строка или {"code"}) проходят как есть
+    entries = [test if isinstance(test, dict) else {"code": test} for test in tests]
+    with_ref = [idx for idx, entry in enumerate(entries) if entry.get("code_ref")]
+    codes = test_blob_store.get_many([entries[idx]["code_ref"] for idx in with_ref])
+    resolved = [dict(entry) for entry in entries]
+    for idx, code in zip(with_ref, codes):
+        resolved[idx]["code"] = code
+    return resolved
@@ -0,0 +1,123 @@
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import bindparam, select, text, update
+from sqlalchemy.orm import Session
+from shared.config.settings import settings
+from shared.models.database import Request, TestCase, VECTOR_AVAILABLE
+class TestCaseRepository:
+    """
+    Запросы дедупликации к test_cases: точные структурные дубликаты по ast_hash (B-tree индекс)
+    и векторные по semantic_embedding (pgvector, HNSW по vector_cosine_ops).
+    Эмбеддинги хранятся нормализованными, similarity = 1 - cosine_distance.
+    """
+    __test__ = False
+    @property
+    def embedding_dim(self) -> Optional[int]:
+        return TestCase.semantic_embedding.type.dim if VECTOR_AVAILABLE else None
+    def accepts(self, embedding: Sequence[float]) -> bool:
+        return self.embedding_dim is not None and len(embedding) == self.embedding_dim
+    def set_embeddings(self, db: Session, items: Sequence[Tuple[uuid.UUID, Sequence[float]]], chunk_size: int = 500) -> int:
+        # Дозапись эмбеддингов уже сохранённых тестов пачками (executemany)
+        items = [(test_id, list(embedding)) for test_id, embedding in items if self.accepts(embedding)]
+        statement = (
+            update(TestCase.__table__)
+            .where(TestCase.__table__.c.test_id == bindparam("b_test_id"))
+            .values(semantic_embedding=bindparam("b_embedding"))
+        )
+        connection = db.connection()
+        for start in range(0, len(items), chunk_size):
+            connection.execute(statement, [
+                {"b_test_id": test_id, "b_embedding": embedding}
+                for test_id, embedding in items[start:start + chunk_size]
+            ])
+        return len(items)
+    def find_by_ast_hashes(self, db: Session, hashes: Sequence[str], url: Optional[str] = None) -> Dict[str, uuid.UUID]:
+        # Один запрос по idx_test_cases_ast_hash: для каждого хэша - самый ранний оригинал.
+        # С url - только среди тестов запросов к тому же адресу
+        hashes = sorted({value for value in hashes if value})
+        if not hashes:
+            return {}
+        query = (
+            select(TestCase.ast_hash, TestCase.test_id)
+            .where(TestCase.ast_hash.in_(hashes))
+            .where(TestCase.is_duplicate.isnot(True))
+        )
+        if url:
+            query = query.join(Request, Request.request_id == TestCase.request_id).where(Request.url == url)
+        rows = db.execute(query.order_by(TestCase.created_at, TestCase.test_id))
+        originals: Dict[str, uuid.UUID] = {}
+        for value, test_id in rows:
+            originals.setdefault(value, test_id)
+        return originals
+    def nearest(
+        self,
+        db: Session,
+        embedding: Sequence[float],
+        limit: int = 10,
+        exclude_test_id: Optional[uuid.UUID] = None,
+        originals_only: bool = False
+    ) -> List[Dict[str, Any]]:
+        if not self.accepts(embedding):
+            return []
+        # ef_search задаётся на транзакцию; SET не принимает bind-параметры
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.pgvector_ef_search)}"))
+        distance = TestCase.semantic_embedding.cosine_distance(list(embedding))
+        query = (
+            select(
+                TestCase.test_id,
+                TestCase.request_id,
+                TestCase.test_name,
+                TestCase.test_type,
+                TestCase.validation_status,
+                (1 - distance).label("similarity")
+            )
+            .where(TestCase.semantic_embedding.isnot(None))
+            .order_by(distance)
+            .limit(limit)
+        )
+        if exclude_test_id is not None:
+            query = query.where(TestCase.test_id != exclude_test_id)
+        if originals_only:
+            query = query.where(TestCase.is_duplicate.isnot(True))
+        return [dict(row._mapping) for row in db.execute(query)]
+    def find_duplicates(
+        self,
+        db: Session,
+        embeddings: Sequence[Sequence[float]],
+        threshold: float
+    ) -> List[Optional[Tuple[uuid.UUID, float]]]:
+        # Один запрос на пачку: LATERAL KNN (LIMIT 1 по HNSW) для каждого вектора из unnest
+        matches: List[Optional[Tuple[uuid.UUID, float]]] = [None] * len(embeddings)
+        positions = [idx for idx, embedding in enumerate(embeddings) if self.accepts(embedding)]
+        if not positions:
+            return matches
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.pgvector_ef_search)}"))
+        rows = db.execute(
+            text(
+                "SELECT queries.ord, hit.test_id, 1 - hit.distance AS similarity "
+                "FROM unnest(CAST(:embeddings AS text[])) WITH ORDINALITY AS queries(embedding, ord) "
+                "CROSS JOIN LATERAL ("
+                "SELECT test_cases.test_id, test_cases.semantic_embedding <=> CAST(queries.embedding AS vector) AS distance "
+                "FROM test_cases "
+                "WHERE test_cases.semantic_embedding IS NOT NULL AND test_cases.is_duplicate IS NOT true "
+                "ORDER BY test_cases.semantic_embedding <=> CAST(queries.embedding AS vector) "
+                "LIMIT 1"
+                ") AS hit"
+            ),
+            {"embeddings": ["[" + ",".join(str(float(value)) for value in embeddings[idx]) + "]" for idx in positions]}
+        )
+        for ordinality, test_id, similarity in rows:
+            if similarity >= threshold:
+                matches[positions[ordinality - 1]] = (test_id, float(similarity))
+        return matches
+    def similar_to(self, db: Session, test_id: uuid.UUID, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        # None - теста нет; [] - у теста ещё нет эмбеддинга
+        row = db.execute(
+            select(TestCase.test_id, TestCase.semantic_embedding).where(TestCase.test_id == test_id)
+        ).first()
+        if row is None:
+            return None
+        if row.semantic_embedding is None or not self.embedding_dim:
+            return []
+        return self.nearest(db, row.semantic_embedding, limit=limit, exclude_test_id=test_id)
+test_case_repository = TestCaseRepository()
@@ -0,0 +1,35 @@
+import os
+from typing import Dict, List, Tuple
+SUITE_PACKAGE = "generated_suite"
+def suite_module_name(index: int) -> str:
+    return f"test_generated_{index:04d}"
+def write_suite(root_dir: str, test_codes: List[str], conftest: str = "") -> Dict[str, int]:
+    # Каждый тест пишется отдельным модулем одного пакета, чтобы ошибки импорта
+    # и результаты можно было однозначно сопоставить с исходным тестом
+    package_dir = os.path.join(root_dir, SUITE_PACKAGE)
+    os.makedirs(package_dir, exist_ok=True)
+    with open(os.path.join(package_dir, "__init__.py"), "w", encoding="utf-8") as f:
+        f.write("")
+    if conftest:
+        with open(os.path.join(package_dir, "conftest.py"), "w", encoding="utf-8") as f:
+            f.write(conftest)
+    modules = {}
+    for idx, test_code in enumerate(test_codes):
+        module_name = suite_module_name(idx)
+        with open(os.path.join(package_dir, f"{module_name}.py"), "w", encoding="utf-8") as f:
+            f.write(test_code)
+        modules[module_name] = idx
+    return modules
+# Из окружения воркера в песочницу попадают только эти переменные: секреты (DATABASE_URL,
+# ключи API, пароли Redis) сгенерированному коду недоступны
+SANDBOX_ENV_ALLOWLIST = ("PATH", "HOME", "LANG")
+def sandbox_env(extra: Dict[str, str], passthrough: Tuple[str, ...] = ()) -> Dict[str, str]:
+    env = {name: os.environ[name] for name in SANDBOX_ENV_ALLOWLIST + tuple(passthrough) if name in os.environ}
+    env.update(extra)
+    return env
+def sandbox_preexec(max_memory_mb: int):
+    def _limit():
+        import resource
+        max_memory = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+    return _limit
@@ -23,7 +23,7 @@ def mock_redis():
 def mock_llm_client():
     mock = MagicMock()
     mock.generate.return_value = "test code"
-    mock.generate_embeddings.return_value = [0.1] * 768
+    mock.generate_embeddings.return_value = [0.1] * 1536
     return mock
 @pytest.fixture
 def sample_request(mock_db):
@@ -0,0 +1,44 @@
+from shared.utils.ast_fingerprint import canonical_ast_hash
+BASE_TEST = '''import allure
+from playwright.sync_api import Page, expect
+@allure.feature("Калькулятор")
+@allure.title("Открытие калькулятора")
+def test_open_calculator(page: Page):
+    """Открывает калькулятор"""
+    header = page.locator("h1")
+    page.goto("https://cloud.ru/calculator")
+    expect(header).to_be_visible()
+'''
+RENAMED_TEST = '''import allure
+from playwright.sync_api import Page, expect
+@allure.feature("Compute")
+@allure.title(f"Calculator {1}")
+def test_calculator_page_opens(browser_page):
+    # другие имена, docstring и форматирование
+    title = browser_page.locator('h1')
+    browser_page.goto( 'https://cloud.ru/calculator' )
+    expect(title).to_be_visible()
+'''
+class TestCanonicalAstHash:
+    def test_ignores_identifiers_docstrings_decorator_args_and_formatting(self):
+        assert canonical_ast_hash(BASE_TEST) == canonical_ast_hash(RENAMED_TEST)
+    def test_urls_selectors_and_values_change_hash(self):
+        # Одинаковая последовательность шагов с другими адресами и данными - разные тесты
+        login = "def test_a(page):\n    page.goto('/')\n    page.locator('#login').fill('admin')\n"
+        pricing = "def test_a(page):\n    page.goto('/pricing')\n    page.locator('a.pricing').fill('admin')\n"
+        assert canonical_ast_hash(login) != canonical_ast_hash(pricing)
+        assert canonical_ast_hash(login) != canonical_ast_hash(login.replace("'admin'", "'user'"))
+        assert canonical_ast_hash(login) != canonical_ast_hash(login.replace("page.locator('#login')", "page.get_by_role('textbox')"))
+    def test_structure_changes_change_hash(self):
+        base = canonical_ast_hash(BASE_TEST)
+        assert canonical_ast_hash(BASE_TEST.replace("to_be_visible()", "to_be_hidden()")) != base
+        assert canonical_ast_hash(BASE_TEST.replace("@allure.title", "@allure.story")) != base
+        assert canonical_ast_hash(BASE_TEST + "    header.click()\n") != base
+    def test_name_binding_is_preserved(self):
+        # Перестановка переменных - другая структура потока данных
+        first = "def test_a(page):\n    x = page.locator('a')\n    y = page.locator('b')\n    x.click()\n"
+        second = "def test_a(page):\n    x = page.locator('a')\n    y = page.locator('b')\n    y.click()\n"
+        assert canonical_ast_hash(first) != canonical_ast_hash(second)
+    def test_unparsable_code(self):
+        assert canonical_ast_hash("def test_broken(:\n    pass") is None
+        assert canonical_ast_hash(None) is None
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import pytest
+from shared.utils.async_runtime import AsyncRuntime, DeadlineExceeded, deadline
+async def _current_loop():
+    return asyncio.get_running_loop()
+class TestAsyncRuntime:
+    def test_loop_is_reused_across_calls_and_threads(self):
+        runtime = AsyncRuntime()
+        try:
+            first = runtime.run_coro(_current_loop())
+            results = []
+            thread = threading.Thread(target=lambda: results.append(runtime.run_coro(_current_loop())))
+            thread.start()
+            thread.join()
+            assert results[0] is first
+            assert runtime.run_coro(_current_loop()) is first
+        finally:
+            runtime.shutdown()
+    def test_timeout_cancels_coroutine(self):
+        runtime = AsyncRuntime()
+        try:
+            with pytest.raises(TimeoutError):
+                runtime.run_coro(asyncio.sleep(5), timeout=0.05)
+            assert runtime.run_coro(asyncio.sleep(0, result=1)) == 1
+        finally:
+            runtime.shutdown()
+    def test_nested_call_from_loop_thread_is_rejected(self):
+        runtime = AsyncRuntime()
+        async def nested():
+            return runtime.run_coro(asyncio.sleep(0))
+        try:
+            with pytest.raises(RuntimeError):
+                runtime.run_coro(nested(), timeout=5)
+        finally:
+            runtime.shutdown()
+    def test_thread_deadline_bounds_and_cancels_coroutines(self):
+        runtime = AsyncRuntime()
+        cancelled = []
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        try:
+            with deadline(0.05):
+                with pytest.raises(DeadlineExceeded):
+                    runtime.run_coro(slow(), timeout=60)
+                with pytest.raises(DeadlineExceeded):
+                    runtime.run_coro(asyncio.sleep(0))
+            assert runtime.run_coro(asyncio.sleep(0, result=1)) == 1
+            assert cancelled == [True]
+        finally:
+            runtime.shutdown()
+    def test_run_from_foreign_loop_uses_runtime_loop_without_blocking(self):
+        runtime = AsyncRuntime()
+        async def caller():
+            ticks = []
+            async def ticker():
+                for _ in range(5):
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+            async def slow_loop():
+                await asyncio.sleep(0.1)
+                return asyncio.get_running_loop()
+            used_loop, _ = await asyncio.gather(runtime.run(slow_loop()), ticker())
+            return used_loop, asyncio.get_running_loop(), len(ticks)
+        try:
+            used_loop, caller_loop, ticks = asyncio.run(caller())
+            assert used_loop is runtime.loop
+            assert used_loop is not caller_loop
+            assert ticks == 5
+        finally:
+            runtime.shutdown()
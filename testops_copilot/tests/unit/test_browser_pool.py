@@ -0,0 +1,97 @@
+from unittest.mock import patch
+import pytest
+from agents.reconnaissance.browser_pool import BrowserPool
+class _FakeContext:
+    def __init__(self):
+        self.closed = False
+    async def close(self):
+        self.closed = True
+class _FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+    def is_connected(self):
+        return self.connected
+    async def new_context(self, **kwargs):
+        context = _FakeContext()
+        self.contexts.append(context)
+        return context
+    async def close(self):
+        self.connected = False
+class _FakeChromium:
+    def __init__(self):
+        self.browsers = []
+    async def launch(self, **kwargs):
+        browser = _FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+class _FakePlaywright:
+    def __init__(self):
+        self.chromium = _FakeChromium()
+    async def stop(self):
+        pass
+class _FakeStarter:
+    def __init__(self, playwright):
+        self.playwright = playwright
+    async def start(self):
+        return self.playwright
+@pytest.fixture
+def fake_playwright():
+    playwright = _FakePlaywright()
+    with patch("agents.reconnaissance.browser_pool.async_playwright", return_value=_FakeStarter(playwright)):
+        yield playwright
+async def _open_context(pool):
+    async with pool.context() as context:
+        return context
+async def _crash_while_open(pool, browsers):
+    async with pool.context():
+        browsers[0].connected = False
+        async with pool.context():
+            pass
+class TestBrowserPool:
+    def test_browser_is_reused_across_requests(self, fake_playwright):
+        pool = BrowserPool(max_contexts=2, recycle_after=100)
+        try:
+            contexts = [pool.run(_open_context(pool), timeout=5) for _ in range(3)]
+            assert len(fake_playwright.chromium.browsers) == 1
+            assert all(context.closed for context in contexts)
+        finally:
+            pool.shutdown()
+    def test_recycles_after_page_limit(self, fake_playwright):
+        pool = BrowserPool(max_contexts=2, recycle_after=2)
+        try:
+            for _ in range(3):
+                pool.run(_open_context(pool), timeout=5)
+            first, second = fake_playwright.chromium.browsers
+            assert not first.is_connected()
+            assert second.is_connected()
+        finally:
+            pool.shutdown()
+    def test_relaunches_crashed_browser(self, fake_playwright):
+        pool = BrowserPool(max_contexts=2, recycle_after=100)
+        try:
+            pool.run(_open_context(pool), timeout=5)
+            fake_playwright.chromium.browsers[0].connected = False
+            pool.run(_open_context(pool), timeout=5)
+            assert len(fake_playwright.chromium.browsers) == 2
+            assert pool.stats()["launches"] == 2
+        finally:
+            pool.shutdown()
+    def test_crash_with_open_contexts_releases_cleanly(self, fake_playwright):
+        pool = BrowserPool(max_contexts=2, recycle_after=100)
+        try:
+            pool.run(_crash_while_open(pool, fake_playwright.chromium.browsers), timeout=5)
+            assert len(fake_playwright.chromium.browsers) == 2
+            assert pool.stats()["active_contexts"] == 0
+        finally:
+            pool.shutdown()
+    def test_disabled_pool_launches_browser_per_call(self, fake_playwright):
+        pool = BrowserPool(max_contexts=2, recycle_after=100, enabled=False)
+        try:
+            for _ in range(2):
+                pool.run(_open_context(pool), timeout=5)
+            browsers = fake_playwright.chromium.browsers
+            assert len(browsers) == 2
+            assert not any(browser.is_connected() for browser in browsers)
+        finally:
+            pool.shutdown()
@@ -0,0 +1,39 @@
+import random
+from agents.optimizer.clustering import UnionFind, assertion_count, cluster_duplicates
+def make_test(test_id, score=0, assertions=1):
+    body = "\n".join("    assert page.title()" for _ in range(assertions))
+    return {"test_id": test_id, "test_code": f"def test_{test_id}(page):\n{body}\n", "validation": {"score": score}}
+def edge(first, second, similarity=0.9):
+    return {"test_ids": [first, second], "type": "semantic", "similarity_score": similarity}
+class TestUnionFind:
+    def test_union_and_groups(self):
+        sets = UnionFind(range(5))
+        assert sets.union(0, 1) and sets.union(3, 4) and sets.union(1, 4)
+        assert not sets.union(0, 3)
+        assert sorted(map(sorted, sets.groups().values())) == [[0, 1, 3, 4], [2]]
+    def test_long_chain_is_linear(self):
+        sets = UnionFind()
+        for idx in range(100000):
+            sets.union(idx, idx + 1)
+        assert sets.size[sets.find(0)] == 100001
+class TestClusterDuplicates:
+    def test_transitive_pairs_form_one_cluster_with_best_representative(self):
+        tests = [make_test("a", score=50), make_test("b", score=90), make_test("c", score=90, assertions=3), make_test("d")]
+        clusters = cluster_duplicates(tests, [edge("a", "b", 0.8), edge("b", "c", 0.95)])
+        assert len(clusters) == 1
+        assert clusters[0]["representative"] == "c"
+        assert clusters[0]["test_ids"] == ["a", "b", "c"]
+        assert clusters[0]["removed"] == ["a", "b"]
+        assert clusters[0]["max_similarity"] == 0.95
+    def test_result_does_not_depend_on_pair_order(self):
+        tests = [make_test(str(idx), score=idx % 7) for idx in range(40)]
+        pairs = [edge(str(idx), str(idx + 1)) for idx in range(0, 38, 2)] + [edge(str(idx), str(idx + 2)) for idx in range(0, 36, 4)]
+        expected = cluster_duplicates(tests, pairs)
+        for seed in range(5):
+            shuffled = [dict(pair, test_ids=list(reversed(pair["test_ids"]))) for pair in pairs]
+            random.Random(seed).shuffle(shuffled)
+            assert cluster_duplicates(tests, shuffled) == expected
+    def test_assertion_count_includes_expect(self):
+        code = "def test_a(page):\n    expect(page).to_have_title('x')\n    assert page.url\n"
+        assert assertion_count(code) == 2
+        assert assertion_count("def test_b(:\n    assert x") == 1
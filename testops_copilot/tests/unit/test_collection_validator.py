@@ -0,0 +1,32 @@
+import os
+from unittest.mock import patch
+import pytest
+from agents.validator.collection_validator import CollectionValidator
+class TestCollectionValidator:
+    def test_check_attributes_errors_to_tests(self):
+        validator = CollectionValidator()
+        results = validator.check([
+            "def test_ok():\n    assert True\n",
+            "import module_that_does_not_exist\ndef test_import():\n    pass\n",
+            "def test_fixture(unknown_fixture):\n    pass\n"
+        ])
+        assert results[0]["errors"] == []
+        assert results[0]["collected"] == 1
+        assert results[1]["errors"][0]["type"] == "collection_error"
+        assert results[2]["errors"][0]["type"] == "missing_fixture"
+    def test_check_allows_playwright_fixtures(self):
+        validator = CollectionValidator()
+        results = validator.check(["def test_ui(page):\n    assert page\n"])
+        assert results[0]["errors"] == []
+    def test_check_empty(self):
+        assert CollectionValidator().check([]) == []
+    def test_collection_does_not_see_worker_secrets(self):
+        code = (
+            "import os\n"
+            "assert 'DATABASE_URL' not in os.environ, 'leaked'\n"
+            "assert 'COLLECTION_REPORT_PATH' in os.environ\n"
+            "def test_env():\n    pass\n"
+        )
+        with patch.dict(os.environ, {"DATABASE_URL": "postgresql://secret"}):
+            results = CollectionValidator().check([code])
+        assert results[0]["errors"] == []
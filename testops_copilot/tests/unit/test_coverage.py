@@ -0,0 +1,36 @@
+from agents.optimizer.coverage import analyze_coverage, lexical_scores, semantic_scores, text_terms
+CALCULATOR_TEST = '''@allure.title("Расчёт стоимости виртуальной машины в калькуляторе")
+def test_calculator_vm_price(page):
+    page.goto("https://cloud.ru/calculator")
+    expect(page.get_by_text("Стоимость")).to_be_visible()
+'''
+LOGIN_TEST = '''@allure.title("Вход в личный кабинет")
+def test_login(page):
+    page.goto("https://cloud.ru/login")
+    page.locator("#email").fill("user@example.com")
+'''
+TESTS = [{"test_id": "calc", "test_code": CALCULATOR_TEST}, {"test_id": "login", "test_code": LOGIN_TEST}]
+class TestCoverage:
+    def test_terms_split_identifiers_and_stem_russian(self):
+        assert {"калькул", "calcul"} & text_terms("Калькулятора getCalculatorPrice")
+        assert text_terms("калькулятор") == text_terms("калькулятора")
+        assert "для" not in text_terms("для теста")
+    def test_lexical_index_matches_requirement_words(self):
+        scores = lexical_scores(["Калькулятор стоимости", "Вход в личный кабинет"], [CALCULATOR_TEST, LOGIN_TEST])
+        assert scores.shape == (2, 2)
+        assert scores[0, 0] == 1.0 and scores[0, 1] == 0.0
+        assert scores[1, 1] == 1.0
+    def test_semantic_matrix_covers_paraphrased_requirement(self):
+        requirements = ["Калькулятор стоимости", "Оплата картой"]
+        semantic = semantic_scores([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]], [[0.9, 0.1, 0.0], [0.0, 1.0, 0.1]])
+        result = analyze_coverage(requirements, TESTS, semantic, semantic_threshold=0.8, lexical_threshold=0.5)
+        assert result["method"] == "lexical+semantic"
+        assert result["details"]["requirement_0"]["tests"] == ["calc"]
+        assert not result["details"]["requirement_1"]["covered"]
+        assert result["coverage_score"] == 0.5
+        assert result["gaps"][0]["requirement"] == "requirement_1"
+    def test_dimension_mismatch_falls_back_to_lexical(self):
+        assert semantic_scores([[1.0, 0.0]], [[1.0, 0.0, 0.0]]) is None
+        result = analyze_coverage(["Вход в кабинет"], TESTS, None, lexical_threshold=0.5)
+        assert result["method"] == "lexical"
+        assert result["details"]["requirement_0"]["tests"] == ["login"]
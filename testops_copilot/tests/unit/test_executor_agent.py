@@ -0,0 +1,44 @@
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from unittest.mock import patch
+from agents.executor.executor_agent import ExecutorAgent
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200 if self.path == "/health" else 404)
+        self.end_headers()
+    def log_message(self, *args):
+        pass
+@pytest.fixture
+def target_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+class TestExecutorAgent:
+    def test_execute_reports_status_per_test(self, target_server):
+        tests = [
+            {"test_id": "ok", "test_code": "import urllib.request\ndef test_health(base_url):\n    assert urllib.request.urlopen(base_url + '/health').status == 200\n"},
+            {"test_id": "fail", "test_code": "import urllib.request\ndef test_rewritten():\n    urllib.request.urlopen('https://example.com/missing')\n"},
+            {"test_id": "broken", "test_code": "import module_that_does_not_exist\ndef test_x():\n    pass\n"}
+        ]
+        result = ExecutorAgent().execute(
+            tests,
+            base_url=target_server,
+            workers=2,
+            rewrite_origins=["https://example.com"],
+            timeout=60
+        )
+        assert result["results"]["ok"]["status"] == "passed"
+        assert result["results"]["fail"]["status"] in ("failed", "broken")
+        assert result["results"]["broken"]["status"] in ("broken", "error")
+        assert result["summary"]["total"] == 3
+    def test_execute_empty(self):
+        assert ExecutorAgent().execute([], base_url="http://localhost")["results"] == {}
+    def test_shards_do_not_see_worker_secrets(self, target_server):
+        tests = [{"test_id": "env", "test_code": "import os\ndef test_env():\n    assert 'DATABASE_URL' not in os.environ\n    assert os.environ['TARGET_BASE_URL']\n"}]
+        with patch.dict(os.environ, {"DATABASE_URL": "postgresql://secret"}):
+            result = ExecutorAgent().execute(tests, base_url=target_server, timeout=60)
+        assert result["results"]["env"]["status"] == "passed"
@@ -0,0 +1,53 @@
+from unittest.mock import patch
+import pytest
+from agents.reconnaissance.html_snapshot import HtmlSnapshotParser
+from shared.config.settings import settings
+PAGE = """<html><head><title>Калькулятор</title></head><body>
+<form>
+  <input type="number" name="cpu" id="cpu" placeholder="vCPU" data-testid="cpu-input">
+  <select name="region"><option>ru-1</option></select>
+  <select name="zones" multiple><option>a</option></select>
+  <textarea name="comment"></textarea>
+  <button id="calc" data-testid="calc-btn"><span>Рассчитать</span></button>
+  <input type="submit" value="Отправить">
+</form>
+<a href="/pricing" data-testid="pricing-link">Цены</a>
+<div role="button">Меню</div>
+</body></html>"""
+class TestHtmlSnapshotParser:
+    def test_stdlib_parser_extracts_structure(self):
+        parser = HtmlSnapshotParser()
+        with patch("agents.reconnaissance.html_snapshot.SELECTOLAX_AVAILABLE", False):
+            structure = parser.parse(PAGE, "https://example.com/calc")
+        assert structure["title"] == "Калькулятор"
+        assert [b["text"] for b in structure["buttons"]] == ["Рассчитать", "Отправить", "Меню"]
+        assert structure["buttons"][0]["dataTestId"] == "calc-btn"
+        assert {i["name"] for i in structure["inputs"]} == {"cpu", "region", "zones", "comment", ""}
+        # Типы совпадают с element.type из JS-экстрактора браузерного бэкенда
+        assert [i["type"] for i in structure["inputs"]] == ["number", "select-one", "select-multiple", "textarea", "submit"]
+        assert structure["links"][0]["href"] == "https://example.com/pricing"
+        assert structure["links"][0]["text"] == "Цены"
+        assert set(structure["selectors"]) == {"cpu-input", "calc-btn", "pricing-link"}
+        assert structure["backend"] == "html"
+    def test_selectolax_and_stdlib_parsers_agree(self):
+        pytest.importorskip("selectolax")
+        parser = HtmlSnapshotParser()
+        with patch("agents.reconnaissance.html_snapshot.SELECTOLAX_AVAILABLE", False):
+            stdlib = parser.parse(PAGE, "https://example.com/calc")
+        fast = parser.parse(PAGE, "https://example.com/calc")
+        for key in ("title", "buttons", "inputs", "links", "selectors"):
+            assert fast[key] == stdlib[key]
+    def test_needs_javascript_for_spa_shell(self):
+        parser = HtmlSnapshotParser()
+        shell = '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+        with patch("agents.reconnaissance.html_snapshot.SELECTOLAX_AVAILABLE", False):
+            assert parser.needs_javascript(shell, parser.parse(shell, "https://example.com"))
+            assert not parser.needs_javascript(PAGE, parser.parse(PAGE, "https://example.com"))
+class TestHtmlContentLimit:
+    def test_oversized_html_is_rejected(self):
+        from pydantic import ValidationError
+        from api_gateway.routers.generate import GenerateTestCasesRequest
+        payload = {"url": "https://example.com", "requirements": ["req"], "test_type": "automated"}
+        assert GenerateTestCasesRequest(**payload, html_content=PAGE).html_content == PAGE
+        with pytest.raises(ValidationError):
+            GenerateTestCasesRequest(**payload, html_content="x" * (settings.recon_html_max_length + 1))
@@ -0,0 +1,74 @@
+from collections import defaultdict
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+from langgraph.checkpoint.base import empty_checkpoint
+from shared.models.database import WorkflowCheckpoint
+from unittest.mock import patch
+from workers.tasks.langgraph import checkpoint as checkpoint_module
+from workers.tasks.langgraph.checkpoint import CheckpointSerializer, PostgresCheckpointSaver, SnapshotMemorySaver
+def make_saver(history=3):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    WorkflowCheckpoint.__table__.create(bind=engine)
+    return PostgresCheckpointSaver(engine=engine, serializer=CheckpointSerializer(), history=history)
+def make_checkpoint(step):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"current_step": step, "generated_tests": [{"code": "def test_a():\n    pass\n" * 50}]}
+    checkpoint["channel_versions"]["current_step"] = 2
+    checkpoint["versions_seen"]["generation"]["current_step"] = 1
+    return checkpoint
+def count_rows(saver, thread_id):
+    with saver.engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(WorkflowCheckpoint).where(WorkflowCheckpoint.thread_id == thread_id)
+        ).scalar()
+class TestCheckpointSerializer:
+    def test_roundtrip_restores_defaultdicts(self):
+        serializer = CheckpointSerializer()
+        checkpoint = make_checkpoint("generation_completed")
+        restored = serializer.loads(serializer.dumps(checkpoint))
+        assert restored["channel_values"] == checkpoint["channel_values"]
+        assert isinstance(restored["channel_versions"], defaultdict)
+        assert restored["versions_seen"]["generation"]["current_step"] == 1
+        assert restored["versions_seen"]["unknown"]["current_step"] == 0
+    def test_payload_is_compressed(self):
+        serializer = CheckpointSerializer()
+        checkpoint = make_checkpoint("generation_completed")
+        assert len(serializer.dumps(checkpoint)) < len(str(checkpoint)) / 5
+class TestPostgresCheckpointSaver:
+    def test_get_returns_latest_checkpoint(self):
+        saver = make_saver()
+        config = {"configurable": {"thread_id": "thread-1"}}
+        assert saver.get(config) is None
+        saver.put(config, make_checkpoint("reconnaissance_completed"))
+        saver.put(config, make_checkpoint("generation_completed"))
+        assert saver.get(config)["channel_values"]["current_step"] == "generation_completed"
+    def test_history_is_bounded_and_pruned_on_completion(self):
+        saver = make_saver(history=2)
+        config = {"configurable": {"thread_id": "thread-2"}}
+        for step in ["reconnaissance_completed", "generation_completed", "validation_completed"]:
+            saver.put(config, make_checkpoint(step))
+        assert count_rows(saver, "thread-2") == 2
+        saver.put(config, make_checkpoint("completed"))
+        assert count_rows(saver, "thread-2") == 1
+        assert saver.get(config)["channel_values"]["current_step"] == "completed"
+    def test_threads_are_isolated(self):
+        saver = make_saver(history=1)
+        saver.put({"configurable": {"thread_id": "a"}}, make_checkpoint("generation_completed"))
+        saver.put({"configurable": {"thread_id": "b"}}, make_checkpoint("completed"))
+        assert count_rows(saver, "a") == 1
+        assert saver.get({"configurable": {"thread_id": "a"}})["channel_values"]["current_step"] == "generation_completed"
+class TestGetCheckpointer:
+    def test_memory_fallback_is_retried_after_backoff(self):
+        saver = make_saver()
+        create = patch.object(checkpoint_module, "_create_postgres_checkpointer", side_effect=[RuntimeError("db down"), saver])
+        with patch.multiple(checkpoint_module, _checkpointer=None, _fallback=None, _fallback_until=0.0), \
+                patch.object(checkpoint_module.settings, "langgraph_checkpoint_retry_interval", 60), \
+                create as factory:
+            fallback = checkpoint_module.get_checkpointer()
+            assert isinstance(fallback, SnapshotMemorySaver)
+            assert checkpoint_module.get_checkpointer() is fallback
+            assert factory.call_count == 1
+            checkpoint_module._fallback_until = 0.0
+            assert checkpoint_module.get_checkpointer() is saver
+            assert checkpoint_module.get_checkpointer() is saver
+            assert factory.call_count == 2
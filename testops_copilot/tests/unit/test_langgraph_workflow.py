@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from workers.tasks.langgraph import workflow as workflow_module
+from workers.tasks.langgraph.workflow import LangGraphWorkflow
+from workers.tasks.langgraph.checkpoint import SnapshotMemorySaver
+from shared.config.settings import settings
+from shared.utils.async_runtime import DeadlineExceeded, run_coro
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+    def get(self, key):
+        return self.data.get(key)
+    def delete(self, key):
+        self.data.pop(key, None)
+    def expire(self, key, seconds):
+        return key in self.data
+class FakeRedisClient:
+    def __init__(self):
+        self.cache = FakeRedis()
+        self.events = []
+    def publish_event(self, channel, event):
+        self.events.append(event)
+def make_node(name, calls, fail_once=None):
+    def node(state):
+        calls.append(name)
+        if fail_once is not None and not fail_once:
+            fail_once.append(True)
+            raise RuntimeError(f"{name} failed")
+        state["current_step"] = "completed" if name == "save_results" else f"{name}_completed"
+        return state
+    return node
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+def initial_state():
+    return {
+        "request_id": "req-1",
+        "url": "https://example.com",
+        "requirements": ["Проверка"],
+        "test_type": "automated",
+        "options": {},
+        "page_structure": None,
+        "generated_tests": [],
+        "validated_tests": [],
+        "optimized_tests": [],
+        "current_step": "started",
+        "error": None,
+        "retry_count": 0
+    }
+@pytest.fixture
+def fake_redis():
+    client = FakeRedisClient()
+    with patch.object(workflow_module, "redis_client", client):
+        yield client
+def build_workflow(calls, failing=None):
+    nodes = {}
+    for name in ["reconnaissance", "generation", "validation", "optimization", "save_results"]:
+        nodes[f"{name}_node"] = make_node(name, calls, fail_once=[] if name == failing else None)
+    with patch.multiple(
+        workflow_module,
+        get_checkpointer=SnapshotMemorySaver,
+        should_retry_generation=lambda state: "continue",
+        **nodes
+    ):
+        return LangGraphWorkflow()
+class TestLangGraphWorkflow:
+    def test_single_pass_runs_each_node_once(self, fake_redis):
+        calls = []
+        workflow = build_workflow(calls)
+        result = workflow._execute("req-1", "thread-1", initial_state())
+        assert result["step"] == "completed"
+        assert calls == ["reconnaissance", "generation", "validation", "optimization", "save_results"]
+        assert "workflow:lock:thread-1" not in fake_redis.cache.data
+    def test_resume_skips_completed_nodes(self, fake_redis):
+        calls = []
+        workflow = build_workflow(calls, failing="validation")
+        with pytest.raises(RuntimeError):
+            workflow._execute("req-1", "thread-2", initial_state())
+        assert calls == ["reconnaissance", "generation", "validation"]
+        result = workflow._execute("req-1", "thread-2", initial_state())
+        assert result["step"] == "completed"
+        assert calls == ["reconnaissance", "generation", "validation", "validation", "optimization", "save_results"]
+    def test_completed_thread_is_not_rerun(self, fake_redis):
+        calls = []
+        workflow = build_workflow(calls)
+        workflow._execute("req-1", "thread-3", initial_state())
+        result = workflow._execute("req-1", "thread-3", initial_state())
+        assert result["step"] == "completed"
+        assert calls.count("generation") == 1
+    def test_concurrent_run_is_rejected(self, fake_redis):
+        calls = []
+        workflow = build_workflow(calls)
+        fake_redis.cache.set("workflow:lock:thread-4", "other-worker")
+        with pytest.raises(RuntimeError, match="already running"):
+            workflow._execute("req-1", "thread-4", initial_state())
+        assert calls == []
+        assert fake_redis.cache.get("workflow:lock:thread-4") == "other-worker"
+    def test_node_guard_blocks_duplicate_in_same_attempt(self, fake_redis):
+        calls = []
+        workflow = build_workflow(calls)
+        node = workflow._guarded("generation", make_node("generation", calls))
+        config = {"configurable": {"thread_id": "thread-5", "attempt_id": "a1"}}
+        node(initial_state(), config)
+        with pytest.raises(RuntimeError, match="already executed"):
+            node(initial_state(), config)
+        retry_state = initial_state()
+        retry_state["retry_count"] = 1
+        node(retry_state, config)
+        assert calls == ["generation", "generation"]
+    def test_lock_released_only_after_running_nodes_exit(self, fake_redis):
+        workflow = build_workflow([])
+        fake_redis.cache.set("workflow:lock:thread-6", "attempt-6")
+        done = threading.Event()
+        heartbeat = threading.Event()
+        workflow._running_nodes["attempt-6"] = {done}
+        workflow._release_after_nodes("workflow:lock:thread-6", "attempt-6", heartbeat)
+        assert fake_redis.cache.get("workflow:lock:thread-6") == "attempt-6"
+        done.set()
+        assert wait_until(lambda: "workflow:lock:thread-6" not in fake_redis.cache.data)
+        assert heartbeat.is_set()
+    def test_node_deadline_cancels_pending_coroutines(self, fake_redis):
+        workflow = build_workflow([])
+        def slow_node(state):
+            return run_coro(asyncio.sleep(5), timeout=60)
+        node = workflow._guarded("reconnaissance", slow_node)
+        config = {"configurable": {"thread_id": "thread-7", "attempt_id": "a7"}}
+        with patch.dict(settings.langgraph_node_timeouts, {"reconnaissance": 0.1}):
+            with pytest.raises(DeadlineExceeded):
+                node(initial_state(), config)
+        assert workflow._running_nodes["a7"] == set()
+    def test_degradable_node_keeps_its_fallback_after_deadline(self, fake_redis):
+        workflow = build_workflow([])
+        def late_node(state):
+            time.sleep(0.15)
+            state["current_step"] = "optimization_skipped"
+            return state
+        config = {"configurable": {"thread_id": "thread-8", "attempt_id": "a8"}}
+        with patch.dict(settings.langgraph_node_timeouts, {"optimization": 0.1, "validation": 0.1}):
+            assert workflow._guarded("optimization", late_node)(initial_state(), config)["current_step"] == "optimization_skipped"
+            with pytest.raises(DeadlineExceeded):
+                workflow._guarded("validation", late_node)(initial_state(), config)
+class TestOptimizationNode:
+    def test_test_ids_are_unique_per_run_and_map_back(self):
+        from contextlib import contextmanager
+        from unittest.mock import MagicMock
+        from workers.tasks.langgraph import nodes
+        validated = [
+            {"code": "def test_a():\n    assert True\n", "validation": {"score": 90}},
+            {"code": "def test_b():\n    assert True\n", "validation": {"score": 70}}
+        ]
+        seen = {}
+        class FakeOptimizer:
+            async def optimize(self, tests, requirements, options):
+                seen["ids"] = [test["test_id"] for test in tests]
+                return {
+                    "optimized_tests": [tests[1]],
+                    "details": {"requirement_0": {"text": "Проверка", "score": 0.9, "quality": "insufficient", "tests": [tests[1]["test_id"]], "scores": [0.9]}}
+                }
+        @contextmanager
+        def fake_db():
+            yield MagicMock()
+        request_id = "00000000-0000-0000-0000-000000000001"
+        state = {**initial_state(), "request_id": request_id, "validated_tests": validated}
+        with patch.multiple(
+            nodes,
+            get_db=fake_db,
+            redis_client=FakeRedisClient(),
+            OptimizerAgent=FakeOptimizer,
+            load_tests=lambda refs: refs,
+            store_tests=lambda tests: tests
+        ):
+            result = nodes.optimization_node(state)
+        assert seen["ids"] == [f"{request_id}:0", f"{request_id}:1"]
+        assert result["optimized_tests"] == [validated[1]]
+        assert result["coverage"][0]["tests"] == [[nodes.code_hash(validated[1]["code"]), 0.9]]
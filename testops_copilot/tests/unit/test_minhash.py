@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from agents.optimizer.minhash import MinHashLSH, code_shingles, normalized_tokens
+BASE_TEST = '''def test_login(page):
+    page.goto("https://cloud.ru/login")
+    page.locator("#email").fill("user@example.com")
+    page.locator("#password").fill("secret")
+    page.locator("button[type=submit]").click()
+    expect(page.locator(".profile")).to_be_visible()
+'''
+OTHER_TEST = '''def test_calculator_total(page):
+    page.goto("https://cloud.ru/calculator")
+    page.get_by_role("combobox", name="vCPU").select_option("8")
+    total = page.locator("[data-testid=total]").inner_text()
+    assert total.endswith("₽")
+'''
+class TestMinHash:
+    def test_normalization_ignores_literals_and_comments(self):
+        tokens = normalized_tokens('page.goto("https://a") # открыть\nx = 42')
+        assert tokens == ["page", ".", "goto", "(", "STR", ")", "x", "=", "NUM"]
+        changed = BASE_TEST.replace("user@example.com", "other@example.com").replace("secret", "x")
+        assert set(code_shingles(BASE_TEST).tolist()) == set(code_shingles(changed).tolist())
+    def test_signature_is_stable_and_estimates_jaccard(self):
+        lsh = MinHashLSH(num_perm=128, bands=16, shingle_size=3)
+        assert np.array_equal(lsh.signature(BASE_TEST), MinHashLSH(num_perm=128, bands=16, shingle_size=3).signature(BASE_TEST))
+        near = BASE_TEST.replace('    page.locator("button[type=submit]").click()\n', '    page.keyboard.press("Enter")\n')
+        same = np.mean(lsh.signature(BASE_TEST) == lsh.signature(near))
+        different = np.mean(lsh.signature(BASE_TEST) == lsh.signature(OTHER_TEST))
+        assert same > 0.5 > different
+    def test_candidate_pairs_finds_near_duplicates_only(self):
+        lsh = MinHashLSH(num_perm=64, bands=16, shingle_size=5)
+        near = BASE_TEST.replace("to_be_visible", "to_have_count")
+        codes = [BASE_TEST, OTHER_TEST, near, BASE_TEST.replace("secret", "другой")]
+        pairs = lsh.candidate_pairs(lsh.signatures(codes), threshold=0.5)
+        assert (0, 3) in pairs and pairs[(0, 3)] == 1.0
+        assert (0, 2) in pairs
+        assert not any(1 in pair for pair in pairs)
+    def test_large_buckets_produce_linear_number_of_pairs(self):
+        lsh = MinHashLSH(num_perm=64, bands=16, shingle_size=3)
+        codes = [BASE_TEST.replace("#email", f"#email_{idx}") for idx in range(200)]
+        pairs = lsh.candidate_pairs(lsh.signatures(codes), threshold=0.3, max_bucket=10)
+        assert len({idx for pair in pairs for idx in pair}) == 200
+        assert len(pairs) < 200 * 16
+    def test_bands_must_divide_permutations(self):
+        with pytest.raises(ValueError):
+            MinHashLSH(num_perm=100, bands=16)
@@ -1,6 +1,10 @@
 
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
 import pytest
 from agents.optimizer.optimizer_agent import OptimizerAgent
+from agents.optimizer.clustering import cluster_duplicates
 class TestOptimizerAgent:
     @pytest.fixture
     def agent(self):
@@ -27,4 +31,106 @@ class TestOptimizerAgent:
         requirements = ["req1", "req2"]
         coverage = agent._analyze_coverage(tests, requirements)
         assert "coverage_score" in coverage
-        assert 0.0 <= coverage["coverage_score"] <= 1.0
\ No newline at end of file
+        assert 0.0 <= coverage["coverage_score"] <= 1.0
+    def test_semantic_duplicates_use_batched_embeddings(self, agent):
+        tests = [
+            {"test_id": "1", "test_code": "def test_a(): pass"},
+            {"test_id": "2", "test_code": "def test_b(): pass"},
+            {"test_id": "3", "test_code": "def test_c(): pass"}
+        ]
+        embeddings = [[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]]
+        with patch("agents.optimizer.optimizer_agent.redis_client") as redis_mock, \
+                patch("agents.optimizer.embeddings.llm_client") as llm_mock:
+            redis_mock.create_vector_index.return_value = False
+            llm_mock.generate_embeddings_batch = AsyncMock(return_value=embeddings)
+            duplicates = asyncio.run(agent._find_semantic_duplicates(tests, 0.85))
+        assert [d["test_ids"] for d in duplicates] == [["1", "2"]]
+        llm_mock.generate_embeddings_batch.assert_awaited_once()
+    def test_remove_duplicates_keeps_one_representative_per_cluster(self, agent):
+        tests = [
+            {"test_id": "1", "test_code": "def test_a(page):\n    page.goto('/')\n", "validation": {"score": 40}},
+            {"test_id": "2", "test_code": "def test_b(page):\n    page.goto('/')\n    assert page.url\n", "validation": {"score": 80}},
+            {"test_id": "3", "test_code": "def test_c(page):\n    page.reload()\n", "validation": {"score": 10}}
+        ]
+        duplicates = [
+            {"test_ids": ["1", "2"], "type": "semantic", "similarity_score": 0.9},
+            {"test_ids": ["2", "1"], "type": "semantic_llm", "similarity_score": 0.9}
+        ]
+        clusters = cluster_duplicates(tests, duplicates)
+        assert [test["test_id"] for test in agent._remove_duplicates(tests, clusters)] == ["2", "3"]
+    def test_llm_adjudication_batches_pairs_and_caches_by_code(self, agent):
+        tests = [{"test_id": str(idx), "test_code": f"def test_{idx}(page):\n    page.goto('/{idx}')\n"} for idx in range(6)]
+        cases = [
+            {"test_ids": ["0", "1"], "similarity_score": 0.8},
+            {"test_ids": ["2", "3"], "similarity_score": 0.8},
+            {"test_ids": ["4", "5"], "similarity_score": 0.8},
+            {"test_ids": ["0", "5"], "similarity_score": 0.9}
+        ]
+        cache = {agent._pair_cache_key(tests[5]["test_code"], tests[4]["test_code"]): json.dumps({"is_duplicate": True})}
+        content = '[{"id": 0, "duplicate": "YES"}, {"id": 1, "duplicate": "NO"}]'
+        response = {"choices": [{"message": {"content": content}}]}
+        with patch("agents.optimizer.optimizer_agent.redis_client") as redis_mock, \
+                patch("agents.optimizer.optimizer_agent.llm_client.generate", new=AsyncMock(return_value=response)) as generate:
+            redis_mock.cache.get.side_effect = cache.get
+            redis_mock.cache.setex.side_effect = lambda key, ttl, value: cache.__setitem__(key, value)
+            duplicates = asyncio.run(agent._llm_analysis_duplicates(cases, tests, 0.85))
+            assert [d["test_ids"] for d in duplicates] == [["0", "1"], ["4", "5"]]
+            assert generate.await_count == 1
+            assert "PAIR 1" in generate.await_args.kwargs["prompt"]
+            # Другие test_id, тот же код - вердикт берётся из кэша
+            renamed = [dict(test, test_id=f"new-{test['test_id']}") for test in tests]
+            again = asyncio.run(agent._llm_analysis_duplicates(
+                [{"test_ids": ["new-1", "new-0"], "similarity_score": 0.8}], renamed, 0.85
+            ))
+        assert [d["test_ids"] for d in again] == [["new-1", "new-0"]]
+        assert generate.await_count == 1
+    def test_optimize_returns_partial_result_when_budget_runs_out(self, agent):
+        base = "def test_a(page):\n    page.goto('https://cloud.ru/a')\n    page.locator('#email').fill('user')\n    page.locator('#password').fill('secret')\n    page.locator('button').click()\n    assert page.url\n"
+        tests = [
+            {"test_id": "1", "test_code": base},
+            {"test_id": "2", "test_code": base},
+            {"test_id": "3", "test_code": base.replace("test_a", "test_b").replace("(page)", "(browser_page)").replace("page.", "browser_page.")},
+            {"test_id": "4", "test_code": base.replace("click()", "dblclick()")}
+        ]
+        async def slow_embeddings(tests):
+            await asyncio.sleep(5)
+        with patch.object(agent, "_embed_tests", side_effect=slow_embeddings):
+            result = asyncio.run(agent.optimize(tests, ["req"], {"time_budget": 0.2}))
+        assert result["stages_completed"] == ["exact", "structural", "lsh"]
+        assert result["budget_exhausted"] is True
+        # Векторная стадия не успела - используется высокая оценка Jaccard из LSH
+        assert [d["type"] for d in result["duplicates"]] == ["exact", "structural", "lsh"]
+        assert len(result["optimized_tests"]) == 1
+    def test_optimize_runs_all_stages_within_budget(self, agent):
+        tests = [{"test_id": str(idx), "test_code": f"def test_{idx}(page):\n    page.goto('/')\n    assert {idx}\n"} for idx in range(3)]
+        with patch.object(agent, "_embed_tests", new=AsyncMock(side_effect=lambda batch: [[1.0, 0.0]] * len(batch))), \
+                patch("agents.optimizer.optimizer_agent.embed_texts_with_status", new=AsyncMock(side_effect=lambda texts: ([[1.0, 0.0]] * len(texts), [False] * len(texts)))):
+            result = asyncio.run(agent.optimize(tests, ["req"], {"time_budget": 10, "lsh_prefilter": True}))
+        assert result["stages_completed"] == ["exact", "structural", "lsh", "vector", "llm", "coverage"]
+        assert result["budget_exhausted"] is False
+    def test_coverage_is_lexical_when_embeddings_are_unavailable(self, agent):
+        tests = [{"test_id": str(idx), "test_code": f"def test_unrelated_{idx}(page):\n    page.goto('/{idx}')\n"} for idx in range(3)]
+        async def hash_fallback(texts):
+            return [[1.0, 0.0]] * len(texts), [True] * len(texts)
+        with patch("agents.optimizer.optimizer_agent.embed_texts_with_status", new=hash_fallback):
+            semantic = asyncio.run(agent._coverage_similarity(tests, ["Оплата картой", "Экспорт отчёта"]))
+        assert semantic is None
+        result = agent._analyze_coverage(tests, ["Оплата картой", "Экспорт отчёта"], semantic)
+        assert result["method"] == "lexical"
+        assert result["coverage_score"] == 0.0
+    def test_redisearch_branch_uses_batched_namespaced_queries(self, agent):
+        tests = [{"test_id": str(idx), "test_code": f"def test_{idx}(): pass"} for idx in range(3)]
+        with patch("agents.optimizer.optimizer_agent.redis_client") as redis_mock, \
+                patch.object(agent, "_embed_tests", new=AsyncMock(return_value=[[1.0, 0.0]] * 3)):
+            redis_mock.create_vector_index.return_value = True
+            redis_mock.save_vectors.return_value = True
+            redis_mock.search_similar_vectors_batch.return_value = [
+                [{"test_id": "0", "similarity": 1.0}, {"test_id": "1", "similarity": 0.95}],
+                [{"test_id": "0", "similarity": 0.95}],
+                []
+            ]
+            duplicates = asyncio.run(agent._find_semantic_duplicates(tests, 0.9))
+        assert [d["test_ids"] for d in duplicates] == [["0", "1"]]
+        namespace = redis_mock.save_vectors.call_args.args[1]
+        assert redis_mock.search_similar_vectors_batch.call_count == 1
+        assert redis_mock.delete_vectors.call_args.args[1] == namespace
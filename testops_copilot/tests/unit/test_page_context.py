@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+from agents.generator.page_context import PageContextBuilder
+PAGE_STRUCTURE = {
+    "buttons": [
+        {"text": "Войти", "id": "login", "dataTestId": ""},
+        {"text": "Рассчитать стоимость", "id": "", "dataTestId": "calc-submit"}
+    ],
+    "inputs": [
+        {"type": "number", "name": "cpu", "placeholder": "Количество vCPU", "id": "", "dataTestId": "cpu-input"},
+        {"type": "email", "name": "email", "placeholder": "Email", "id": "", "dataTestId": ""}
+    ],
+    "links": [{"text": "Тарифы", "href": "https://example.com/pricing", "id": "", "dataTestId": ""}],
+    "selectors": {"calc-submit": '[data-testid="calc-submit"]', "footer": '[data-testid="footer"]'}
+}
+class TestPageContextBuilder:
+    def test_ranks_elements_by_requirements(self):
+        builder = PageContextBuilder(token_budget=1000, use_embeddings=False)
+        table = asyncio.run(builder.build(PAGE_STRUCTURE, ["Расчёт стоимости по количеству vCPU"]))
+        rows = table.splitlines()[2:]
+        assert '[data-testid="cpu-input"]' in rows[0] or '[data-testid="calc-submit"]' in rows[0]
+        assert table.count('[data-testid="calc-submit"]') == 1
+        assert '[data-testid="footer"]' in table
+    def test_respects_token_budget(self):
+        builder = PageContextBuilder(token_budget=60, use_embeddings=False)
+        table = asyncio.run(builder.build(PAGE_STRUCTURE, ["Вход по email"]))
+        assert len(table) // 3 <= 60
+        assert "#login" in table or '[name="email"]' in table
+    def test_empty_structure(self):
+        builder = PageContextBuilder(use_embeddings=False)
+        assert asyncio.run(builder.build({}, ["что угодно"])) == ""
@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from agents.reconnaissance.recon_cache import ReconCache, html_fingerprint
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.hashes = {}
+    def get(self, key):
+        return self.data.get(key)
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+    def hincrby(self, key, field, amount):
+        self.hashes.setdefault(key, {})[field] = self.hashes.get(key, {}).get(field, 0) + amount
+    def hincrbyfloat(self, key, field, amount):
+        self.hincrby(key, field, amount)
+    def hgetall(self, key):
+        return self.hashes.get(key, {})
+@pytest.fixture
+def fake_redis():
+    fake = _FakeRedis()
+    with patch("agents.reconnaissance.recon_cache.redis_client", MagicMock(cache=fake)):
+        yield fake
+class TestReconCache:
+    def test_unchanged_page_skips_browser(self, fake_redis):
+        cache = ReconCache()
+        analyze = MagicMock(return_value={"title": "Home", "buttons": []})
+        with patch.object(cache, "_fetch_validators", return_value={"etag": '"v1"', "html_hash": "abc"}), \
+             patch.object(cache, "_revalidate", return_value={"unchanged": True}):
+            first = cache.get_or_analyze("https://example.com/", analyze)
+            second = cache.get_or_analyze("https://EXAMPLE.com", analyze)
+        assert analyze.call_count == 1
+        assert first["cache"]["hit"] is False
+        assert second["cache"]["hit"] is True
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+    def test_changed_page_and_bypass_rerun_recon(self, fake_redis):
+        cache = ReconCache()
+        analyze = MagicMock(return_value={"title": "Home"})
+        with patch.object(cache, "_fetch_validators", return_value={"html_hash": "abc"}), \
+             patch.object(cache, "_revalidate", return_value={"html_hash": "def", "unchanged": False}):
+            cache.get_or_analyze("https://example.com/", analyze)
+            cache.get_or_analyze("https://example.com/", analyze)
+            cache.get_or_analyze("https://example.com/", analyze, bypass=True)
+        assert analyze.call_count == 3
+        assert cache.stats()["stale"] == 1
+        assert cache.stats()["bypass"] == 1
+    def test_html_fingerprint_ignores_nonces(self):
+        assert html_fingerprint(b'<script nonce="a1">x</script>') == html_fingerprint(b'<script nonce="b2">x</script>')
@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from agents.reconnaissance.reconnaissance_agent import ReconnaissanceAgent, EXTRACTION_SCRIPT
+def _route(url, resource_type):
+    return SimpleNamespace(
+        request=SimpleNamespace(url=url, resource_type=resource_type),
+        abort=AsyncMock(),
+        continue_=AsyncMock()
+    )
+class TestReconnaissanceAgent:
+    def test_route_blocks_heavy_resources_and_trackers(self):
+        agent = ReconnaissanceAgent()
+        blocked = {"count": 0}
+        image = _route("https://example.com/logo.png", "image")
+        tracker = _route("https://www.google-analytics.com/analytics.js", "script")
+        document = _route("https://example.com/", "document")
+        for route in (image, tracker, document):
+            asyncio.run(agent._route_request(route, blocked))
+        image.abort.assert_awaited_once()
+        tracker.abort.assert_awaited_once()
+        document.continue_.assert_awaited_once()
+        assert blocked["count"] == 2
+    def test_extraction_uses_single_evaluate(self):
+        agent = ReconnaissanceAgent()
+        page = SimpleNamespace(evaluate=AsyncMock(return_value={
+            "title": "Calculator",
+            "buttons": [{"text": "Add", "id": "add", "type": "button", "dataTestId": "add-btn"}],
+            "inputs": [],
+            "links": [],
+            "selectors": {"add-btn": '[data-testid="add-btn"]'}
+        }))
+        structure = asyncio.run(agent._extract_page_structure(page, "https://example.com"))
+        page.evaluate.assert_awaited_once()
+        assert page.evaluate.await_args.args[0] == EXTRACTION_SCRIPT
+        assert structure["title"] == "Calculator"
+        assert structure["selectors"]["add-btn"] == '[data-testid="add-btn"]'
@@ -0,0 +1,71 @@
+import numpy as np
+from unittest.mock import patch
+from shared.utils.redis_client import RedisClient, parse_vector_search
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+    def hset(self, key, mapping):
+        self.commands.append(("HSET", key, mapping))
+    def expire(self, key, ttl):
+        self.commands.append(("EXPIRE", key, ttl))
+    def execute_command(self, *args):
+        self.commands.append(args)
+    def execute(self):
+        self.client.executions.append(self.commands)
+        return [self.client.reply(command) for command in self.commands]
+class FakeVectorRedis:
+    def __init__(self):
+        self.executions = []
+        self.commands = []
+        self.unlinked = []
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    def execute_command(self, *args):
+        self.commands.append(args)
+        if args[0] == "FT.INFO":
+            import redis
+            raise redis.ResponseError("Unknown index name")
+    def unlink(self, *keys):
+        self.unlinked.extend(keys)
+    def reply(self, command):
+        if command[0] != "FT.SEARCH":
+            return 1
+        return [2, b"test:idx:ns:a", [b"test_id", b"a", b"distance", b"0.02"], b"test:idx:ns:b", [b"test_id", b"b", b"distance", b"0.4"]]
+def make_client(fake):
+    client = RedisClient()
+    return patch.object(client, "get_client", return_value=fake), client
+class TestRedisVectors:
+    def test_create_index_uses_hnsw_and_drops_legacy_flat_index(self):
+        fake = FakeVectorRedis()
+        patcher, client = make_client(fake)
+        with patcher:
+            assert client.create_vector_index("idx:v", vector_dim=4, legacy_index="idx:old")
+        create = fake.commands[1]
+        assert create[:2] == ("FT.CREATE", "idx:v")
+        assert "HNSW" in create and "FLAT" not in create and "namespace" in create
+        assert fake.commands[2] == ("FT.DROPINDEX", "idx:old", "DD")
+    def test_bulk_write_is_one_pipeline_with_expiry(self):
+        fake = FakeVectorRedis()
+        patcher, client = make_client(fake)
+        with patcher:
+            assert client.save_vectors("idx:v", "ns1", [(str(idx), "t", [0.1] * 4) for idx in range(50)], ttl=60)
+        assert len(fake.executions) == 1
+        commands = fake.executions[0]
+        assert sum(1 for command in commands if command[0] == "HSET") == 50
+        assert ("EXPIRE", "test:idx:v:ns1:7", 60) in commands
+        assert np.frombuffer(commands[0][2]["embedding"], dtype=np.float32).shape == (4,)
+    def test_batched_search_filters_by_namespace_and_threshold(self):
+        fake = FakeVectorRedis()
+        patcher, client = make_client(fake)
+        with patcher:
+            results = client.search_similar_vectors_batch("idx:v", "ns1", [[0.1] * 4] * 5, top_k=3, threshold=0.9, chunk_size=2)
+        assert len(fake.executions) == 3
+        query = fake.executions[0][0][2]
+        assert query.startswith("@namespace:{ns1}=>[KNN $top_k")
+        assert results == [[{"test_id": "a", "similarity": 0.98}]] * 5
+        with patcher:
+            client.delete_vectors("idx:v", "ns1", ["a", "b"])
+        assert fake.unlinked == ["test:idx:v:ns1:a", "test:idx:v:ns1:b"]
+    def test_parse_empty_reply(self):
+        assert parse_vector_search([0], 0.5) == []
@@ -0,0 +1,106 @@
+import uuid
+from contextlib import contextmanager
+from sqlalchemy.dialects import postgresql
+from unittest.mock import patch
+from workers.tasks.langgraph.persistence import build_test_case_row, build_test_case_rows, bulk_insert_test_cases, flag_structural_duplicates, build_coverage_rows, replace_coverage
+UI_TEST = '''import allure
+from playwright.sync_api import Page, expect
+@allure.feature("Калькулятор")
+@allure.title("Открытие калькулятора")
+def test_open_calculator(page: Page):
+    page.goto("https://cloud.ru/calculator")
+    expect(page.locator("h1")).to_be_visible()
+'''
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+        self.savepoints = 0
+    def execute(self, statement):
+        self.statements.append(statement)
+    @contextmanager
+    def begin_nested(self):
+        self.savepoints += 1
+        yield
+class TestBuildTestCaseRow:
+    def test_derives_fields_in_one_pass(self):
+        request_id = uuid.uuid4()
+        row = build_test_case_row(request_id, UI_TEST, {"passed": True, "score": 90, "errors": []})
+        assert row["request_id"] == request_id
+        assert row["test_name"] == "test_open_calculator"
+        assert row["test_type"] == "automated"
+        assert row["validation_status"] == "passed"
+        assert len(row["code_hash"]) == 64
+        assert len(row["ast_hash"]) == 64
+    def test_ast_hash_ignores_formatting_and_comments(self):
+        reformatted = UI_TEST.replace('page.goto("https://cloud.ru/calculator")', "page.goto( 'https://cloud.ru/calculator' )  # открыть")
+        first = build_test_case_row(uuid.uuid4(), UI_TEST, {})
+        second = build_test_case_row(uuid.uuid4(), reformatted, {})
+        assert first["code_hash"] != second["code_hash"]
+        assert first["ast_hash"] == second["ast_hash"]
+    def test_syntax_error_falls_back_to_regex_name(self):
+        row = build_test_case_row(uuid.uuid4(), "def test_broken(:\n    pass", {"syntax_errors": ["invalid syntax"]})
+        assert row["test_name"] == "test_broken"
+        assert row["ast_hash"] is None
+        assert row["validation_status"] == "warning"
+    def test_collection_errors_mark_failed_and_manual_type(self):
+        code = "import allure\n@allure.manual\ndef test_manual_check():\n    pass\n"
+        row = build_test_case_row(uuid.uuid4(), code, {"collection_errors": ["fixture 'x' not found"]})
+        assert row["test_type"] == "manual"
+        assert row["validation_status"] == "failed"
+    def test_stores_safety_verdict(self):
+        blocked = build_test_case_row(uuid.uuid4(), UI_TEST, {"passed": True, "safety_risk_level": "CRITICAL", "safety_blocked": True})
+        assert blocked["validation_status"] == "failed"
+        assert blocked["safety_risk_level"] == "CRITICAL"
+        assert build_test_case_row(uuid.uuid4(), UI_TEST, {})["safety_risk_level"] == "UNCHECKED"
+    def test_skips_empty_and_invalid_entries(self):
+        rows = build_test_case_rows(uuid.uuid4(), [UI_TEST, {"code": "  "}, 42, {"code": UI_TEST}])
+        assert len(rows) == 2
+class TestBulkInsert:
+    def test_single_multi_row_insert_per_chunk(self):
+        rows = build_test_case_rows(uuid.uuid4(), [UI_TEST] * 25)
+        session = RecordingSession()
+        assert bulk_insert_test_cases(session, rows, chunk_size=10) == 25
+        assert len(session.statements) == 3
+        compiled = session.statements[0].compile(dialect=postgresql.dialect())
+        assert str(compiled).count("(%(test_id_m") == 10
+class TestStructuralDuplicates:
+    def test_flags_duplicates_within_request_and_history(self):
+        renamed = UI_TEST.replace("test_open_calculator", "test_calculator_renamed")
+        # Другой селектор - другой тест, хоть структура шагов та же
+        other_selector = UI_TEST.replace('"h1"', '"h2"')
+        other = UI_TEST.replace("to_be_visible()", "to_have_count(1)")
+        historical = build_test_case_row(uuid.uuid4(), other, {})
+        rows = build_test_case_rows(uuid.uuid4(), [UI_TEST, renamed, other, other_selector])
+        with patch("workers.tasks.langgraph.persistence.test_case_repository.find_by_ast_hashes", return_value={historical["ast_hash"]: historical["test_id"]}) as lookup:
+            session = RecordingSession()
+            assert flag_structural_duplicates(rows, db=session, url="https://cloud.ru/calculator") == 2
+        assert lookup.call_count == 1
+        assert lookup.call_args.args[2] == "https://cloud.ru/calculator"
+        assert session.savepoints == 1
+        assert rows[0]["is_duplicate"] is False
+        assert rows[1]["duplicate_of"] == rows[0]["test_id"]
+        assert rows[2]["duplicate_of"] == historical["test_id"]
+        assert rows[2]["similarity_score"] == 1.0
+        assert rows[3]["is_duplicate"] is False
+    def test_history_lookup_failure_falls_back_to_request_dedupe(self):
+        rows = build_test_case_rows(uuid.uuid4(), [UI_TEST, UI_TEST])
+        with patch("workers.tasks.langgraph.persistence.test_case_repository.find_by_ast_hashes", side_effect=RuntimeError("db down")):
+            assert flag_structural_duplicates(rows, db=RecordingSession()) == 1
+        assert rows[1]["duplicate_of"] == rows[0]["test_id"]
+class TestCoveragePersistence:
+    def test_coverage_rows_reference_saved_tests(self):
+        request_id = uuid.uuid4()
+        rows = build_test_case_rows(request_id, [UI_TEST])
+        coverage = [
+            {"requirement": "Открытие калькулятора", "score": 0.91, "quality": "insufficient", "tests": [[rows[0]["code_hash"], 0.91], ["missing", 0.8]]},
+            {"requirement": "Оплата", "score": 0.2, "quality": "insufficient", "tests": []}
+        ]
+        coverage_rows = build_coverage_rows(request_id, coverage, rows)
+        assert coverage_rows[0]["covering_tests"] == [str(rows[0]["test_id"])]
+        assert coverage_rows[0]["is_covered"] and not coverage_rows[0]["has_gap"]
+        assert coverage_rows[1]["requirement_index"] == 1 and coverage_rows[1]["has_gap"]
+        session = RecordingSession()
+        assert replace_coverage(session, request_id, coverage_rows) == 2
+        statements = [str(statement.compile(dialect=postgresql.dialect())) for statement in session.statements]
+        assert statements[0].startswith("DELETE FROM coverage_analysis")
+        assert statements[1].count("(%(coverage_id_m") == 2
@@ -0,0 +1,54 @@
+import uuid
+from unittest.mock import patch
+import pytest
+from shared.utils.security_audit import SecurityAuditSink
+REQUEST_ID = str(uuid.uuid4())
+SAFETY_RESULT = {
+    "risk_level": "CRITICAL",
+    "issues": [],
+    "blocked_patterns": ["os.system"],
+    "action_taken": "blocked",
+    "security_layer": "static"
+}
+class TestSecurityAuditSink:
+    def test_flush_writes_bulk_batches(self):
+        sink = SecurityAuditSink(batch_size=2, flush_interval=60, max_buffer=100)
+        with patch.object(sink, "_write") as write, patch.object(sink, "_ensure_flusher"):
+            for _ in range(5):
+                sink.record(REQUEST_ID, SAFETY_RESULT)
+            assert sink.flush() == 5
+        assert [len(call.args[0]) for call in write.call_args_list] == [2, 2, 1]
+        row = write.call_args_list[0].args[0][0]
+        assert row["security_layer"] == "static"
+        assert row["action_taken"] == "blocked"
+        assert sink.pending() == 0
+    def test_failed_flush_keeps_records_in_buffer(self):
+        sink = SecurityAuditSink(batch_size=10, flush_interval=60, max_buffer=3)
+        with patch.object(sink, "_write", side_effect=RuntimeError("db down")), patch.object(sink, "_ensure_flusher"):
+            for _ in range(5):
+                sink.record(REQUEST_ID, SAFETY_RESULT)
+            assert sink.flush() == 0
+        assert sink.pending() == 3
+        assert sink.dropped == 2
+    def test_record_without_request_is_ignored(self):
+        sink = SecurityAuditSink(batch_size=10, flush_interval=60, max_buffer=10)
+        sink.record(None, SAFETY_RESULT)
+        assert sink.pending() == 0
+    def test_failing_row_is_isolated_and_does_not_block_later_rows(self):
+        sink = SecurityAuditSink(batch_size=4, flush_interval=60, max_buffer=100, max_attempts=2)
+        written = []
+        def write(rows):
+            # Одна запись нарушает FK - пачка с ней не вставляется никогда
+            if any(row["details"].get("bad") for row in rows):
+                raise RuntimeError("foreign key violation")
+            written.extend(rows)
+        with patch.object(sink, "_write", side_effect=write), patch.object(sink, "_ensure_flusher"):
+            for idx in range(6):
+                sink.record(REQUEST_ID, SAFETY_RESULT, details={"idx": idx, "bad": idx == 1})
+            assert sink.flush() == 0
+            assert sink.pending() == 6
+            assert sink.flush() == 5
+        assert sorted(row["details"]["idx"] for row in written) == [0, 2, 3, 4, 5]
+        assert sink.pending() == 0
+        assert sink.dropped == 1
+        assert sink._attempts == {}
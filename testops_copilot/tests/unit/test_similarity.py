@@ -0,0 +1,28 @@
+import numpy as np
+from agents.optimizer.similarity import normalize_embeddings, similar_pairs
+def brute_force_pairs(matrix, threshold):
+    pairs = set()
+    for i in range(len(matrix)):
+        for j in range(i + 1, len(matrix)):
+            if float(matrix[i] @ matrix[j]) >= threshold:
+                pairs.add((i, j))
+    return pairs
+class TestSimilarity:
+    def test_normalize_handles_zero_rows(self):
+        matrix = normalize_embeddings([[3.0, 4.0], [0.0, 0.0]])
+        assert matrix.dtype == np.float32
+        assert np.allclose(matrix[0], [0.6, 0.8])
+        assert np.allclose(matrix[1], [0.0, 0.0])
+    def test_matches_brute_force_across_tiles(self):
+        rng = np.random.default_rng(7)
+        base = rng.standard_normal((40, 16))
+        embeddings = np.vstack([base, base[:15] + 0.05 * rng.standard_normal((15, 16))])
+        matrix = normalize_embeddings(embeddings)
+        rows, cols, scores = similar_pairs(matrix, 0.9, block_size=8)
+        assert set(zip(rows.tolist(), cols.tolist())) == brute_force_pairs(matrix, 0.9)
+        assert np.all(rows < cols)
+        assert np.all(scores >= 0.9)
+    def test_no_pairs_returns_empty_arrays(self):
+        matrix = normalize_embeddings(np.eye(4))
+        rows, cols, scores = similar_pairs(matrix, 0.5)
+        assert len(rows) == len(cols) == len(scores) == 0
@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import patch
+import pytest
+from agents.reconnaissance.site_crawler import SiteCrawler, normalize_url, dom_fingerprint
+SITE = {
+    "https://example.com/": {
+        "title": "Home",
+        "buttons": [{"id": "start", "type": "button", "dataTestId": "start", "text": "Start"}],
+        "inputs": [],
+        "links": [
+            {"href": "https://example.com/pricing"},
+            {"href": "https://example.com/blog/1"},
+            {"href": "https://example.com/blog/2"},
+            {"href": "https://other.com/"},
+            {"href": "https://example.com/file.pdf"},
+            {"href": "mailto:team@example.com"}
+        ],
+        "selectors": {"start": '[data-testid="start"]'}
+    },
+    "https://example.com/pricing": {
+        "title": "Pricing",
+        "buttons": [{"id": "calc", "type": "submit", "dataTestId": "calc", "text": "Calculate"}],
+        "inputs": [{"type": "number", "name": "cpu", "id": "cpu", "dataTestId": "cpu"}],
+        "links": [{"href": "https://example.com/"}],
+        "selectors": {"calc": '[data-testid="calc"]', "cpu": '[data-testid="cpu"]'}
+    },
+    "https://example.com/blog/1": {"title": "Post 1", "buttons": [], "inputs": [], "links": [], "selectors": {}},
+    "https://example.com/blog/2": {"title": "Post 2", "buttons": [], "inputs": [], "links": [], "selectors": {}}
+}
+async def _fake_analyze(url, timeout):
+    return {**SITE[url], "url": url}
+class TestSiteCrawler:
+    def test_crawl_follows_same_origin_and_dedupes(self):
+        crawler = SiteCrawler(max_depth=2, max_pages=10, concurrency=2)
+        with patch.object(crawler.recon_agent, "_analyze_page", side_effect=_fake_analyze):
+            result = asyncio.run(crawler._crawl("https://example.com/", timeout=10))
+        urls = [page["url"] for page in result["pages"]]
+        assert urls[0] == "https://example.com/"
+        assert "https://example.com/pricing" in urls
+        # Две страницы блога имеют одинаковую структуру, остаётся одна
+        assert len([url for url in urls if "/blog/" in url]) == 1
+        assert result["crawl"]["duplicates"] == 1
+        assert {b["dataTestId"] for b in result["buttons"]} == {"start", "calc"}
+        assert "cpu" in result["selectors"]
+        assert "https://example.com/pricing" in result["site_map"]["https://example.com/"]
+    def test_crawl_respects_page_budget(self):
+        crawler = SiteCrawler(max_depth=2, max_pages=2, concurrency=2)
+        with patch.object(crawler.recon_agent, "_analyze_page", side_effect=_fake_analyze):
+            result = asyncio.run(crawler._crawl("https://example.com/", timeout=10))
+        assert result["crawl"]["pages_visited"] == 2
+    def test_normalize_and_fingerprint(self):
+        assert normalize_url("HTTPS://Example.com/pricing/#plans") == "https://example.com/pricing"
+        assert dom_fingerprint(SITE["https://example.com/blog/1"]) == dom_fingerprint(SITE["https://example.com/blog/2"])
@@ -0,0 +1,82 @@
+import json
+import pytest
+from unittest.mock import patch
+from shared.utils import test_blob_store as blob_module
+from shared.utils.test_blob_store import TestBlobStore, code_hash, store_tests, load_tests
+class FakePipeline:
+    def __init__(self, data):
+        self.data = data
+        self.ops = []
+    def set(self, key, value, ex=None):
+        self.ops.append((key, value))
+    def execute(self):
+        for key, value in self.ops:
+            self.data[key] = value
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.mget_calls = 0
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.data)
+    def mget(self, keys):
+        self.mget_calls += 1
+        return [self.data.get(key) for key in keys]
+class FakeRedisClient:
+    def __init__(self):
+        self.cache = FakeRedis()
+SAMPLE_TEST = '''import allure
+from playwright.sync_api import Page, expect
+@allure.feature("Калькулятор")
+@allure.story("Расчёт стоимости")
+@allure.title("Проверка расчёта стоимости виртуальной машины")
+def test_calculator_{idx}(page: Page):
+    with allure.step("Открыть страницу калькулятора"):
+        page.goto("https://cloud.ru/calculator")
+    with allure.step("Выбрать конфигурацию"):
+        page.locator("[data-testid='cpu-select']").select_option("{idx}")
+        page.locator("[data-testid='ram-select']").select_option("16")
+    with allure.step("Проверить итоговую стоимость"):
+        expect(page.locator("[data-testid='total-price']")).to_be_visible()
+'''
+@pytest.fixture
+def fake_redis():
+    client = FakeRedisClient()
+    store = TestBlobStore(ttl=60, local_cache_size=2)
+    with patch.object(blob_module, "redis_client", client), patch.object(blob_module, "test_blob_store", store):
+        yield client, store
+class TestTestBlobStore:
+    def test_put_and_get_roundtrip(self, fake_redis):
+        client, store = fake_redis
+        hashes = store.put_many(["a = 1", "b = 2", "a = 1"])
+        assert hashes[0] == hashes[2] == code_hash("a = 1")
+        assert len(client.cache.data) == 2
+        assert store.get_many(hashes) == ["a = 1", "b = 2", "a = 1"]
+    def test_get_falls_back_to_redis_after_local_eviction(self, fake_redis):
+        client, _ = fake_redis
+        writer = TestBlobStore(ttl=60, local_cache_size=1)
+        reader = TestBlobStore(ttl=60, local_cache_size=1)
+        hashes = writer.put_many(["x = 1", "y = 2"])
+        assert reader.get_many(hashes) == ["x = 1", "y = 2"]
+        assert client.cache.mget_calls == 1
+    def test_missing_blob_raises(self, fake_redis):
+        _, store = fake_redis
+        with pytest.raises(KeyError):
+            store.get("0" * 64)
+    def test_store_and_load_tests_keep_metadata(self, fake_redis):
+        refs = store_tests(["code_a", {"code": "code_b", "validation": {"score": 90}}])
+        assert refs == [
+            {"code_ref": code_hash("code_a")},
+            {"code_ref": code_hash("code_b"), "validation": {"score": 90}}
+        ]
+        loaded = load_tests(refs + ["legacy_code"])
+        assert [test["code"] for test in loaded] == ["code_a", "code_b", "legacy_code"]
+        assert loaded[1]["validation"] == {"score": 90}
+    def test_refs_keep_code_out_of_state(self, fake_redis):
+        tests = [{"code": SAMPLE_TEST.replace("{idx}", str(idx)), "validation": {"passed": True, "score": 85}} for idx in range(20)]
+        inline_state = {"generated_tests": [t["code"] for t in tests], "validated_tests": tests, "optimized_tests": tests}
+        refs = store_tests(tests)
+        ref_state = {"generated_tests": refs, "validated_tests": refs, "optimized_tests": refs}
+        inline_size = len(json.dumps(inline_state, ensure_ascii=False).encode())
+        ref_size = len(json.dumps(ref_state).encode())
+        assert "page.goto" not in json.dumps(ref_state)
+        assert ref_size * 5 <= inline_size
@@ -0,0 +1,64 @@
+import uuid
+from sqlalchemy.dialects import postgresql
+from shared.utils.test_case_repository import TestCaseRepository
+class FakeResult(list):
+    def first(self):
+        return self[0] if self else None
+class FakeRow:
+    def __init__(self, **values):
+        self._mapping = values
+        for key, value in values.items():
+            setattr(self, key, value)
+class RecordingSession:
+    def __init__(self, results=None):
+        self.statements = []
+        self.results = list(results or [])
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return FakeResult(self.results.pop(0) if self.results else [])
+class TestTestCaseRepository:
+    def test_nearest_orders_by_cosine_distance_with_ef_search(self):
+        repository = TestCaseRepository()
+        match = FakeRow(test_id=uuid.uuid4(), request_id=uuid.uuid4(), test_name="test_a", test_type="automated", validation_status="passed", similarity=0.97)
+        session = RecordingSession(results=[[], [match]])
+        hits = repository.nearest(session, [0.1] * repository.embedding_dim, limit=5, originals_only=True)
+        assert session.statements[0].startswith("SET LOCAL hnsw.ef_search")
+        assert "<=>" in session.statements[1]
+        assert "ORDER BY test_cases.semantic_embedding <=>" in session.statements[1]
+        assert "is_duplicate IS NOT true" in session.statements[1]
+        assert hits[0]["test_name"] == "test_a"
+    def test_wrong_dimension_is_ignored(self):
+        repository = TestCaseRepository()
+        session = RecordingSession()
+        assert repository.nearest(session, [0.1, 0.2]) == []
+        assert session.statements == []
+    def test_find_duplicates_single_lateral_query(self):
+        repository = TestCaseRepository()
+        close, far = uuid.uuid4(), uuid.uuid4()
+        session = RecordingSession(results=[[], [(1, close, 0.99), (3, far, 0.5)]])
+        embedding = [0.1] * repository.embedding_dim
+        matches = repository.find_duplicates(session, [embedding, [0.1, 0.2], embedding], threshold=0.95)
+        assert matches == [(close, 0.99), None, None]
+        assert len(session.statements) == 2
+        assert session.statements[0].startswith("SET LOCAL hnsw.ef_search")
+        assert "CROSS JOIN LATERAL" in session.statements[1]
+        assert "LIMIT 1" in session.statements[1]
+        assert repository.find_duplicates(RecordingSession(), [[0.1, 0.2]], threshold=0.95) == [None]
+    def test_similar_to_missing_test(self):
+        repository = TestCaseRepository()
+        assert repository.similar_to(RecordingSession(), uuid.uuid4()) is None
+    def test_find_by_ast_hashes_single_indexed_query(self):
+        repository = TestCaseRepository()
+        first, second = uuid.uuid4(), uuid.uuid4()
+        session = RecordingSession(results=[[("h1", first), ("h1", second), ("h2", second)]])
+        originals = repository.find_by_ast_hashes(session, ["h1", "h2", "h1", None])
+        assert originals == {"h1": first, "h2": second}
+        assert len(session.statements) == 1
+        assert "test_cases.ast_hash IN" in session.statements[0]
+        assert repository.find_by_ast_hashes(session, []) == {}
+    def test_find_by_ast_hashes_scoped_to_url(self):
+        repository = TestCaseRepository()
+        session = RecordingSession()
+        repository.find_by_ast_hashes(session, ["h1"], url="https://cloud.ru/calculator")
+        assert "JOIN requests ON requests.request_id = test_cases.request_id" in session.statements[0]
+        assert "requests.url =" in session.statements[0]
@@ -0,0 +1,150 @@
+import os
+import uuid
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, PropertyMock, patch
+from agents.optimizer.similarity import normalize_embeddings
+from agents.optimizer.vector_index import VectorIndex
+from workers.tasks.langgraph import persistence
+def random_vectors(count, dim=32, seed=0):
+    return normalize_embeddings(np.random.default_rng(seed).standard_normal((count, dim)))
+class TestVectorIndex:
+    def test_flat_search_before_training(self, tmp_path):
+        index = VectorIndex(path=str(tmp_path), nprobe=2, train_min=1000)
+        vectors = random_vectors(10)
+        ids = [str(uuid.uuid4()) for _ in range(10)]
+        index.add(ids, vectors)
+        hits = index.search(vectors[3], k=2)[0]
+        assert hits[0][0] == ids[3]
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+        assert len(hits) == 2
+    def test_ivf_search_after_training_finds_near_duplicates(self, tmp_path):
+        index = VectorIndex(path=str(tmp_path), nprobe=4, train_min=200)
+        vectors = random_vectors(600)
+        ids = [str(uuid.uuid4()) for _ in range(600)]
+        for start in range(0, 600, 100):
+            index.add(ids[start:start + 100], vectors[start:start + 100])
+        assert index._read_meta()["nlist"] > 1
+        noise = np.random.default_rng(1).standard_normal((50, 32)) * 0.01
+        hits = index.search(normalize_embeddings(vectors[:50] + noise))
+        assert [hit[0][0] for hit in hits] == ids[:50]
+    def test_index_is_shared_through_files(self, tmp_path):
+        writer = VectorIndex(path=str(tmp_path), train_min=1000)
+        reader = VectorIndex(path=str(tmp_path), train_min=1000)
+        vectors = random_vectors(4)
+        assert reader.search(vectors[0]) == [[]]
+        writer.add([str(uuid.uuid4()) for _ in range(2)], vectors[:2])
+        assert reader.search(vectors[1])[0][0][1] == pytest.approx(1.0, abs=1e-5)
+        writer.add([str(uuid.uuid4()) for _ in range(2)], vectors[2:])
+        assert reader.count() == 4
+        assert reader.search(vectors[3])[0][0][1] == pytest.approx(1.0, abs=1e-5)
+    def test_torn_write_is_truncated(self, tmp_path):
+        index = VectorIndex(path=str(tmp_path), train_min=1000)
+        vectors = random_vectors(3)
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        index.add(ids[:1], vectors[:1])
+        with open(os.path.join(tmp_path, "vectors.f32"), "ab") as f:
+            f.write(b"\x00" * 10)
+        index.add(ids[1:], vectors[1:])
+        assert index.search(vectors[2])[0][0][0] == ids[2]
+    def test_retraining_publishes_versioned_files_through_meta(self, tmp_path):
+        writer = VectorIndex(path=str(tmp_path), nprobe=4, train_min=100)
+        reader = VectorIndex(path=str(tmp_path), nprobe=4, train_min=100)
+        vectors = random_vectors(400)
+        ids = [str(uuid.uuid4()) for _ in range(400)]
+        writer.add(ids[:100], vectors[:100])
+        first = writer._read_meta()
+        assert first["centroids_file"] == "centroids.100.f32"
+        assert reader.search(vectors[5])[0][0][0] == ids[5]
+        write_atomic = writer._write_atomic
+        def fail_on_meta(name, data):
+            if name == "meta.json":
+                raise OSError("disk full")
+            write_atomic(name, data)
+        # Сбой после обучения, до публикации meta.json: читатели видят прежнюю согласованную версию
+        with patch.object(writer, "_write_atomic", side_effect=fail_on_meta):
+            with pytest.raises(OSError):
+                writer.add(ids[100:], vectors[100:])
+        assert writer._read_meta() == first
+        assert reader.search(vectors[5])[0][0][0] == ids[5]
+        writer.add(ids[100:], vectors[100:])
+        meta = writer._read_meta()
+        assert meta["trained_count"] == 400 and meta["centroids_file"] == "centroids.400.f32"
+        assert reader.search(vectors[350])[0][0][0] == ids[350]
+        files = sorted(name for name in os.listdir(tmp_path) if name.startswith(("lists.", "centroids.")))
+        assert files == ["centroids.100.f32", "centroids.400.f32", "lists.100.i32", "lists.400.i32"]
+    def test_dimension_mismatch(self, tmp_path):
+        index = VectorIndex(path=str(tmp_path), train_min=1000)
+        index.add([str(uuid.uuid4())], random_vectors(1, dim=8))
+        with pytest.raises(ValueError):
+            index.add([str(uuid.uuid4())], random_vectors(1, dim=16))
+        assert index.search(random_vectors(1, dim=16)) == [[]]
+class TestHistoricalDuplicates:
+    def test_flags_rows_and_indexes_only_originals(self, tmp_path):
+        index = VectorIndex(path=str(tmp_path), train_min=1000)
+        stored_id = str(uuid.uuid4())
+        index.add([stored_id], normalize_embeddings([[1.0, 0.0, 0.0]]))
+        rows = [
+            {"test_id": uuid.uuid4(), "test_name": "test_a", "test_code": "a"},
+            {"test_id": uuid.uuid4(), "test_name": "test_b", "test_code": "b"}
+        ]
+        async def fake_embed(texts):
+            return [[0.99, 0.01, 0.0], [0.0, 1.0, 0.0]], [False, False]
+        with patch.object(persistence, "test_vector_index", index), \
+                patch.object(persistence, "embed_texts_with_status", fake_embed), \
+                patch.object(persistence.settings, "optimizer_duplicate_backend", "index"):
+            rows, matrix = persistence.embed_rows(rows)
+            persistence.flag_historical_duplicates(rows, matrix, threshold=0.95)
+            persistence.index_test_cases(rows, matrix)
+        assert rows[0]["is_duplicate"] is True
+        assert rows[0]["duplicate_of"] == uuid.UUID(stored_id)
+        assert 0.95 <= rows[0]["similarity_score"] <= 1.0
+        assert rows[1]["is_duplicate"] is False and rows[1]["duplicate_of"] is None
+        assert rows[0]["semantic_embedding"] is None
+        assert index.count() == 2
+    def test_hash_fallback_rows_are_not_embedded(self):
+        rows = [
+            {"test_id": uuid.uuid4(), "test_name": "test_a", "test_code": "a", "semantic_embedding": None},
+            {"test_id": uuid.uuid4(), "test_name": "test_b", "test_code": "b", "semantic_embedding": None}
+        ]
+        async def fake_embed(texts):
+            return [[0.0, 1.0] * 384, [1.0, 0.0] * 384], [True, False]
+        with patch.object(persistence, "embed_texts_with_status", fake_embed), \
+                patch.object(type(persistence.test_case_repository), "embedding_dim", new_callable=PropertyMock, return_value=768):
+            embedded, matrix = persistence.embed_rows(rows)
+        assert embedded == [rows[1]]
+        assert matrix.shape == (1, 768)
+        assert rows[0]["semantic_embedding"] is None
+        assert rows[1]["semantic_embedding"] is not None
+class _FakeEmbeddingsAPI:
+    def __init__(self):
+        self.models = []
+    async def create(self, model, input):
+        self.models.append(model)
+        inputs = input if isinstance(input, list) else [input]
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[3.0, 4.0] + [0.0] * (persistence.settings.embedding_dimensions - 2)) for _ in inputs])
+def _embedding_client(openai_client):
+    from agents.optimizer import embeddings
+    redis_mock = MagicMock()
+    redis_mock.cache.get.return_value = None
+    redis_mock.cache.mget.side_effect = lambda keys: [None] * len(keys)
+    return patch.object(embeddings.llm_client, "_openai_client", openai_client), patch("shared.utils.llm_client.redis_client", redis_mock)
+class TestStoredEmbeddings:
+    def test_stores_vectors_from_the_embedding_model(self):
+        api = _FakeEmbeddingsAPI()
+        rows = [{"test_id": uuid.uuid4(), "test_name": "test_a", "test_code": "a", "semantic_embedding": None}]
+        client_patch, redis_patch = _embedding_client(SimpleNamespace(embeddings=api))
+        with client_patch, redis_patch:
+            embedded, matrix = persistence.embed_rows(rows)
+        assert api.models == [persistence.settings.embedding_model]
+        assert embedded == rows
+        assert persistence.test_case_repository.accepts(rows[0]["semantic_embedding"])
+        assert rows[0]["semantic_embedding"][:2] == pytest.approx([0.6, 0.8])
+    def test_without_embedding_provider_nothing_is_stored(self):
+        rows = [{"test_id": uuid.uuid4(), "test_name": "test_a", "test_code": "a", "semantic_embedding": None}]
+        client_patch, redis_patch = _embedding_client(None)
+        with client_patch, redis_patch:
+            embedded, matrix = persistence.embed_rows(rows)
+        assert embedded == [] and matrix is None
+        assert rows[0]["semantic_embedding"] is None
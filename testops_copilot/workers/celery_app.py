@@ -1,5 +1,6 @@
 
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from shared.config.settings import settings
 from shared.utils.tracing import setup_tracing
 celery_app = Celery(
@@ -10,7 +11,8 @@ celery_app = Celery(
         "workers.tasks.generate_workflow",
         "workers.tasks.generate_api_workflow",
         "workers.tasks.langgraph_workflow",
-        "workers.tasks.langgraph_celery_task"
+        "workers.tasks.langgraph_celery_task",
+        "workers.tasks.execute_workflow"
     ]
 )
 celery_app.conf.update(
@@ -25,6 +27,34 @@ celery_app.conf.update(
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=50,
 )
+@worker_process_init.connect
+def start_browser_pool(**kwargs):
+    # Один event loop на процесс: соединения с LLM переиспользуются между задачами
+    from shared.utils.async_runtime import async_runtime
+    async_runtime.start()
+    # Chromium запускается один раз на процесс воркера, а не на каждый анализ страницы
+    if not settings.recon_browser_pool_enabled:
+        return
+    try:
+        from agents.reconnaissance.browser_pool import browser_pool
+        browser_pool.start()
+    except Exception as e:
+        from shared.utils.logger import agent_logger
+        agent_logger.warning(f"Browser pool warm-up failed, will retry on first use: {e}")
+@worker_process_shutdown.connect
+def stop_browser_pool(**kwargs):
+    try:
+        from agents.reconnaissance.browser_pool import browser_pool
+        browser_pool.shutdown()
+    except Exception:
+        pass
+    from shared.utils.async_runtime import async_runtime
+    from shared.utils.llm_client import llm_client
+    try:
+        async_runtime.run_coro(llm_client.close(), timeout=10)
+    except Exception:
+        pass
+    async_runtime.shutdown()
 try:
     setup_tracing(celery_app=celery_app)
 except Exception as e:
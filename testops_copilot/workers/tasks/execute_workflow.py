@@ -0,0 +1,94 @@
+from celery import Task
+from workers.celery_app import celery_app
+from shared.utils.database import get_db
+from shared.models.database import Request, TestCase
+from shared.config.settings import settings
+from agents.executor.executor_agent import ExecutorAgent
+from shared.utils.redis_client import redis_client
+from shared.utils.logger import agent_logger
+from sqlalchemy import update
+import os
+import uuid
+from datetime import datetime
+EXECUTABLE_RISK_LEVELS = ("SAFE", "LOW", "MEDIUM")
+class ExecuteTestsTask(Task):
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        request_id = kwargs.get("request_id") or (args[0] if args else None)
+        if request_id:
+            redis_client.publish_event(
+                f"request:{request_id}",
+                {"status": "processing", "step": "execution", "error": str(exc)}
+            )
+@celery_app.task(
+    bind=True,
+    base=ExecuteTestsTask,
+    name="workers.tasks.execute_workflow.execute_tests_task"
+)
+def execute_tests_task(
+    self,
+    request_id: str,
+    base_url: str,
+    options: dict = None
+):
+    options = options or {}
+    with get_db() as db:
+        request = db.query(Request).filter(Request.request_id == uuid.UUID(request_id)).first()
+        if not request:
+            raise ValueError(f"Request {request_id} not found")
+        request_url = request.url
+        # Ручные тесты не исполняются - у них нет кода шагов;
+        # исполняется только код, прошедший SafetyGuard и pytest --collect-only
+        rows = db.query(TestCase.test_id, TestCase.test_code).filter(
+            TestCase.request_id == request.request_id,
+            TestCase.test_type != "manual",
+            TestCase.validation_status != "failed",
+            TestCase.safety_risk_level.in_(EXECUTABLE_RISK_LEVELS)
+        ).all()
+        tests = [{"test_id": str(test_id), "test_code": test_code} for test_id, test_code in rows]
+    redis_client.publish_event(
+        f"request:{request_id}",
+        {"status": "processing", "step": "execution", "message": f"Запуск {len(tests)} тестов..."}
+    )
+    rewrite_origins = options.get("rewrite_origins")
+    if rewrite_origins is None:
+        rewrite_origins = [request_url] if request_url and request_url.startswith("http") else []
+    results_dir = os.path.join(settings.execution_results_dir, request_id, "allure-results")
+    execution = ExecutorAgent().execute(
+        tests=tests,
+        base_url=base_url,
+        workers=options.get("workers"),
+        rewrite_origins=rewrite_origins,
+        results_dir=results_dir,
+        timeout=options.get("timeout")
+    )
+    executed_at = datetime.utcnow()
+    updates = [
+        {
+            "test_id": uuid.UUID(test_id),
+            "execution_status": result["status"],
+            "execution_duration_ms": result["duration_ms"],
+            "execution_message": (result.get("message") or "")[:2000] or None,
+            "last_executed_at": executed_at
+        }
+        for test_id, result in execution["results"].items()
+    ]
+    with get_db() as db:
+        if updates:
+            db.execute(update(TestCase), updates)
+        request = db.query(Request).filter(Request.request_id == uuid.UUID(request_id)).first()
+        if request:
+            request.result_summary = {
+                **(request.result_summary or {}),
+                "execution": {**execution["summary"], "base_url": base_url, "allure_results": results_dir}
+            }
+        db.commit()
+    agent_logger.info(f"[EXECUTION] Stored results for {len(updates)} tests of request {request_id}")
+    redis_client.publish_event(
+        f"request:{request_id}",
+        {"status": "completed", "step": "execution", "summary": execution["summary"]}
+    )
+    return {
+        "request_id": request_id,
+        "status": "completed",
+        "summary": execution["summary"]
+    }
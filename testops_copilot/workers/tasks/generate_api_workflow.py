@@ -7,6 +7,9 @@ from agents.generator.generator_agent import GeneratorAgent
 from agents.generator.openapi_parser import OpenAPIParser
 from agents.validator.validator_agent import ValidatorAgent
 from shared.utils.redis_client import redis_client
+from shared.utils.async_runtime import run_coro
+from shared.utils.security_audit import security_audit_sink
+from shared.utils.ast_fingerprint import canonical_ast_hash
 import uuid
 import hashlib
 from datetime import datetime
@@ -64,47 +67,40 @@ def generate_api_tests_task(
             {"status": "processing", "step": "parsing"}
         )
         parser = OpenAPIParser()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            if openapi_spec:
-                import yaml
-                import json
-                try:
-                    spec_dict = yaml.safe_load(openapi_spec)
-                except:
-                    spec_dict = json.loads(openapi_spec)
-            elif openapi_url:
-                # Добавляем таймаут для парсинга OpenAPI URL (максимум 60 секунд)
-                from shared.utils.logger import agent_logger
-                agent_logger.info(f"[API] Parsing OpenAPI from URL: {openapi_url}")
-                try:
-                    spec_dict = loop.run_until_complete(
-                        asyncio.wait_for(
-                            parser.parse_from_url(openapi_url),
-                            timeout=60.0  # 60 секунд таймаут
-                        )
+        if openapi_spec:
+            import yaml
+            import json
+            try:
+                spec_dict = yaml.safe_load(openapi_spec)
+            except:
+                spec_dict = json.loads(openapi_spec)
+        elif openapi_url:
+            # Добавляем таймаут для парсинга OpenAPI URL (максимум 60 секунд)
+            from shared.utils.logger import agent_logger
+            agent_logger.info(f"[API] Parsing OpenAPI from URL: {openapi_url}")
+            try:
+                spec_dict = run_coro(
+                    asyncio.wait_for(
+                        parser.parse_from_url(openapi_url),
+                        timeout=60.0  # 60 секунд таймаут
                     )
-                    agent_logger.info(f"[API] OpenAPI parsed successfully")
-                except asyncio.TimeoutError:
-                    error_msg = f"Timeout при получении OpenAPI спецификации из {openapi_url}. Проверьте доступность URL и скорость ответа сервера."
-                    agent_logger.error(f"[API] {error_msg}")
-                    raise ValueError(error_msg)
-                except Exception as e:
-                    error_msg = f"Ошибка при получении OpenAPI спецификации из {openapi_url}: {str(e)}"
-                    agent_logger.error(f"[API] {error_msg}", exc_info=True)
-                    raise ValueError(error_msg)
-            else:
-                raise ValueError("openapi_url or openapi_spec is required")
-        finally:
-            loop.close()
+                )
+                agent_logger.info(f"[API] OpenAPI parsed successfully")
+            except asyncio.TimeoutError:
+                error_msg = f"Timeout при получении OpenAPI спецификации из {openapi_url}. Проверьте доступность URL и скорость ответа сервера."
+                agent_logger.error(f"[API] {error_msg}")
+                raise ValueError(error_msg)
+            except Exception as e:
+                error_msg = f"Ошибка при получении OpenAPI спецификации из {openapi_url}: {str(e)}"
+                agent_logger.error(f"[API] {error_msg}", exc_info=True)
+                raise ValueError(error_msg)
+        else:
+            raise ValueError("openapi_url or openapi_spec is required")
         redis_client.publish_event(
             f"request:{request_id}",
             {"status": "processing", "step": "generation"}
         )
         generator = GeneratorAgent()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
         try:
             from shared.utils.logger import agent_logger
             agent_logger.info(
@@ -117,7 +113,7 @@ def generate_api_tests_task(
                 }
             )
             # Добавляем таймаут для генерации API тестов (максимум 5 минут)
-            tests = loop.run_until_complete(
+            tests = run_coro(
                 asyncio.wait_for(
                 generator.generate_api_tests(
                     openapi_spec=spec_dict,
@@ -143,8 +139,6 @@ def generate_api_tests_task(
             from shared.utils.logger import agent_logger
             agent_logger.error(f"[GENERATION] API test generation error: {e}", exc_info=True)
             raise
-        finally:
-            loop.close()
         redis_client.publish_event(
             f"request:{request_id}",
             {"status": "processing", "step": "validation", "tests_count": len(tests)}
@@ -153,9 +147,11 @@ def generate_api_tests_task(
         validated_tests = []
         from shared.utils.logger import agent_logger
         agent_logger.info(f"[VALIDATION] Starting validation of {len(tests)} API tests for request {request_id}")
+        validation_results = validator.validate_batch(tests, validation_level="full", request_id=request_id)
+        security_audit_sink.request_flush()
         for i, test_code in enumerate(tests):
             agent_logger.info(f"[VALIDATION] Validating API test {i+1}/{len(tests)}")
-            validation_result = validator.validate(test_code, validation_level="full")
+            validation_result = validation_results[i]
             passed = validation_result.get("passed", False)
             score = validation_result.get("score", 0)
             syntax_errors = len(validation_result.get('syntax_errors', []))
@@ -297,8 +293,10 @@ def generate_api_tests_task(
                     test_code=test_code,
                     test_type="api",
                     code_hash=code_hash,
+                    ast_hash=canonical_ast_hash(test_code),
                     validation_status=validation_status,
-                    validation_issues=test_data.get("validation", {}).get("errors", [])
+                    validation_issues=test_data.get("validation", {}).get("errors", []),
+                    safety_risk_level=test_data.get("validation", {}).get("safety_risk_level", "UNCHECKED")
                 )
                 db.add(test_case)
                 saved_tests.append({
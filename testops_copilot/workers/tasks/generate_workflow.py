@@ -8,7 +8,10 @@ from agents.generator.generator_agent import GeneratorAgent
 from agents.validator.validator_agent import ValidatorAgent
 # OptimizerAgent убран - оптимизация отключена
 from shared.utils.redis_client import redis_client
+from shared.utils.security_audit import security_audit_sink
 from shared.utils.logger import agent_logger
+from shared.utils.async_runtime import run_coro
+from shared.utils.ast_fingerprint import canonical_ast_hash
 import uuid
 import json
 import hashlib
@@ -66,7 +69,15 @@ def generate_test_cases_task(
         )
         recon_agent = ReconnaissanceAgent()
         try:
-            page_structure = recon_agent.analyze_page(url, timeout=60)
+            html_content = None
+            if options.get("html_snapshot_key"):
+                html_content = redis_client.cache.get(options["html_snapshot_key"])
+            page_structure = recon_agent.analyze(
+                url,
+                timeout=60,
+                backend=options.get("recon_backend"),
+                html_content=html_content
+            )
         except MemoryError as e:
             agent_logger.warning(f"[RECONNAISSANCE] MemoryError during page analysis: {e}, using fallback")
             # Используем минимальную структуру страницы как fallback
@@ -91,8 +102,6 @@ def generate_test_cases_task(
             {"status": "processing", "step": "generation"}
         )
         generator = GeneratorAgent()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
         try:
             agent_logger.info(
                 f"[GENERATION] Starting test generation",
@@ -104,7 +113,7 @@ def generate_test_cases_task(
                     "options": options
                 }
             )
-            tests = loop.run_until_complete(
+            tests = run_coro(
                 generator.generate_ui_tests(
                     url=url,
                     page_structure=page_structure,
@@ -129,8 +138,6 @@ def generate_test_cases_task(
             agent_logger.error(f"[GENERATION] Generation error: {e}", exc_info=True)
             tests = []
             raise
-        finally:
-            loop.close()
         redis_client.publish_event(
             f"request:{request_id}",
             {"status": "processing", "step": "validation", "tests_count": len(tests)}
@@ -138,9 +145,11 @@ def generate_test_cases_task(
         validator = ValidatorAgent()
         validated_tests = []
         agent_logger.info(f"[VALIDATION] Starting validation of {len(tests)} tests for request {request_id}")
+        validation_results = validator.validate_batch(tests, validation_level="full", request_id=request_id)
+        security_audit_sink.request_flush()
         for i, test_code in enumerate(tests):
             agent_logger.info(f"[VALIDATION] Validating test {i+1}/{len(tests)}")
-            validation_result = validator.validate(test_code, validation_level="full")
+            validation_result = validation_results[i]
             
             passed = validation_result.get("passed", False)
             score = validation_result.get("score", 0)
@@ -251,8 +260,10 @@ def generate_test_cases_task(
                     test_code=test_code,
                     test_type=actual_test_type,
                     code_hash=code_hash,
+                    ast_hash=canonical_ast_hash(test_code),
                     validation_status=validation_status,
-                    validation_issues=validation.get("errors", [])
+                    validation_issues=validation.get("errors", []),
+                    safety_risk_level=validation.get("safety_risk_level", "UNCHECKED")
                 )
                 db.add(test_case)
                 saved_tests.append({
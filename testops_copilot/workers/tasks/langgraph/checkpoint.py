@@ -0,0 +1,169 @@
+import copy
+import json
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Optional
+from langchain_core.runnables.utils import ConfigurableFieldSpec
+from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointAt
+from langgraph.checkpoint.memory import MemorySaver
+from sqlalchemy import delete, insert, select
+from shared.config.settings import settings
+from shared.models.database import WorkflowCheckpoint
+from shared.utils.logger import agent_logger
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+class SnapshotMemorySaver(MemorySaver):
+    # MemorySaver хранит ссылку на checkpoint, который Pregel продолжает изменять на следующем шаге,
+    # из-за чего после сбоя упавший узел считается уже выполненным. Храним копию.
+    at: CheckpointAt = CheckpointAt.END_OF_STEP
+    def get(self, config) -> Optional[Checkpoint]:
+        checkpoint = self.storage.get(config["configurable"]["thread_id"])
+        return copy.deepcopy(checkpoint) if checkpoint else None
+    def put(self, config, checkpoint: Checkpoint) -> None:
+        self.storage[config["configurable"]["thread_id"]] = copy.deepcopy(checkpoint)
+class CheckpointSerializer:
+    """
+    Компактный формат checkpoint: msgpack + zstd, при отсутствии библиотек - json + zlib.
+    Первый байт payload - код формата, поэтому читаются записи обоих форматов.
+    """
+    MSGPACK_ZSTD = b"m"
+    JSON_ZLIB = b"j"
+    def __init__(self, level: Optional[int] = None):
+        self.level = level or settings.langgraph_checkpoint_compression_level
+        self.compact = MSGPACK_AVAILABLE and ZSTD_AVAILABLE
+    def dumps(self, checkpoint: Checkpoint) -> bytes:
+        if self.compact:
+            raw = msgpack.packb(checkpoint, default=str, use_bin_type=True)
+            return self.MSGPACK_ZSTD + zstandard.ZstdCompressor(level=self.level).compress(raw)
+        raw = json.dumps(checkpoint, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return self.JSON_ZLIB + zlib.compress(raw, min(self.level, 9))
+    def loads(self, payload: bytes) -> Checkpoint:
+        payload = bytes(payload)
+        kind, body = payload[:1], payload[1:]
+        if kind == self.MSGPACK_ZSTD:
+            if not self.compact:
+                raise RuntimeError("Checkpoint is msgpack+zstd encoded but msgpack/zstandard are not installed")
+            data = msgpack.unpackb(zstandard.ZstdDecompressor().decompress(body), raw=False)
+        elif kind == self.JSON_ZLIB:
+            data = json.loads(zlib.decompress(body).decode("utf-8"))
+        else:
+            raise ValueError(f"Unknown checkpoint format: {kind!r}")
+        # Pregel обращается к версиям как к defaultdict
+        data["channel_versions"] = defaultdict(int, data.get("channel_versions", {}))
+        data["versions_seen"] = defaultdict(
+            lambda: defaultdict(int),
+            {node: defaultdict(int, seen) for node, seen in data.get("versions_seen", {}).items()}
+        )
+        return data
+class PostgresCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer поверх пула соединений SQLAlchemy. Хранит последние `history` checkpoint потока,
+    после завершения workflow остаётся только финальный.
+    """
+    at: CheckpointAt = CheckpointAt.END_OF_STEP
+    engine: Any = None
+    serializer: Any = None
+    history: int = 3
+    class Config:
+        arbitrary_types_allowed = True
+    @property
+    def config_specs(self) -> list[ConfigurableFieldSpec]:
+        return [
+            ConfigurableFieldSpec(
+                id="thread_id",
+                annotation=str,
+                name="Thread ID",
+                description=None,
+                default="",
+                is_shared=True,
+            ),
+        ]
+    def get(self, config) -> Optional[Checkpoint]:
+        thread_id = config["configurable"]["thread_id"]
+        with self.engine.connect() as conn:
+            payload = conn.execute(
+                select(WorkflowCheckpoint.payload)
+                .where(WorkflowCheckpoint.thread_id == thread_id)
+                .order_by(WorkflowCheckpoint.checkpoint_id.desc())
+                .limit(1)
+            ).scalar()
+        return self.serializer.loads(payload) if payload is not None else None
+    def put(self, config, checkpoint: Checkpoint) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        payload = self.serializer.dumps(checkpoint)
+        completed = checkpoint.get("channel_values", {}).get("current_step") == "completed"
+        keep = 1 if completed else self.history
+        with self.engine.begin() as conn:
+            conn.execute(insert(WorkflowCheckpoint).values(
+                thread_id=thread_id,
+                checkpoint_ts=checkpoint["ts"],
+                payload=payload,
+                size_bytes=len(payload)
+            ))
+            retained = (
+                select(WorkflowCheckpoint.checkpoint_id)
+                .where(WorkflowCheckpoint.thread_id == thread_id)
+                .order_by(WorkflowCheckpoint.checkpoint_id.desc())
+                .limit(keep)
+            )
+            conn.execute(
+                delete(WorkflowCheckpoint)
+                .where(WorkflowCheckpoint.thread_id == thread_id)
+                .where(WorkflowCheckpoint.checkpoint_id.not_in(retained.scalar_subquery()))
+            )
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+_fallback = None
+_fallback_until = 0.0
+def get_checkpointer() -> BaseCheckpointSaver:
+    # Один checkpointer на процесс: API и воркеры не открывают соединение на каждый запрос.
+    # MemorySaver при недоступном Postgres не кэшируется навсегда: после паузы подключение повторяется
+    global _checkpointer, _fallback, _fallback_until
+    if _checkpointer is not None:
+        return _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is not None:
+            return _checkpointer
+        if settings.langgraph_checkpoint_backend != "postgres":
+            agent_logger.warning("Using MemorySaver - checkpoints will not persist")
+            _checkpointer = SnapshotMemorySaver()
+            return _checkpointer
+        if _fallback is not None and time.monotonic() < _fallback_until:
+            return _fallback
+        try:
+            _checkpointer = _create_postgres_checkpointer()
+            _fallback = None
+            return _checkpointer
+        except Exception as e:
+            agent_logger.error(f"Error creating Postgres checkpointer: {e}", exc_info=True)
+            agent_logger.warning(f"Falling back to MemorySaver, retrying Postgres in {settings.langgraph_checkpoint_retry_interval}s")
+            _fallback = _fallback or SnapshotMemorySaver()
+            _fallback_until = time.monotonic() + settings.langgraph_checkpoint_retry_interval
+            return _fallback
+def _create_postgres_checkpointer() -> BaseCheckpointSaver:
+    if settings.langgraph_checkpoint_db:
+        from sqlalchemy import create_engine
+        engine = create_engine(
+            settings.langgraph_checkpoint_db,
+            pool_pre_ping=True,
+            pool_size=settings.langgraph_checkpoint_pool_size,
+            max_overflow=settings.langgraph_checkpoint_pool_size
+        )
+    else:
+        from shared.utils.database import engine
+    WorkflowCheckpoint.__table__.create(bind=engine, checkfirst=True)
+    return PostgresCheckpointSaver(
+        engine=engine,
+        serializer=CheckpointSerializer(),
+        history=settings.langgraph_checkpoint_history
+    )
@@ -1,18 +1,36 @@
 
 import uuid
-import asyncio
 from typing import Dict, Any
 from datetime import datetime
-import hashlib
 from shared.utils.database import get_db
-from shared.models.database import Request, TestCase
+from shared.models.database import Request
 from shared.utils.redis_client import redis_client
 from shared.utils.logger import agent_logger
+from shared.utils.async_runtime import run_coro
+from shared.utils.security_audit import security_audit_sink
+from shared.utils.test_blob_store import code_hash, store_tests, load_tests
+from shared.config.settings import settings
 from agents.reconnaissance.reconnaissance_agent import ReconnaissanceAgent
+from agents.reconnaissance.site_crawler import SiteCrawler
+from agents.reconnaissance.recon_cache import recon_cache
 from agents.generator.generator import GeneratorAgent
 from agents.validator.validator_agent import ValidatorAgent
+from agents.validator.collection_validator import CollectionValidator
 from agents.optimizer.optimizer_agent import OptimizerAgent
 from .state import WorkflowState
+from .persistence import (
+    build_coverage_rows,
+    build_test_case_rows,
+    bulk_insert_test_cases,
+    coverage_entries,
+    embed_rows,
+    flag_historical_duplicates,
+    flag_structural_duplicates,
+    index_test_cases,
+    replace_coverage
+)
+def node_timeout(node: str) -> int:
+    return settings.langgraph_node_timeouts.get(node, settings.langgraph_default_node_timeout)
 def reconnaissance_node(state: WorkflowState) -> WorkflowState:
     agent_logger.info(f"Reconnaissance step for request {state['request_id']}")
     try:
@@ -27,8 +45,34 @@ def reconnaissance_node(state: WorkflowState) -> WorkflowState:
             f"request:{state['request_id']}",
             {"status": "processing", "step": "reconnaissance", "message": "Анализ страницы..."}
         )
-        recon_agent = ReconnaissanceAgent()
-        page_structure = recon_agent.analyze_page(state["url"], timeout=90)
+        options = state.get("options", {})
+        if options.get("crawl"):
+            # Многостраничный режим: обход ссылок того же origin с объединённой картой сайта
+            crawler = SiteCrawler(
+                max_depth=options.get("crawl_depth"),
+                max_pages=options.get("crawl_max_pages")
+            )
+            analyze = lambda: crawler.crawl(state["url"], timeout=90)
+            variant = f"crawl:{crawler.max_depth}:{crawler.max_pages}"
+        else:
+            recon_agent = ReconnaissanceAgent()
+            backend = options.get("recon_backend", settings.recon_backend)
+            analyze = lambda: recon_agent.analyze(state["url"], timeout=90, backend=backend)
+            variant = f"page:{backend}"
+        html_content = None
+        if options.get("html_snapshot_key"):
+            html_content = redis_client.cache.get(options["html_snapshot_key"])
+        if html_content is not None:
+            # Загруженный HTML разбирается без браузера и без кэша
+            page_structure = ReconnaissanceAgent().analyze(state["url"], html_content=html_content)
+        else:
+            page_structure = recon_cache.get_or_analyze(
+                state["url"],
+                analyze,
+                variant=variant,
+                ttl=options.get("recon_cache_ttl"),
+                bypass=options.get("recon_cache_bypass", False)
+            )
         state["page_structure"] = page_structure
         state["current_step"] = "reconnaissance_completed"
         redis_client.publish_event(
@@ -68,21 +112,18 @@ def generation_node(state: WorkflowState) -> WorkflowState:
             {"status": "processing", "step": "generation", "message": "Генерация тестов..."}
         )
         generator = GeneratorAgent()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            tests = loop.run_until_complete(
-                generator.generate_ui_tests(
-                    url=state["url"],
-                    page_structure=state.get("page_structure", {}),
-                    requirements=state["requirements"],
-                    test_type=state["test_type"],
-                    options=state.get("options", {})
-                )
-            )
-        finally:
-            loop.close()
-        state["generated_tests"] = tests
+        tests = run_coro(
+            generator.generate_ui_tests(
+                url=state["url"],
+                page_structure=state.get("page_structure", {}),
+                requirements=state["requirements"],
+                test_type=state["test_type"],
+                options=state.get("options", {})
+            ),
+            timeout=node_timeout("generation")
+        )
+        # В state попадают только sha256 кода: checkpoint не тащит тела тестов на каждом шаге
+        state["generated_tests"] = store_tests(tests)
         state["current_step"] = "generation_completed"
         redis_client.publish_event(
             f"request:{state['request_id']}",
@@ -123,9 +164,10 @@ def validation_node(state: WorkflowState) -> WorkflowState:
         validator = ValidatorAgent()
         validated_tests = []
         validation_errors = []
-        generated_tests = state.get("generated_tests", [])
+        generated_tests = load_tests(state.get("generated_tests", []))
         agent_logger.info(f"Validating {len(generated_tests)} generated tests")
         
+        test_codes = []
         for test_code in generated_tests:
             # Обрабатываем разные форматы - может быть строка или dict
             if isinstance(test_code, dict):
@@ -133,8 +175,29 @@ def validation_node(state: WorkflowState) -> WorkflowState:
             if not test_code or not isinstance(test_code, str):
                 agent_logger.warning(f"Skipping invalid test_code format: {type(test_code)}")
                 continue
-            
-            validation_result = validator.validate(test_code, validation_level="full")
+            test_codes.append(test_code)
+        # Пакетная валидация: LLM-анализ безопасности выполняется одним запросом на весь набор
+        validation_results = validator.validate_batch(
+            test_codes,
+            validation_level="full",
+            request_id=state["request_id"]
+        )
+        # Аудит SafetyGuard пишется пакетно в фоне, не задерживая узел
+        security_audit_sink.request_flush()
+        if settings.collection_check_enabled and state.get("options", {}).get("collection_check", True):
+            # Один pytest --collect-only на весь набор: ловит ошибки импорта и отсутствующие фикстуры
+            # Импортируются только тесты, прошедшие SafetyGuard: заблокированный код не исполняется даже при сборе
+            collectable = [
+                idx for idx, result in enumerate(validation_results)
+                if not result.get("syntax_errors") and "safety_risk_level" in result and not result.get("safety_blocked")
+            ]
+            collection_results = CollectionValidator().check([test_codes[idx] for idx in collectable])
+            for idx, collection_result in zip(collectable, collection_results):
+                if collection_result["errors"]:
+                    validation_results[idx]["collection_errors"] = collection_result["errors"]
+                    validation_results[idx].setdefault("errors", []).extend(collection_result["errors"])
+                    validation_results[idx]["passed"] = False
+        for test_code, validation_result in zip(test_codes, validation_results):
             # Более гибкая логика валидации
             syntax_errors = len(validation_result.get("syntax_errors", []))
             semantic_errors = len(validation_result.get("semantic_errors", []))
@@ -176,7 +239,7 @@ def validation_node(state: WorkflowState) -> WorkflowState:
                     "semantic_errors": validation_result.get("semantic_errors", []),
                     "logic_errors": validation_result.get("logic_errors", [])
                 })
-        state["validated_tests"] = validated_tests
+        state["validated_tests"] = store_tests(validated_tests)
         state["current_step"] = "validation_completed"
         if validation_errors:
             state["validation_errors"] = validation_errors
@@ -238,35 +301,49 @@ def optimization_node(state: WorkflowState) -> WorkflowState:
             f"request:{state['request_id']}",
             {"status": "processing", "step": "optimization", "message": "Оптимизация тестов..."}
         )
-        validated_tests = state.get("validated_tests", [])
+        validated_tests = load_tests(state.get("validated_tests", []))
         options = state.get("options", {})
         optimized_tests = validated_tests
+        optimization_result = None
         if options.get("optimize", True) and len(validated_tests) > 1:
             optimizer = OptimizerAgent()
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                optimization_result = loop.run_until_complete(
-                    optimizer.optimize(
-                        tests=[{"test_id": str(uuid.uuid4()), "test_code": t["code"]} for t in validated_tests],
-                        requirements=state["requirements"],
-                        options=options
-                    )
-                )
-                optimized_tests = [
-                    {"code": t["test_code"], "validation": validated_tests[i].get("validation", {})}
-                    for i, t in enumerate(optimization_result.get("optimized_tests", []))
-                ]
-            finally:
-                loop.close()
-        state["optimized_tests"] = optimized_tests
+            # Бюджет оптимизатора короче таймаута узла: по его истечении возвращается лучший готовый результат
+            time_budget = min(
+                options.get("time_budget", settings.optimizer_time_budget),
+                node_timeout("optimization") * 0.8
+            )
+            # test_id уникален на прогон: по нему строятся ключи RediSearch и кэша LLM-сравнений
+            tests_by_id = {f"{state['request_id']}:{idx}": t for idx, t in enumerate(validated_tests)}
+            optimization_result = run_coro(
+                optimizer.optimize(
+                    tests=[
+                        {"test_id": test_id, "test_code": t["code"], "validation": t.get("validation", {})}
+                        for test_id, t in tests_by_id.items()
+                    ],
+                    requirements=state["requirements"],
+                    options={**options, "time_budget": time_budget}
+                ),
+                timeout=node_timeout("optimization")
+            )
+            # Валидация берётся у того же теста по test_id, а не по позиции в результате
+            optimized_tests = [
+                {"code": t["test_code"], "validation": tests_by_id[t["test_id"]].get("validation", {})}
+                for t in optimization_result.get("optimized_tests", [])
+            ]
+            state["coverage"] = coverage_entries(
+                optimization_result,
+                {test_id: code_hash(t["code"]) for test_id, t in tests_by_id.items()}
+            )
+        state["optimized_tests"] = store_tests(optimized_tests)
         state["current_step"] = "optimization_completed"
         agent_logger.info(
             f"Optimization completed for request {state['request_id']}: {len(optimized_tests)} tests ready to save",
             extra={
                 "request_id": state["request_id"],
                 "optimized_count": len(optimized_tests),
-                "validated_count": len(validated_tests)
+                "validated_count": len(validated_tests),
+                "stages_completed": optimization_result.get("stages_completed", []) if optimization_result else [],
+                "budget_exhausted": optimization_result.get("budget_exhausted", False) if optimization_result else False
             }
         )
         redis_client.publish_event(
@@ -281,21 +358,10 @@ def optimization_node(state: WorkflowState) -> WorkflowState:
         )
         agent_logger.info(f"Returning state from optimization_node for request {state['request_id']}")
     except Exception as e:
+        # Оптимизация не обязательна: при сбое сохраняются валидированные тесты без дедупликации
         agent_logger.error(f"Optimization error: {e}", exc_info=True)
-        state["error"] = str(e)
-        state["current_step"] = "optimization_failed"
-        # Обновляем статус в БД при ошибке
-        try:
-            with get_db() as db:
-                request = db.query(Request).filter(
-                    Request.request_id == uuid.UUID(state["request_id"])
-                ).first()
-                if request:
-                    request.status = "failed"
-                    request.error_message = str(e)
-                    db.commit()
-        except Exception as db_error:
-            agent_logger.error(f"Error updating request status: {db_error}", exc_info=True)
+        state["optimized_tests"] = state.get("validated_tests", [])
+        state["current_step"] = "optimization_skipped"
     return state
 def save_results_node(state: WorkflowState) -> WorkflowState:
     agent_logger.info(f"Saving results for request {state['request_id']} - node called")
@@ -317,7 +383,7 @@ def save_results_node(state: WorkflowState) -> WorkflowState:
             
             # КРИТИЧЕСКИ ВАЖНО: Всегда сохраняем тесты, даже если они не прошли валидацию
             # Приоритет: optimized > validated > generated
-            tests_to_save = optimized_tests if optimized_tests else (validated_tests if validated_tests else [])
+            tests_to_save = load_tests(optimized_tests if optimized_tests else (validated_tests if validated_tests else []))
             
             # Если нет оптимизированных и валидированных, но есть сгенерированные - сохраняем их
             if not tests_to_save and generated_tests:
@@ -326,11 +392,8 @@ def save_results_node(state: WorkflowState) -> WorkflowState:
                     extra={"request_id": state["request_id"], "generated_count": len(generated_tests)}
                 )
                 # Сохраняем невалидированные тесты как есть
-                # generated_tests может быть List[str] (коды тестов) или List[Dict]
-                if generated_tests and isinstance(generated_tests[0], str):
-                    tests_to_save = [{"code": code, "validation": {"passed": False, "score": 0}} for code in generated_tests]
-                else:
-                    tests_to_save = [{"code": t.get("code", t) if isinstance(t, dict) else str(t), "validation": {"passed": False, "score": 0}} for t in generated_tests]
+                # load_tests принимает и ссылки на blob, и старый формат (строки кода или dict с "code")
+                tests_to_save = [{"code": t.get("code", ""), "validation": {"passed": False, "score": 0}} for t in load_tests(generated_tests)]
             
             # КРИТИЧЕСКАЯ ПРОВЕРКА: Если все еще нет тестов для сохранения - это ошибка
             if not tests_to_save:
@@ -348,99 +411,21 @@ def save_results_node(state: WorkflowState) -> WorkflowState:
                 # НЕ меняем статус на failed, но логируем критическую ошибку
                 # Попытаемся сохранить хотя бы что-то, чтобы не было 0 тестов
             
-            saved_tests = []
-            for test_data in tests_to_save:
-                # Обрабатываем разные форматы данных
-                if isinstance(test_data, str):
-                    test_code = test_data
-                    validation = {"passed": False}
-                elif isinstance(test_data, dict):
-                    test_code = test_data.get("code", "")
-                    validation = test_data.get("validation", {"passed": False})
-                else:
-                    agent_logger.warning(f"Unexpected test_data format: {type(test_data)}")
-                    continue
-                
-                if not test_code or not test_code.strip():
-                    agent_logger.warning(f"Skipping empty test code for test {test_name}")
-                    continue
-                
-                # Дополнительная проверка: если тест слишком короткий (меньше 50 символов) - это подозрительно
-                if len(test_code.strip()) < 50:
-                    agent_logger.warning(f"Test code too short ({len(test_code)} chars), but saving anyway: {test_name}")
-                    # Все равно сохраняем, но с предупреждением
-                
-                code_hash = hashlib.sha256(test_code.encode()).hexdigest()
-                test_name = "Test"
-                if "def test_" in test_code:
-                    import re
-                    match = re.search(r'def\s+(test_\w+)', test_code)
-                    if match:
-                        test_name = match.group(1)
-                
-                # Определяем тип теста: manual если есть @allure.manual, иначе automated
-                is_manual = "@allure.manual" in test_code
-                has_playwright = any(keyword in test_code for keyword in [
-                    "page.goto", "page.click", "page.fill", "page.locator",
-                    "expect(", "page.wait_for", "page.get_by", "page: Page"
-                ])
-                # Если есть @allure.manual - это manual тест, иначе проверяем наличие Playwright кода
-                actual_test_type = "manual" if is_manual else ("automated" if has_playwright else "automated")
-                
-                # Логика статуса: passed если нет синтаксических ошибок
-                # Тесты с синтаксически правильным кодом должны быть passed
-                syntax_errors = len(validation.get("syntax_errors", []))
-                
-                # Проверяем наличие декораторов (простая проверка наличия строки)
-                has_feature = "@allure.feature" in test_code
-                has_story = "@allure.story" in test_code
-                has_title = "@allure.title" in test_code
-                has_decorators = has_feature and has_story and has_title
-                
-                score = validation.get("score", 0)
-                passed = validation.get("passed", False)
-                
-                # УПРОЩЕННАЯ ЛОГИКА: Тест считается passed если:
-                # 1. Нет синтаксических ошибок (критично!)
-                # 2. И (есть хотя бы один декоратор ИЛИ score >= 30 ИЛИ passed = True)
-                # Основная цель - тесты должны работать, warnings не критичны
-                is_passed = (
-                    syntax_errors == 0 and
-                    (has_feature or has_story or has_title or score >= 30 or passed)
-                )
-                
-                validation_status = "passed" if is_passed else "warning"
-                
-                agent_logger.info(
-                    f"[STATUS] Test '{test_name}' status determination",
-                    extra={
-                        "test_name": test_name,
-                        "syntax_errors": syntax_errors,
-                        "has_feature": has_feature,
-                        "has_story": has_story,
-                        "has_title": has_title,
-                        "has_decorators": has_decorators,
-                        "score": score,
-                        "passed": passed,
-                        "is_passed": is_passed,
-                        "validation_status": validation_status
-                    }
-                )
-                
-                test_case = TestCase(
-                    request_id=request.request_id,
-                    test_name=test_name,
-                    test_code=test_code,
-                    test_type=actual_test_type,
-                    code_hash=code_hash,
-                    validation_status=validation_status,
-                    validation_issues=validation.get("errors", [])
-                )
-                db.add(test_case)
-                saved_tests.append({
-                    "test_id": str(test_case.test_id),
-                    "test_name": test_name
-                })
+            rows = build_test_case_rows(request.request_id, tests_to_save)
+            index_matrix = None
+            # Структурные дубликаты отсеиваются индексированным запросом по ast_hash, эмбеддинги - только для остальных
+            flag_structural_duplicates(rows, db, state.get("url"))
+            index_rows = []
+            if settings.optimizer_index_enabled:
+                try:
+                    index_rows, index_matrix = embed_rows([row for row in rows if not row["is_duplicate"]])
+                    flag_historical_duplicates(index_rows, index_matrix, db)
+                except Exception as e:
+                    agent_logger.warning(f"Historical duplicate check skipped: {e}")
+            bulk_insert_test_cases(db, rows)
+            if state.get("coverage"):
+                replace_coverage(db, request.request_id, build_coverage_rows(request.request_id, state["coverage"], rows))
+            saved_tests = [{"test_id": str(row["test_id"]), "test_name": row["test_name"]} for row in rows]
             
             agent_logger.info(f"Saved {len(saved_tests)} tests to database")
             
@@ -483,22 +468,34 @@ def save_results_node(state: WorkflowState) -> WorkflowState:
                 "tests_optimized": len(optimized_tests),
                 "test_type": state["test_type"]
             }
+            if state.get("coverage"):
+                result_summary["coverage_score"] = round(
+                    sum(1 for entry in state["coverage"] if entry["tests"]) / len(state["coverage"]), 4
+                )
             request.result_summary = result_summary
+            notify_email = None
+            if request.user_id:
+                from shared.models.database import User
+                user = db.query(User).filter(User.user_id == request.user_id).first()
+                notify_email = user.email if user else None
+            db.commit()
+        if index_matrix is not None:
+            try:
+                index_test_cases(index_rows, index_matrix)
+            except Exception as e:
+                agent_logger.warning(f"Failed to update vector index: {e}")
+        # Письмо отправляется после commit: SMTP не держит транзакцию открытой
+        if notify_email:
             try:
                 from shared.utils.email_service import email_service
-                from shared.models.database import User
-                if request.user_id:
-                    user = db.query(User).filter(User.user_id == request.user_id).first()
-                    if user and user.email:
-                        email_service.send_generation_completed(
-                            to=user.email,
-                            request_id=str(request.request_id),
-                            tests_count=len(saved_tests),
-                            status="completed"
-                        )
+                email_service.send_generation_completed(
+                    to=notify_email,
+                    request_id=state["request_id"],
+                    tests_count=len(saved_tests),
+                    status="completed"
+                )
             except Exception as e:
                 agent_logger.warning(f"Failed to send email notification: {e}")
-            db.commit()
         state["current_step"] = "completed"
         redis_client.publish_event(
             f"request:{state['request_id']}",
@@ -0,0 +1,225 @@
+import ast
+import hashlib
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import delete, insert
+from shared.config.settings import settings
+from shared.models.database import CoverageAnalysis, TestCase
+from shared.utils.async_runtime import run_coro
+from shared.utils.logger import agent_logger
+from shared.utils.ast_fingerprint import canonical_ast_hash
+from agents.optimizer.embeddings import embed_texts_with_status, test_embedding_text
+from agents.optimizer.similarity import normalize_embeddings
+from agents.optimizer.vector_index import test_vector_index
+from shared.utils.test_case_repository import test_case_repository
+TEST_NAME_PATTERN = re.compile(r"def\s+(test_\w+)")
+INSERT_CHUNK_SIZE = 1000
+def build_test_case_row(request_id: uuid.UUID, test_code: str, validation: Dict[str, Any]) -> Dict[str, Any]:
+    # Все производные поля TestCase считаются за один проход по коду теста
+    try:
+        tree = ast.parse(test_code)
+    except (SyntaxError, ValueError):
+        tree = None
+    test_name = None
+    if tree is not None:
+        test_name = next(
+            (node.name for node in ast.walk(tree)
+             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test_")),
+            None
+        )
+    if test_name is None:
+        match = TEST_NAME_PATTERN.search(test_code)
+        test_name = match.group(1) if match else "Test"
+    # manual если есть @allure.manual, иначе automated
+    test_type = "manual" if "@allure.manual" in test_code else "automated"
+    has_allure = any(marker in test_code for marker in ("@allure.feature", "@allure.story", "@allure.title"))
+    syntax_errors = len(validation.get("syntax_errors", []))
+    collection_errors = validation.get("collection_errors", [])
+    # Тест passed, если нет синтаксических ошибок и ошибок сбора, и (есть allure-декоратор ИЛИ score >= 30 ИЛИ passed)
+    is_passed = (
+        syntax_errors == 0 and
+        not collection_errors and
+        (has_allure or validation.get("score", 0) >= 30 or validation.get("passed", False))
+    )
+    # Канонизация меняет дерево на месте, поэтому считается последней
+    return {
+        "test_id": uuid.uuid4(),
+        "request_id": request_id,
+        "test_name": test_name[:255],
+        "test_code": test_code,
+        "test_type": test_type,
+        "code_hash": hashlib.sha256(test_code.encode()).hexdigest(),
+        "ast_hash": canonical_ast_hash(tree),
+        "validation_status": "failed" if collection_errors or validation.get("safety_blocked") else ("passed" if is_passed else "warning"),
+        "validation_issues": validation.get("errors", []),
+        # Вердикт SafetyGuard: без него (проверка не выполнялась) тест не исполняется
+        "safety_risk_level": validation.get("safety_risk_level", "UNCHECKED"),
+        "semantic_embedding": None
+    }
+def build_test_case_rows(request_id: uuid.UUID, tests: List[Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for test_data in tests:
+        if isinstance(test_data, str):
+            test_code, validation = test_data, {"passed": False}
+        elif isinstance(test_data, dict):
+            test_code, validation = test_data.get("code", ""), test_data.get("validation") or {"passed": False}
+        else:
+            agent_logger.warning(f"Unexpected test_data format: {type(test_data)}")
+            continue
+        if not test_code or not test_code.strip():
+            agent_logger.warning("Skipping empty test code")
+            continue
+        if len(test_code.strip()) < 50:
+            agent_logger.warning(f"Test code too short ({len(test_code)} chars), but saving anyway")
+        rows.append(build_test_case_row(request_id, test_code, validation))
+    return rows
+def bulk_insert_test_cases(db, rows: List[Dict[str, Any]], chunk_size: int = INSERT_CHUNK_SIZE) -> int:
+    # Один многострочный INSERT на чанк вместо db.add() на каждый тест; test_id генерируется заранее
+    for start in range(0, len(rows), chunk_size):
+        db.execute(insert(TestCase).values(rows[start:start + chunk_size]))
+    return len(rows)
+def flag_structural_duplicates(rows: List[Dict[str, Any]], db=None, url: Optional[str] = None) -> int:
+    """
+    Точные структурные дубликаты по каноническому ast_hash - внутри запроса и против истории
+    тестов того же url, одним индексированным запросом, до эмбеддингов и LLM. Возвращает число помеченных строк.
+    """
+    for row in rows:
+        row.update({"is_duplicate": False, "duplicate_of": None, "similarity_score": None})
+    hashes = [row["ast_hash"] for row in rows if row.get("ast_hash")]
+    if not hashes:
+        return 0
+    originals = {}
+    if db is not None:
+        try:
+            # SAVEPOINT: ошибка запроса по истории не должна ломать транзакцию сохранения,
+            # дедупликация внутри запроса выполняется в любом случае
+            with db.begin_nested():
+                originals = test_case_repository.find_by_ast_hashes(db, hashes, url)
+        except Exception as e:
+            agent_logger.warning(f"Structural duplicate history lookup skipped: {e}")
+    flagged = 0
+    for row in rows:
+        value = row.get("ast_hash")
+        if not value:
+            continue
+        if value in originals:
+            row.update({"is_duplicate": True, "duplicate_of": originals[value], "similarity_score": 1.0})
+            flagged += 1
+        else:
+            originals[value] = row["test_id"]
+    if flagged:
+        agent_logger.info(f"Flagged {flagged}/{len(rows)} tests as structural duplicates")
+    return flagged
+def embed_rows(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray]]:
+    """
+    Нормализованные эмбеддинги строк. Строки с хэш-fallback отбрасываются: их semantic_embedding
+    остаётся NULL (его дозаполнит rebuild_vector_index.py), и в поиск дубликатов они не попадают.
+    """
+    if not rows:
+        return [], None
+    embeddings, fallbacks = run_coro(embed_texts_with_status([test_embedding_text(row["test_name"], row["test_code"]) for row in rows]))
+    embedded = [(row, embedding) for row, embedding, fallback in zip(rows, embeddings, fallbacks) if not fallback]
+    if len(embedded) < len(rows):
+        agent_logger.warning(f"Embeddings unavailable for {len(rows) - len(embedded)}/{len(rows)} tests, semantic_embedding left empty")
+    if not embedded:
+        return [], None
+    rows = [row for row, _ in embedded]
+    matrix = normalize_embeddings([embedding for _, embedding in embedded])
+    if test_case_repository.embedding_dim:
+        # В semantic_embedding пишутся только подходящие по размерности колонки
+        accepted = test_case_repository.accepts(matrix[0])
+        if not accepted:
+            agent_logger.warning(
+                f"Embedding dimension {matrix.shape[1]} does not match semantic_embedding "
+                f"({test_case_repository.embedding_dim}), column left empty"
+            )
+        for row, embedding in zip(rows, matrix):
+            row["semantic_embedding"] = embedding.tolist() if accepted else None
+    return rows, matrix
+def flag_historical_duplicates(
+    rows: List[Dict[str, Any]],
+    matrix: Optional[np.ndarray],
+    db=None,
+    threshold: Optional[float] = None
+):
+    """
+    Сверяет новые тесты со всеми ранее сохранёнными и заполняет is_duplicate/duplicate_of/similarity_score.
+    Поиск идёт через pgvector (HNSW) или через локальный mmap-индекс - по настройке optimizer_duplicate_backend.
+    """
+    threshold = threshold or settings.optimizer_duplicate_threshold
+    for row in rows:
+        row.update({"is_duplicate": False, "duplicate_of": None, "similarity_score": None})
+    if matrix is None:
+        return
+    if settings.optimizer_duplicate_backend == "pgvector":
+        # SAVEPOINT: ошибка векторного запроса не должна ломать транзакцию сохранения
+        with db.begin_nested():
+            matches = test_case_repository.find_duplicates(db, matrix, threshold)
+    else:
+        matches = [
+            (uuid.UUID(hits[0][0]), hits[0][1]) if hits and hits[0][1] >= threshold else None
+            for hits in test_vector_index.search(matrix, k=1)
+        ]
+    flagged = 0
+    for row, match in zip(rows, matches):
+        if match:
+            row.update({
+                "is_duplicate": True,
+                "duplicate_of": match[0],
+                "similarity_score": round(min(match[1], 1.0), 4)
+            })
+            flagged += 1
+    if flagged:
+        agent_logger.info(f"Flagged {flagged}/{len(rows)} tests as duplicates of stored tests")
+def index_test_cases(rows: List[Dict[str, Any]], matrix: Optional[np.ndarray]):
+    # В индекс попадают только оригиналы; вызывается после commit, чтобы не ссылаться на откаченные строки
+    if matrix is None or settings.optimizer_duplicate_backend != "index":
+        return
+    keep = [idx for idx, row in enumerate(rows) if not row.get("is_duplicate")]
+    if keep:
+        test_vector_index.add([str(rows[idx]["test_id"]) for idx in keep], matrix[keep])
+def coverage_entries(coverage_result: Dict[str, Any], code_hashes: Dict[str, str]) -> List[Dict[str, Any]]:
+    # Для WorkflowState: тесты покрытия задаются хэшами кода, test_id появятся только при сохранении
+    return [
+        {
+            "requirement": detail["text"],
+            "score": detail["score"],
+            "quality": detail["quality"],
+            "tests": [
+                [code_hashes[test_id], score]
+                for test_id, score in zip(detail["tests"], detail["scores"])
+                if test_id in code_hashes
+            ]
+        }
+        for detail in coverage_result.get("details", {}).values()
+    ]
+def build_coverage_rows(request_id: uuid.UUID, coverage: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    test_ids = {}
+    for row in rows:
+        test_ids.setdefault(row["code_hash"], str(row["test_id"]))
+    coverage_rows = []
+    for idx, entry in enumerate(coverage):
+        scores = {test_ids[digest]: score for digest, score in entry.get("tests", []) if digest in test_ids}
+        covering = list(scores)
+        coverage_rows.append({
+            "coverage_id": uuid.uuid4(),
+            "request_id": request_id,
+            "requirement_text": entry["requirement"],
+            "requirement_index": idx,
+            "is_covered": bool(covering),
+            "covering_tests": covering,
+            "coverage_count": len(covering),
+            "coverage_score": round(float(entry.get("score", 0.0)), 4),
+            "coverage_details": {"quality": entry.get("quality"), "test_scores": scores},
+            "has_gap": not covering,
+            "gap_description": None if covering else f"Отсутствуют тесты для: {entry['requirement']}"
+        })
+    return coverage_rows
+def replace_coverage(db, request_id: uuid.UUID, coverage_rows: List[Dict[str, Any]]) -> int:
+    # Повторный прогон узла перезаписывает покрытие запроса, а не дублирует его
+    db.execute(delete(CoverageAnalysis).where(CoverageAnalysis.request_id == request_id))
+    if coverage_rows:
+        db.execute(insert(CoverageAnalysis).values(coverage_rows))
+    return len(coverage_rows)
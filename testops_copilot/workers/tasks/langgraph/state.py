@@ -7,9 +7,12 @@ class WorkflowState(TypedDict, total=False):
     test_type: str
     options: dict
     page_structure: Optional[dict]
+    # Записи тестов вида {"code_ref": sha256, ...}; код лежит в test_blob_store
     generated_tests: list
     validated_tests: list
     optimized_tests: list
+    # Покрытие требований из optimization_node: тесты заданы хэшами кода
+    coverage: Optional[List[Dict[str, Any]]]
     current_step: str
     error: Optional[str]
     retry_count: int
@@ -1,68 +1,56 @@
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
 from datetime import datetime
+import threading
 import uuid
 try:
     from langgraph.graph import StateGraph, END
-    try:
-        from langgraph.checkpoint.postgres import PostgresSaver
-    except ImportError:
-        try:
-            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver as PostgresSaver
-        except ImportError:
-            from langgraph.checkpoint.memory import MemorySaver as PostgresSaver
+    from .checkpoint import get_checkpointer
     LANGGRAPH_AVAILABLE = True
 except ImportError:
     LANGGRAPH_AVAILABLE = False
     StateGraph = None
     END = None
-    PostgresSaver = None
+    get_checkpointer = None
 from shared.utils.database import get_db
 from shared.models.database import Request
 from shared.config.settings import settings
 from shared.utils.redis_client import redis_client
 from shared.utils.logger import agent_logger
+from shared.utils.async_runtime import DeadlineExceeded, deadline, deadline_exceeded
 from .state import WorkflowState
 from .nodes import (
+    node_timeout,
     reconnaissance_node,
     generation_node,
     validation_node,
-
+    optimization_node,
     save_results_node,
     should_retry_generation
 )
+DEGRADABLE_NODES = {"optimization"}
 class LangGraphWorkflow:
     def __init__(self):
         if not LANGGRAPH_AVAILABLE:
             raise ImportError("LangGraph is not installed. Install with: pip install langgraph langchain")
-        try:
-            if hasattr(PostgresSaver, 'from_conn_string'):
-                self.checkpointer = PostgresSaver.from_conn_string(settings.langgraph_checkpoint)
-            elif hasattr(PostgresSaver, 'from_conn'):
-                from sqlalchemy import create_engine
-                engine = create_engine(settings.langgraph_checkpoint)
-                self.checkpointer = PostgresSaver(engine)
-            else:
-                self.checkpointer = PostgresSaver()
-                agent_logger.warning("Using MemorySaver - checkpoints will not persist")
-        except Exception as e:
-            agent_logger.error(f"Error creating checkpointer: {e}", exc_info=True)
-            try:
-                from langgraph.checkpoint.memory import MemorySaver
-                self.checkpointer = MemorySaver()
-                agent_logger.warning("Falling back to MemorySaver")
-            except:
-                raise ImportError("Cannot create checkpointer. Install langgraph-checkpoint or langgraph.")
+        self.checkpointer = get_checkpointer()
+        # Блокировка потока продлевается, пока жива попытка; ключи защиты узлов живут дольше всей попытки
+        self.lock_ttl = settings.langgraph_lock_ttl
+        self.node_guard_ttl = sum(settings.langgraph_node_timeouts.values()) + 300
+        self._running_nodes: Dict[str, Set[threading.Event]] = {}
+        self._running_lock = threading.Lock()
         self.graph = self._build_graph()
         self.app = self.graph.compile(checkpointer=self.checkpointer)
+        # Внешний предел на шаг графа; собственные дедлайны узлов короче
+        self.app.step_timeout = max(settings.langgraph_node_timeouts.values(), default=settings.langgraph_default_node_timeout) + 60
     def _build_graph(self) -> StateGraph:
         workflow = StateGraph(WorkflowState)
-        workflow.add_node("reconnaissance", reconnaissance_node)
-        workflow.add_node("generation", generation_node)
-        workflow.add_node("validation", validation_node)
-        # ОПТИМИЗАЦИЯ УБРАНА - вызывает проблемы с зависанием
-        # workflow.add_node("optimization", optimization_node)
-        workflow.add_node("save_results", save_results_node)
+        workflow.add_node("reconnaissance", self._guarded("reconnaissance", reconnaissance_node))
+        workflow.add_node("generation", self._guarded("generation", generation_node))
+        workflow.add_node("validation", self._guarded("validation", validation_node))
+        # Оптимизатор ограничен бюджетом времени и возвращает частичный результат вместо зависания
+        workflow.add_node("optimization", self._guarded("optimization", optimization_node))
+        workflow.add_node("save_results", self._guarded("save_results", save_results_node))
         workflow.set_entry_point("reconnaissance")
         workflow.add_edge("reconnaissance", "generation")
         workflow.add_edge("generation", "validation")
@@ -71,10 +59,10 @@ class LangGraphWorkflow:
             should_retry_generation,
             {
                 "retry": "generation",
-                "continue": "save_results"  # Пропускаем оптимизацию, сразу сохраняем
+                "continue": "optimization"
             }
         )
-        # workflow.add_edge("optimization", "save_results")  # Убрано
+        workflow.add_edge("optimization", "save_results")
         workflow.add_edge("save_results", END)
         return workflow
     def run_workflow(
@@ -112,124 +100,9 @@ class LangGraphWorkflow:
             "retry_count": 0
         }
         try:
-            config = {"configurable": {"thread_id": thread_id}}
-            # Используем stream для отслеживания прогресса и предотвращения зависаний
-            try:
-                final_state = None
-                last_node = None
-                nodes_visited = []
-                
-                # УПРОЩЕННАЯ ВЕРСИЯ: используем stream напрямую с таймаутом через invoke
-                # Stream может зависать, поэтому используем invoke с таймаутом
-                agent_logger.info(f"Starting workflow stream for {request_id}")
-                
-                # Пытаемся использовать stream, но с ограничением по времени
-                import signal
-                import threading
-                
-                stream_completed = threading.Event()
-                stream_error = [None]
-                final_state_from_stream = [None]
-                
-                def run_stream():
-                    try:
-                        for event in self.app.stream(initial_state, config):
-                            for node_name, node_output in event.items():
-                                last_node = node_name
-                                nodes_visited.append(node_name)
-                                if node_output and isinstance(node_output, dict):
-                                    current_step = node_output.get("current_step", "")
-                                    if current_step:
-                                        agent_logger.info(
-                                            f"Workflow progress for {request_id}: {node_name} -> {current_step}",
-                                            extra={"request_id": request_id, "node": node_name, "step": current_step}
-                                        )
-                                    final_state_from_stream[0] = node_output
-                                    # Публикуем прогресс в Redis
-                                    redis_client.publish_event(
-                                        f"request:{request_id}",
-                                        {"status": "processing", "step": current_step, "node": node_name}
-                                    )
-                        stream_completed.set()
-                    except Exception as e:
-                        stream_error[0] = e
-                        stream_completed.set()
-                
-                # Запускаем stream в отдельном потоке
-                stream_thread = threading.Thread(target=run_stream, daemon=True)
-                stream_thread.start()
-                
-                # Ждем завершения с таймаутом 10 минут
-                if stream_completed.wait(timeout=600):
-                    if stream_error[0]:
-                        raise stream_error[0]
-                    final_state = final_state_from_stream[0]
-                else:
-                    # Таймаут - используем invoke как fallback
-                    agent_logger.warning(f"Stream timeout for {request_id}, using invoke")
-                    final_state = self.app.invoke(initial_state, config)
-                
-                agent_logger.info(f"Stream completed for {request_id}, nodes_visited={nodes_visited}, last_node={last_node}, final_step={final_state.get('current_step') if final_state else 'None'}")
-                
-                # Если stream завершился, но не дошли до save_results, используем invoke как fallback
-                if "save_results" not in nodes_visited:
-                    agent_logger.warning(f"Stream did not reach save_results for {request_id}, using invoke as fallback. Nodes visited: {nodes_visited}")
-                    # Пытаемся получить финальное состояние через invoke с таймаутом
-                    import signal
-                    def timeout_handler(signum, frame):
-                        raise TimeoutError("Workflow invoke timeout")
-                    signal.signal(signal.SIGALRM, timeout_handler)
-                    signal.alarm(300)  # 5 минут таймаут
-                    try:
-                        final_state = self.app.invoke(initial_state, config)
-                        signal.alarm(0)  # Отменяем таймаут
-                    except TimeoutError:
-                        agent_logger.error(f"Workflow invoke timeout for {request_id}")
-                        raise
-            except Exception as stream_e:
-                agent_logger.error(f"Workflow stream error: {stream_e}", exc_info=True)
-                # Если stream упал, пытаемся получить финальное состояние через invoke
-                try:
-                    final_state = self.app.invoke(initial_state, config)
-                except Exception as invoke_e:
-                    agent_logger.error(f"Workflow invoke also failed: {invoke_e}", exc_info=True)
-                    raise
-            
-            agent_logger.info(
-                f"Workflow completed for request {request_id}",
-                extra={"thread_id": thread_id, "step": final_state.get("current_step") if final_state else "unknown"}
-            )
-            return {
-                "request_id": request_id,
-                "thread_id": thread_id,
-                "status": "completed",
-                "step": final_state.get("current_step") if final_state else "unknown"
-            }
+            return self._execute(request_id, thread_id, initial_state)
         except Exception as e:
-            agent_logger.error(f"Workflow error: {e}", exc_info=True)
-            with get_db() as db:
-                request = db.query(Request).filter(Request.request_id == uuid.UUID(request_id)).first()
-                if request:
-                    request.status = "failed"
-                    request.error_message = str(e)
-                    try:
-                        from shared.utils.email_service import email_service
-                        from shared.models.database import User
-                        if request.user_id:
-                            user = db.query(User).filter(User.user_id == request.user_id).first()
-                            if user and user.email:
-                                email_service.send_error_notification(
-                                    to=user.email,
-                                    request_id=str(request.request_id),
-                                    error_message=str(e)
-                                )
-                    except Exception as email_error:
-                        agent_logger.warning(f"Failed to send error email notification: {email_error}")
-                    db.commit()
-            redis_client.publish_event(
-                f"request:{request_id}",
-                {"status": "failed", "error": str(e)}
-            )
+            self._mark_failed(request_id, e)
             raise
     def resume_workflow(self, request_id: str) -> Dict[str, Any]:
         # Сохраняем thread_id до закрытия сессии, чтобы избежать ошибки "not bound to a Session"
@@ -243,45 +116,61 @@ class LangGraphWorkflow:
             # Сохраняем значение атрибута до закрытия сессии
             thread_id = request.langgraph_thread_id
         agent_logger.info(f"Resuming workflow for request {request_id}, thread_id: {thread_id}")
-        config = {"configurable": {"thread_id": thread_id}}
         try:
-            # Используем checkpointer для получения состояния
-            if hasattr(self.checkpointer, 'get'):
-                try:
-                    state = self.checkpointer.get(config)
-                except Exception as e:
-                    agent_logger.warning(f"Error getting checkpoint for thread_id {thread_id}: {e}. Starting new workflow.")
-                    state = None
-                if not state:
-                    # Если checkpoint не найден, начинаем workflow заново
-                    agent_logger.warning(f"No checkpoint found for thread_id {thread_id}. Starting new workflow instead of resuming.")
-                    raise ValueError(f"No checkpoint found for thread_id {thread_id}. Please start a new workflow instead.")
-                # Получаем последнее состояние из checkpoint
-                if hasattr(state, 'values'):
-                    current_state = state.values
-                elif isinstance(state, dict) and 'values' in state:
-                    current_state = state['values']
-                elif isinstance(state, dict):
-                    current_state = state
-                else:
-                    raise ValueError(f"Invalid checkpoint state format for thread_id {thread_id}")
-            elif hasattr(self.app, 'get_state'):
-                # Fallback на старый API, если доступен
-                state = self.app.get_state(config)
-                if not state or not state.values:
-                    raise ValueError(f"No checkpoint found for thread_id {thread_id}")
-                current_state = state.values
-            else:
-                raise ValueError(f"Cannot get state: checkpointer or app.get_state not available")
+            if not self._load_checkpoint(thread_id):
+                raise ValueError(f"No checkpoint found for thread_id {thread_id}. Please start a new workflow instead.")
             with get_db() as db:
                 request = db.query(Request).filter(Request.request_id == uuid.UUID(request_id)).first()
                 if request:
                     request.status = "started"
                     db.commit()
-            final_state = self.app.invoke(current_state, config)
+            return self._execute(request_id, thread_id, None)
+        except Exception as e:
+            agent_logger.error(f"Resume workflow error: {e}", exc_info=True)
+            self._mark_failed(request_id, e)
+            raise
+    def _execute(self, request_id: str, thread_id: str, initial_state: Optional[WorkflowState]) -> Dict[str, Any]:
+        # Единственный путь исполнения: если для thread_id есть checkpoint, продолжаем с него
+        # (stream(None)) - завершённые узлы повторно не запускаются
+        lock_key = f"workflow:lock:{thread_id}"
+        lock_token = str(uuid.uuid4())
+        if not self._acquire_lock(lock_key, lock_token):
+            raise RuntimeError(f"Workflow for thread {thread_id} is already running")
+        heartbeat = self._renew_lock(lock_key, lock_token)
+        try:
+            checkpoint = self._load_checkpoint(thread_id)
+            if checkpoint:
+                step = checkpoint.get("channel_values", {}).get("current_step")
+                if step == "completed":
+                    agent_logger.info(f"Workflow for {request_id} already completed, skipping", extra={"thread_id": thread_id})
+                    return {"request_id": request_id, "thread_id": thread_id, "status": "completed", "step": step}
+                agent_logger.info(f"Resuming workflow {request_id} from checkpoint (step={step})", extra={"thread_id": thread_id})
+                initial_state = None
+            config = {"configurable": {"thread_id": thread_id, "attempt_id": lock_token}}
+            final_state = None
+            nodes_visited = []
+            agent_logger.info(f"Starting workflow stream for {request_id}")
+            for event in self.app.stream(initial_state, config):
+                for node_name, node_output in event.items():
+                    if node_name == END:
+                        continue
+                    nodes_visited.append(node_name)
+                    if node_output and isinstance(node_output, dict):
+                        final_state = node_output
+                        current_step = node_output.get("current_step", "")
+                        agent_logger.info(
+                            f"Workflow progress for {request_id}: {node_name} -> {current_step}",
+                            extra={"request_id": request_id, "node": node_name, "step": current_step}
+                        )
+                        redis_client.publish_event(
+                            f"request:{request_id}",
+                            {"status": "processing", "step": current_step, "node": node_name}
+                        )
+            if "save_results" not in nodes_visited:
+                raise RuntimeError(f"Workflow stopped before save_results (nodes visited: {nodes_visited})")
             agent_logger.info(
-                f"Workflow resumed and completed for request {request_id}",
-                extra={"thread_id": thread_id, "step": final_state.get("current_step") if final_state else "unknown"}
+                f"Workflow completed for request {request_id}",
+                extra={"thread_id": thread_id, "nodes_visited": nodes_visited, "step": final_state.get("current_step") if final_state else "unknown"}
             )
             return {
                 "request_id": request_id,
@@ -289,29 +178,108 @@ class LangGraphWorkflow:
                 "status": "completed",
                 "step": final_state.get("current_step") if final_state else "unknown"
             }
+        finally:
+            self._release_after_nodes(lock_key, lock_token, heartbeat)
+    def _load_checkpoint(self, thread_id: str):
+        try:
+            return self.checkpointer.get({"configurable": {"thread_id": thread_id}})
         except Exception as e:
-            agent_logger.error(f"Resume workflow error: {e}", exc_info=True)
-            with get_db() as db:
-                request = db.query(Request).filter(Request.request_id == uuid.UUID(request_id)).first()
-                if request:
-                    request.status = "failed"
-                    request.error_message = str(e)
-                    try:
-                        from shared.utils.email_service import email_service
-                        from shared.models.database import User
-                        if request.user_id:
-                            user = db.query(User).filter(User.user_id == request.user_id).first()
-                            if user and user.email:
-                                email_service.send_error_notification(
-                                    to=user.email,
-                                    request_id=str(request.request_id),
-                                    error_message=str(e)
-                                )
-                    except Exception as email_error:
-                        agent_logger.warning(f"Failed to send error email notification: {email_error}")
-                    db.commit()
-            redis_client.publish_event(
-                f"request:{request_id}",
-                {"status": "failed", "error": str(e)}
-            )
-            raise
\ No newline at end of file
+            agent_logger.warning(f"Error getting checkpoint for thread_id {thread_id}: {e}")
+            return None
+    def _guarded(self, name: str, node):
+        # Платный узел (LLM, браузер) выполняется не более одного раза за попытку:
+        # ключ включает attempt_id запуска и retry_count цикла перегенерации
+        def run(state: WorkflowState, config) -> WorkflowState:
+            configurable = config.get("configurable", {})
+            key = f"workflow:node:{configurable.get('thread_id')}:{configurable.get('attempt_id')}:{name}:{state.get('retry_count', 0)}"
+            try:
+                first_run = redis_client.cache.set(key, "1", nx=True, ex=self.node_guard_ttl)
+            except Exception as e:
+                agent_logger.warning(f"Node guard unavailable for {name}: {e}")
+                first_run = True
+            if not first_run:
+                raise RuntimeError(f"Node {name} already executed in attempt {configurable.get('attempt_id')}")
+            # step_timeout графа лишь перестаёт ждать поток узла, поэтому попытка помнит свои живые узлы,
+            # а собственный дедлайн отменяет корутины узла (браузер, LLM) по истечении его таймаута
+            done = threading.Event()
+            attempt_id = configurable.get("attempt_id")
+            with self._running_lock:
+                self._running_nodes.setdefault(attempt_id, set()).add(done)
+            try:
+                with deadline(node_timeout(name)):
+                    result = node(state)
+                    # Результат, собранный после дедлайна, мог пропустить проверки (LLM SafetyGuard);
+                    # оптимизация сама откатывается к валидированным тестам и не обрывает прогон
+                    if deadline_exceeded() and name not in DEGRADABLE_NODES:
+                        raise DeadlineExceeded(f"Node {name} exceeded its {node_timeout(name)}s deadline")
+                    return result
+            finally:
+                with self._running_lock:
+                    self._running_nodes.get(attempt_id, set()).discard(done)
+                done.set()
+        run.__name__ = f"{name}_node"
+        return run
+    def _acquire_lock(self, key: str, token: str) -> bool:
+        try:
+            return bool(redis_client.cache.set(key, token, nx=True, ex=self.lock_ttl))
+        except Exception as e:
+            agent_logger.warning(f"Workflow lock unavailable, running without it: {e}")
+            return True
+    def _renew_lock(self, key: str, token: str) -> threading.Event:
+        stop = threading.Event()
+        def renew():
+            while not stop.wait(self.lock_ttl / 3):
+                try:
+                    if redis_client.cache.get(key) != token:
+                        return
+                    redis_client.cache.expire(key, self.lock_ttl)
+                except Exception as e:
+                    agent_logger.warning(f"Failed to renew workflow lock {key}: {e}")
+        threading.Thread(target=renew, name=f"lock-renew-{key}", daemon=True).start()
+        return stop
+    def _release_after_nodes(self, key: str, token: str, heartbeat: threading.Event):
+        # Блокировка снимается только после выхода потоков узлов: иначе повтор задачи
+        # запустил бы тот же платный узел параллельно с ещё работающим
+        with self._running_lock:
+            running = self._running_nodes.pop(token, set())
+        def release():
+            for done in running:
+                done.wait()
+            heartbeat.set()
+            self._release_lock(key, token)
+        if all(done.is_set() for done in running):
+            release()
+            return
+        agent_logger.warning(f"Workflow lock {key} held until {len(running)} timed-out node(s) exit")
+        threading.Thread(target=release, name=f"lock-release-{key}", daemon=True).start()
+    def _release_lock(self, key: str, token: str):
+        try:
+            if redis_client.cache.get(key) == token:
+                redis_client.cache.delete(key)
+        except Exception as e:
+            agent_logger.warning(f"Failed to release workflow lock {key}: {e}")
+    def _mark_failed(self, request_id: str, error: Exception):
+        agent_logger.error(f"Workflow error: {error}", exc_info=True)
+        with get_db() as db:
+            request = db.query(Request).filter(Request.request_id == uuid.UUID(request_id)).first()
+            if request:
+                request.status = "failed"
+                request.error_message = str(error)
+                try:
+                    from shared.utils.email_service import email_service
+                    from shared.models.database import User
+                    if request.user_id:
+                        user = db.query(User).filter(User.user_id == request.user_id).first()
+                        if user and user.email:
+                            email_service.send_error_notification(
+                                to=user.email,
+                                request_id=str(request.request_id),
+                                error_message=str(error)
+                            )
+                except Exception as email_error:
+                    agent_logger.warning(f"Failed to send error email notification: {email_error}")
+                db.commit()
+        redis_client.publish_event(
+            f"request:{request_id}",
+            {"status": "failed", "error": str(error)}
+        )